@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Crawl Checkpoint
+----------------
+Durable crawl state for the asyncio scrapers (MobileSentrixScraper, DatabaseScraper),
+kept in one SQLite file so a long crawl can be resumed after a crash or Ctrl-C.
+
+    frontier   url, kind ("category", "product"), state (pending, done, failed),
+               optional JSON data and the last error
+    records    scraped records as JSON, in the order they were scraped
+
+Records are written to the file as they are scraped instead of being kept
+in a list, so a crawl's memory does not grow with the catalog. Writes are
+committed every few seconds (and on close), so an interrupted run loses at
+most that window; those pages are simply fetched again on resume.
+
+A fresh run clears the file. With resume=True the previous state is kept:
+categories that are done are skipped and products that are done are not
+fetched again. A category only counts as done once none of its product
+pages failed, so resuming revisits it and retries just the failed ones.
+
+Configuration (environment variables):
+    SCRAPER_CHECKPOINT          checkpoint directory (default ".crawl_checkpoint",
+                                "off" keeps the state in memory for the run only)
+    SCRAPER_CHECKPOINT_SECONDS  seconds between commits (default 5)
+"""
+
+import os
+import json
+import time
+import sqlite3
+
+CHECKPOINT_DIR = os.environ.get("SCRAPER_CHECKPOINT", ".crawl_checkpoint")
+FLUSH_SECONDS = float(os.environ.get("SCRAPER_CHECKPOINT_SECONDS", "5"))
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+class CrawlCheckpoint:
+    """
+    Frontier of visited, pending and failed URLs plus the scraped records.
+
+    Typical use in a crawl:
+        checkpoint.start(resume)
+        checkpoint.add_pending(url, "category"); ... checkpoint.mark_done(url, "category")
+        if not checkpoint.is_done(product_url): ... checkpoint.add_record(product_url, record)
+        checkpoint.flush()
+        for record in checkpoint.records(): ...
+
+    A checkpoint created with path=None lives in memory: same behaviour
+    during the run, nothing to resume from afterwards.
+    """
+
+    def __init__(self, path, flush_seconds=FLUSH_SECONDS, flush_every=1000):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.flush_every = flush_every
+        self.connection = None
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def _connect(self):
+        """Open (and create) the store on first use, so importing a scraper touches no files."""
+        if self.connection is None:
+            if self.path is None:
+                self.connection = sqlite3.connect(":memory:")
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self.connection = sqlite3.connect(self.path)
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS frontier ("
+                "url TEXT PRIMARY KEY, kind TEXT, state TEXT, data TEXT, error TEXT, updated REAL)"
+            )
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS records (seq INTEGER PRIMARY KEY, url TEXT UNIQUE, record TEXT)"
+            )
+            self.connection.commit()
+        return self.connection
+
+    def start(self, resume=False):
+        """Open the checkpoint; unless resuming, forget any previous run."""
+        self._connect()
+        if not resume:
+            self.connection.execute("DELETE FROM frontier")
+            self.connection.execute("DELETE FROM records")
+            self.connection.commit()
+
+    def _written(self):
+        """Count a write and commit once the flush interval or batch size is reached."""
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every or time.monotonic() - self._flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def add_pending(self, url, kind, data=None):
+        """Add url to the frontier as pending, unless it is already there."""
+        self._connect().execute(
+            "INSERT OR IGNORE INTO frontier (url, kind, state, data, updated) VALUES (?, ?, ?, ?, ?)",
+            (url, kind, PENDING, json.dumps(data) if data is not None else None, time.time())
+        )
+        self._written()
+
+    def add_pending_many(self, kind, entries):
+        """Add (url, data) entries to the frontier as pending in one batch, skipping known urls."""
+        self._connect().executemany(
+            "INSERT OR IGNORE INTO frontier (url, kind, state, data, updated) VALUES (?, ?, ?, ?, ?)",
+            ((url, kind, PENDING, json.dumps(data) if data is not None else None, time.time())
+             for url, data in entries)
+        )
+        self._written()
+
+    def _set_state(self, url, kind, state, error=None):
+        connection = self._connect()
+        updated = connection.execute(
+            "UPDATE frontier SET state = ?, error = ?, updated = ? WHERE url = ?",
+            (state, error, time.time(), url)
+        )
+        if not updated.rowcount:
+            connection.execute(
+                "INSERT INTO frontier (url, kind, state, error, updated) VALUES (?, ?, ?, ?, ?)",
+                (url, kind, state, error, time.time())
+            )
+        self._written()
+
+    def mark_done(self, url, kind):
+        """Record that url was scraped completely."""
+        self._set_state(url, kind, DONE)
+
+    def mark_failed(self, url, kind, error):
+        """Record that url failed; a resumed run tries it again."""
+        self._set_state(url, kind, FAILED, str(error))
+
+    def state(self, url):
+        """Return the frontier state of url, or None if it was never added."""
+        row = self._connect().execute("SELECT state FROM frontier WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, url):
+        """Return True if url was scraped completely in this or a resumed run."""
+        return self.state(url) == DONE
+
+    def urls(self, kind, states=None):
+        """Return [(url, data)] for the frontier entries of a kind, optionally only in the given states."""
+        query = "SELECT url, data FROM frontier WHERE kind = ?"
+        params = [kind]
+        if states:
+            query += f" AND state IN ({', '.join('?' for _ in states)})"
+            params.extend(states)
+        rows = self._connect().execute(query + " ORDER BY rowid", params).fetchall()
+        return [(url, json.loads(data) if data else None) for url, data in rows]
+
+    def batches(self, kind, states, size=500):
+        """Yield lists of (url, data) for the entries of a kind in the given states, `size` at a time."""
+        query = (f"SELECT rowid, url, data FROM frontier WHERE kind = ? AND state IN ({', '.join('?' for _ in states)}) "
+                 "AND rowid > ? ORDER BY rowid LIMIT ?")
+        last = 0
+        while True:
+            rows = self._connect().execute(query, [kind, *states, last, size]).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            # Read one batch at a time, so the frontier can be updated while it is walked
+            yield [(url, json.loads(data) if data else None) for _, url, data in rows]
+
+    def add_record(self, url, record):
+        """Store a scraped record; a record for the same url replaces the earlier one."""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO records (url, record) VALUES (?, ?)", (url, json.dumps(record))
+        )
+        self._written()
+
+    def records(self):
+        """Yield the stored records in the order they were scraped, without loading them all."""
+        cursor = self._connect().execute("SELECT record FROM records ORDER BY seq")
+        for (record,) in cursor:
+            yield json.loads(record)
+
+    def record_count(self):
+        """Return the number of stored records."""
+        return self._connect().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def counts(self, kind):
+        """Return {state: count} for the frontier entries of a kind."""
+        rows = self._connect().execute(
+            "SELECT state, COUNT(*) FROM frontier WHERE kind = ? GROUP BY state", (kind,)
+        )
+        return {state: count for state, count in rows}
+
+    def format_summary(self):
+        """Return a one-line description of the checkpoint contents."""
+        categories = self.counts("category")
+        products = self.counts("product")
+        return (
+            f"Checkpoint: {self.record_count()} records; categories {categories.get(DONE, 0)} done, "
+            f"{categories.get(PENDING, 0)} pending, {categories.get(FAILED, 0)} failed; "
+            f"{products.get(FAILED, 0)} product pages failed"
+        )
+
+    def flush(self):
+        """Commit buffered writes to disk."""
+        if self.connection is not None:
+            self.connection.commit()
+        self._unflushed = 0
+        self._flushed_at = time.monotonic()
+
+    def close(self):
+        """Commit and close the underlying SQLite connection."""
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+def default_checkpoint(name):
+    """Return the CrawlCheckpoint for scraper `name`, configured from the SCRAPER_* environment variables."""
+    if CHECKPOINT_DIR.lower() in ("", "off", "0", "none"):
+        return CrawlCheckpoint(None)
+    return CrawlCheckpoint(os.path.join(CHECKPOINT_DIR, f"{name}.sqlite"))
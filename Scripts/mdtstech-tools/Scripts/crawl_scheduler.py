@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Crawl Scheduler
+---------------
+Shared work queue for the asyncio scrapers (MobileSentrixScraper, DatabaseScraper).
+N worker tasks pull jobs from one queue, URLs are deduplicated, and every
+request goes through a per-host concurrency limit and token-bucket rate limiter.
+While jobs run, a LoopLagMonitor samples how late the event loop wakes up,
+which is how long synchronous work (such as parsing) held it.
+"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger("crawl_scheduler")
+
+class TokenBucket:
+    """Allow `rate` acquisitions per second on average, with bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class LoopLagMonitor:
+    """Record how late a task sleeping `interval` seconds is woken, i.e. how long the loop was blocked."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    def start(self):
+        """Start sampling on the running loop."""
+        self._task = asyncio.create_task(self._sample())
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - start - self.interval))
+
+    async def stop(self):
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+class CrawlScheduler:
+    """
+    Run crawl jobs on a bounded pool of worker tasks.
+
+    Jobs are added with add(url, handler, *args); a URL that was already
+    added is ignored. Handlers may add more jobs. Fetches should be wrapped
+    in `async with scheduler.throttle(url)` so they respect the per-host
+    limits and are counted in summary().
+    """
+
+    def __init__(self, concurrency=8, per_host_limit=4, requests_per_second=4.0):
+        self.concurrency = concurrency
+        self.per_host_limit = per_host_limit
+        self.requests_per_second = requests_per_second
+        self.queue = asyncio.Queue()
+        self.seen = set()
+        self.latencies = []
+        self.started = None
+        self.finished = None
+        self.loop_lag = LoopLagMonitor()
+        self._host_semaphores = {}
+        self._host_buckets = {}
+
+    def first_visit(self, url):
+        """Mark url as seen; return False if it had been seen before."""
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        return True
+
+    def add(self, url, handler, *args):
+        """Queue handler(*args) unless url was already added; return whether it was queued."""
+        if not self.first_visit(url):
+            return False
+        self.queue.put_nowait((url, handler, args))
+        return True
+
+    @asynccontextmanager
+    async def throttle(self, url):
+        """Hold a per-host slot and rate-limit token for one request, and time it."""
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+            self._host_buckets[host] = TokenBucket(self.requests_per_second)
+
+        async with self._host_semaphores[host]:
+            await self._host_buckets[host].acquire()
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+
+    async def run(self):
+        """Process queued jobs, including ones added while running, until the queue is empty."""
+        self.started = time.perf_counter()
+        self.loop_lag.start()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            await self.queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.loop_lag.stop()
+            self.finished = time.perf_counter()
+
+    async def _worker(self):
+        while True:
+            url, handler, args = await self.queue.get()
+            try:
+                await handler(*args)
+            except Exception as e:
+                logger.error(f"Error processing {url}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def summary(self):
+        """Return fetch count, elapsed seconds, fetches per second, p50/p95 latency and event loop lag."""
+        elapsed = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "fetches": len(self.latencies),
+            "seconds": elapsed,
+            "fetches_per_second": len(self.latencies) / elapsed if elapsed > 0 else 0.0,
+            "p50_latency": percentile(self.latencies, 0.50),
+            "p95_latency": percentile(self.latencies, 0.95),
+            "p95_loop_lag": percentile(self.loop_lag.lags, 0.95),
+            "max_loop_lag": max(self.loop_lag.lags, default=0.0)
+        }
+
+    def log_summary(self):
+        """Log throughput, latency and event loop lag for the run."""
+        stats = self.summary()
+        logger.info(
+            f"Fetched {stats['fetches']} pages in {stats['seconds']:.1f}s "
+            f"({stats['fetches_per_second']:.1f} pages/s), "
+            f"latency p50 {stats['p50_latency'] * 1000:.0f} ms, p95 {stats['p95_latency'] * 1000:.0f} ms, "
+            f"loop lag p95 {stats['p95_loop_lag'] * 1000:.0f} ms, max {stats['max_loop_lag'] * 1000:.0f} ms"
+        )
+
+class PageCache:
+    """In-memory LRU cache of page bodies for one run, bounded by total characters."""
+
+    def __init__(self, max_chars=64 * 1024 * 1024):
+        self.max_chars = max_chars
+        self.pages = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url):
+        """Return the cached body for url, or None, and count the hit or miss."""
+        body = self.pages.get(url)
+        if body is None:
+            self.misses += 1
+            return None
+        self.pages.move_to_end(url)
+        self.hits += 1
+        return body
+
+    def put(self, url, body):
+        """Cache body, evicting least recently used pages to stay within max_chars."""
+        if len(body) > self.max_chars:
+            return
+        if url in self.pages:
+            self.size -= len(self.pages.pop(url))
+        self.pages[url] = body
+        self.size += len(body)
+        while self.size > self.max_chars:
+            _, evicted = self.pages.popitem(last=False)
+            self.size -= len(evicted)
+
+def percentile(values, fraction):
+    """Return the value at `fraction` (0-1) of the sorted values, or 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
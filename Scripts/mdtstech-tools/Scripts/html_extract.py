@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+HTML Extraction Engine
+----------------------
+Regex extraction shared by the standard-library scrapers (resilient_scraper,
+fixed_scraper). Every pattern is compiled once at import.
+
+A page is tokenized in one linear pass that records where each pattern could
+start (`<a`, `<li`, `<div`, `<article`, `src=`) and where the closing tags
+are. Each pattern is then only tried, anchored, at its start offsets, instead
+of every pattern re-scanning the whole document. Matching at the recorded
+offsets in order, resuming after the previous match, gives exactly the
+results re.findall would.
+
+Patterns of the form `<tag ...>(.*?)</end>` are split into the opening-tag
+prefix and the terminator. The lazy body then ends at the first recorded
+terminator offset after the prefix (a bisect), rather than the regex engine
+rescanning the rest of the page for every candidate whose terminator never
+comes. That rescanning made nested menus and product lists quadratic.
+Categories, product blocks and images all come from the same index.
+"""
+
+import re
+from bisect import bisect_left
+
+FLAGS = re.DOTALL | re.IGNORECASE
+
+class AnchoredPattern:
+    """A regex that can only match at offsets in one PageIndex bucket."""
+
+    def __init__(self, pattern, bucket, flags=FLAGS):
+        self.regex = re.compile(pattern, flags)
+        self.bucket = bucket
+
+class TagPattern:
+    """
+    A `prefix(.*?)terminator` regex split into its parts.
+
+    The prefix must match the opening tag(s) one way only, and the terminator
+    must start with the closing tag in close_bucket. With trim=True, the body is
+    followed by optional whitespace before the terminator (`(.*?)\\s*</span>`).
+    `regex` is the equivalent single pattern.
+    """
+
+    def __init__(self, prefix, terminator, bucket, close_bucket, trim=False):
+        self.prefix = re.compile(prefix, FLAGS)
+        self.terminator = re.compile(terminator, FLAGS)
+        self.regex = re.compile(prefix + '(.*?)' + ('\\s*' if trim else '') + terminator, FLAGS)
+        self.bucket = bucket
+        self.close_bucket = close_bucket
+        self.trim = trim
+
+TITLE_PATTERN = re.compile('<title>(.*?)</title>', re.IGNORECASE)
+DESCRIPTION_PATTERNS = [
+    re.compile('<meta\\s+name=["\']description["\']\\s+content=["\']([^"\'>]*)["\']', re.IGNORECASE),
+    re.compile('<meta\\s+content=["\']([^"\'>]*)["\']\\s+name=["\']description["\']', re.IGNORECASE)
+]
+
+CATEGORY_PATTERNS = [
+    # <a href="...category...">name</a>
+    TagPattern('<a\\s+href=["\']([^"\']*category[^"\']*)["\'][^>]*>', '</a>', "a", "a"),
+    # <a href="..."><span>name</span></a>
+    TagPattern('<a\\s+href=["\']([^"\']*)["\'][^>]*>\\s*<span[^>]*>\\s*', '</span>\\s*</a>', "a", "s", trim=True),
+    # <li><a href="...">name</a></li>
+    TagPattern('<li[^>]*>\\s*<a\\s+href=["\']([^"\']*)["\'][^>]*>', '</a>\\s*</li>', "l", "a")
+]
+PRODUCT_BLOCK_PATTERNS = [
+    # Pattern 1: div with product class
+    TagPattern('<div\\s+class=["\'](?:product|item)[^"\']*["\'][^>]*>', '</div>\\s*(?:</div>|<div)', "d", "d"),
+    # Pattern 2: li with product class
+    TagPattern('<li[^>]*class=["\'][^"\']*product[^"\']*["\'][^>]*>', '</li>', "l", "l"),
+    # Pattern 3: article with product
+    TagPattern('<article[^>]*>', '</article>', "a", "a")
+]
+IMAGE_PATTERN = AnchoredPattern('src=["\']([^"\'>]*\\.(?:jpg|jpeg|png|gif|webp))["\']', "src", re.IGNORECASE)
+
+# Patterns used inside a single product block
+LINK_WITH_NAME = re.compile('<a\\s+href=["\']([^"\']+)["\'][^>]*>(?:.*?<img[^>]*alt=["\']([^"\']+)["\']|.*?<span[^>]*>([^<]+)</span>)', FLAGS)
+LINK_NAME_FALLBACKS = [
+    # Link with image alt text
+    re.compile('<a\\s+href=["\']([^"\']+)["\'][^>]*>.*?<img[^>]*alt=["\']([^"\']+)["\']', FLAGS),
+    # Link with span text
+    re.compile('<a\\s+href=["\']([^"\']+)["\'][^>]*>.*?<span[^>]*>([^<]+)</span>', FLAGS),
+    # Link with h2/h3/h4 text
+    re.compile('<a\\s+href=["\']([^"\']+)["\'][^>]*>.*?<h[2-4][^>]*>([^<]+)</h[2-4]>', FLAGS),
+    # Link with any text
+    re.compile('<a\\s+href=["\']([^"\']+)["\'][^>]*>([^<]+)</a>', FLAGS)
+]
+LINK = re.compile('<a\\s+href=["\']([^"\']+)["\']', FLAGS)
+BLOCK_IMAGE = re.compile('<img[^>]*src=["\']([^"\']+)["\']', FLAGS)
+BLOCK_PRICE = re.compile('<span[^>]*class=["\'][^"\']*(?:price|amount)[^"\']*["\'][^>]*>(.*?)</span>', FLAGS)
+DOLLAR_PRICE = re.compile('\\$([\\d,\\.]+)')
+PRICE_NUMBER = re.compile('[$€£]?\\s*(\\d[\\d,.]*)')
+TAG = re.compile('<[^<]+?>')
+
+# One pass over the page finds every offset a pattern above can start or end at
+TOKEN_PATTERN = re.compile('(?P<close></[adls])|(?P<open><[adl])|(?P<src>src=["\'])', re.IGNORECASE)
+
+NAVIGATION_LINKS = ('login', 'account', 'cart')
+MAX_PRODUCT_BLOCKS = 30
+
+class PageIndex:
+    """Candidate start and closing-tag offsets for the page patterns, collected in one pass."""
+
+    def __init__(self, html):
+        self.html = html
+        self.offsets = {"a": [], "d": [], "l": [], "src": []}
+        self.closing = {"a": [], "d": [], "l": [], "s": []}
+        self._terminators = {}
+        for match in TOKEN_PATTERN.finditer(html):
+            kind = match.lastgroup
+            if kind == "src":
+                self.offsets["src"].append(match.start())
+            elif kind == "open":
+                self.offsets[match.group()[1].lower()].append(match.start())
+            else:
+                self.closing[match.group()[2].lower()].append(match.start())
+
+    def _terminator_offsets(self, pattern):
+        """Offsets where pattern's terminator matches, computed once per page."""
+        key = (pattern.terminator.pattern, pattern.close_bucket)
+        if key not in self._terminators:
+            terminator = pattern.terminator
+            self._terminators[key] = [
+                offset for offset in self.closing[pattern.close_bucket]
+                if terminator.match(self.html, offset)
+            ]
+        return self._terminators[key]
+
+    def findall(self, pattern):
+        """Return what pattern.regex.findall(html) would, trying only the indexed offsets."""
+        if isinstance(pattern, TagPattern):
+            return self._findall_tag(pattern)
+
+        html = self.html
+        regex = pattern.regex
+        results = []
+        end = 0
+        for offset in self.offsets[pattern.bucket]:
+            if offset < end:
+                continue
+            match = regex.match(html, offset)
+            if match:
+                # Like findall: unmatched groups become '', one group gives a string
+                groups = match.groups('')
+                results.append(groups[0] if len(groups) == 1 else groups)
+                end = match.end()
+        return results
+
+    def _findall_tag(self, pattern):
+        html = self.html
+        terminators = self._terminator_offsets(pattern)
+        results = []
+        end = 0
+        for offset in self.offsets[pattern.bucket]:
+            if offset < end:
+                continue
+            match = pattern.prefix.match(html, offset)
+            if not match:
+                continue
+
+            # The lazy body ends at the first terminator after the opening tag
+            body_start = match.end()
+            position = bisect_left(terminators, body_start)
+            if position == len(terminators):
+                continue
+            body_end = terminators[position]
+            end = pattern.terminator.match(html, body_end).end()
+            if pattern.trim:
+                while body_end > body_start and html[body_end - 1].isspace():
+                    body_end -= 1
+
+            groups = match.groups('') + (html[body_start:body_end],)
+            results.append(groups[0] if len(groups) == 1 else groups)
+        return results
+
+def absolute_url(url, base_url):
+    """Make a scraped URL absolute against base_url the way the scrapers always have."""
+    if url.startswith('http'):
+        return url
+    return base_url.rstrip('/') + ('/' if not url.startswith('/') else '') + url.lstrip('/')
+
+def clean_price(price):
+    """Strip tags from a price snippet and keep the leading number."""
+    price = TAG.sub('', price).strip()
+    price_clean = PRICE_NUMBER.search(price)
+    return price_clean.group(1) if price_clean else price
+
+def extract_title(html):
+    """Extract page title."""
+    title_match = TITLE_PATTERN.search(html)
+    return title_match.group(1) if title_match else "Unknown Title"
+
+def extract_description(html):
+    """Extract meta description."""
+    for pattern in DESCRIPTION_PATTERNS:
+        desc_match = pattern.search(html)
+        if desc_match:
+            return desc_match.group(1)
+    return "No description available"
+
+def unique_by_url(items):
+    """Drop items whose 'url' was already seen, preserving order."""
+    unique_items = []
+    seen_urls = set()
+    for item in items:
+        if item['url'] not in seen_urls:
+            unique_items.append(item)
+            seen_urls.add(item['url'])
+    return unique_items
+
+def extract_categories(index, base_url):
+    """Extract category links from an indexed page."""
+    categories = []
+    for pattern in CATEGORY_PATTERNS:
+        for url_part, name in index.findall(pattern):
+            # Clean up the name (remove HTML tags)
+            clean_name = TAG.sub('', name).strip()
+
+            # Skip empty names or very long strings
+            if not clean_name or len(clean_name) > 50:
+                continue
+
+            # Skip non-category links
+            if any(word in url_part.lower() for word in NAVIGATION_LINKS):
+                continue
+
+            categories.append({
+                "name": clean_name,
+                "url": absolute_url(url_part, base_url)
+            })
+
+    return unique_by_url(categories)
+
+def extract_products(index, base_url, parse_block):
+    """
+    Extract products from an indexed page.
+
+    parse_block(block, base_url) turns one product block into a product dict,
+    or returns None to skip it. Block patterns are tried in order and the
+    first one that yields products wins.
+    """
+    products = []
+    for pattern in PRODUCT_BLOCK_PATTERNS:
+        product_blocks = index.findall(pattern)
+
+        if not product_blocks:
+            continue
+
+        print(f"Found {len(product_blocks)} potential product blocks")
+
+        for block in product_blocks[:MAX_PRODUCT_BLOCKS]:  # Limit for performance
+            try:
+                product = parse_block(block, base_url)
+            except Exception as e:
+                print(f"Error parsing product block: {e}")
+                continue
+            if product:
+                products.append(product)
+
+        # If we found products with this pattern, no need to try others
+        if products:
+            break
+
+    return unique_by_url(products)
+
+def extract_images(index, base_url):
+    """Extract all image URLs from an indexed page."""
+    unique_images = []
+    seen_urls = set()
+    for img_url in index.findall(IMAGE_PATTERN):
+        img_url = absolute_url(img_url, base_url)
+        if img_url not in seen_urls:
+            unique_images.append(img_url)
+            seen_urls.add(img_url)
+    return unique_images
+
+def extract_page(html, base_url, parse_block):
+    """Index the page once and return its title, description, categories, products and images."""
+    index = PageIndex(html)
+    return {
+        "title": extract_title(html),
+        "description": extract_description(html),
+        "categories": extract_categories(index, base_url),
+        "products": extract_products(index, base_url, parse_block),
+        "images": extract_images(index, base_url)
+    }
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+HTML Report Renderer
+--------------------
+Shared product report for the scrapers (MobileSentrixScraper, fixed_scraper,
+resilient_scraper, final_scraper, simple_fixed_scraper).
+
+The report is written to the file one product card at a time, so memory
+holds at most one page of products whatever the catalog size. Large
+catalogs are split into pages of PAGE_SIZE products (report.html,
+report-2.html, ...) linked by a pager. Every value is HTML-escaped, and
+links and images only keep http(s) or relative URLs.
+
+Each page is keyed by a hash of its products' fields. The hashes are kept
+in a manifest next to the report (report.manifest.json), and a page whose
+products are unchanged since the previous run is not rendered again. The
+first page carries the run's statistics and is always rendered.
+
+Configuration (environment variables):
+    SCRAPER_REPORT_PAGE_SIZE   products per report page (default 1000)
+"""
+
+import os
+import re
+import json
+import hashlib
+from html import escape
+from itertools import islice
+
+PAGE_SIZE = int(os.environ.get("SCRAPER_REPORT_PAGE_SIZE", "1000"))
+
+# Bump when the page markup changes, so cached pages are rendered again
+TEMPLATE_VERSION = "1"
+
+# Record keys read for each part of a product card
+FIELDS = {"name": "name", "price": "price", "image": "image", "url": "url", "category": "category"}
+
+PLACEHOLDER_IMAGE = "data:image/svg+xml;charset=UTF-8,%3Csvg%20width%3D%22200%22%20height%3D%22200%22%20xmlns%3D%22http%3A%2F%2Fwww.w3.org%2F2000%2Fsvg%22%20viewBox%3D%220%200%20200%20200%22%20preserveAspectRatio%3D%22none%22%3E%3Cdefs%3E%3Cstyle%20type%3D%22text%2Fcss%22%3E%23holder_1687a4b89fe%20text%20%7B%20fill%3A%23AAAAAA%3Bfont-weight%3Abold%3Bfont-family%3AArial%2C%20Helvetica%2C%20Open%20Sans%2C%20sans-serif%2C%20monospace%3Bfont-size%3A10pt%20%7D%20%3C%2Fstyle%3E%3C%2Fdefs%3E%3Cg%20id%3D%22holder_1687a4b89fe%22%3E%3Crect%20width%3D%22200%22%20height%3D%22200%22%20fill%3D%22%23EEEEEE%22%3E%3C%2Frect%3E%3Cg%3E%3Ctext%20x%3D%2274.4296875%22%20y%3D%22104.5%22%3ENo%20Image%3C%2Ftext%3E%3C%2Fg%3E%3C%2Fg%3E%3C%2Fsvg%3E"
+
+# A URL's scheme, including the tabs and newlines browsers ignore inside it
+URL_SCHEME = re.compile(r"^[\x00-\x20]*([a-zA-Z][a-zA-Z0-9+.\-\t\n\r]*):")
+
+STYLE = """
+        body { font-family: Arial, sans-serif; margin: 0; padding: 20px; line-height: 1.6; color: #333; }
+        .container { max-width: 1200px; margin: 0 auto; }
+        h1, h2 { color: #2c3e50; }
+        h1 { border-bottom: 2px solid #eee; padding-bottom: 10px; }
+        .stats { background-color: #f8f9fa; padding: 15px; border-radius: 5px; margin-bottom: 20px; box-shadow: 0 1px 3px rgba(0,0,0,0.1); }
+        .product-grid { display: grid; grid-template-columns: repeat(auto-fill, minmax(250px, 1fr)); gap: 20px; }
+        .product-card { border: 1px solid #ddd; border-radius: 5px; padding: 15px; transition: transform 0.2s; box-shadow: 0 2px 5px rgba(0,0,0,0.1); }
+        .product-card:hover { transform: translateY(-5px); box-shadow: 0 5px 15px rgba(0,0,0,0.1); }
+        .product-image { width: 100%; height: 200px; object-fit: contain; border-radius: 3px; }
+        .product-title { font-weight: bold; margin: 10px 0 5px; font-size: 1.1em; }
+        .product-price { color: #e63946; font-weight: bold; }
+        .product-category { color: #666; font-size: 0.9em; }
+        .category-list { list-style: none; padding: 0; display: flex; flex-wrap: wrap; gap: 10px; }
+        .category-list li { margin-bottom: 5px; background: #eee; padding: 5px 10px; border-radius: 15px; }
+        .category-list li a { text-decoration: none; color: #333; }
+        .category-list li a:hover { text-decoration: underline; }
+        .pager { margin: 20px 0; display: flex; gap: 15px; align-items: center; }
+        .btn { display: inline-block; padding: 8px 15px; background: #3498db; color: white; text-decoration: none; border-radius: 4px; margin-top: 10px; }
+        .btn:hover { background: #2980b9; }
+"""
+
+def safe_url(url):
+    """Return url if it is http(s) or relative, else an empty string (no javascript: links)."""
+    url = str(url or "").strip()
+    match = URL_SCHEME.match(url)
+    if match and re.sub(r"[\t\n\r]", "", match.group(1)).lower() not in ("http", "https"):
+        return ""
+    return url
+
+def format_price(price):
+    """Show numbers as $0.00 and anything else as it was scraped."""
+    if price is None or price == "":
+        return "N/A"
+    if isinstance(price, (int, float)):
+        return f"${price:.2f}"
+    return str(price)
+
+def _card_values(product, fields):
+    return (
+        str(product.get(fields["name"]) or "Unknown Product"),
+        format_price(product.get(fields["price"])),
+        safe_url(product.get(fields["image"])),
+        safe_url(product.get(fields["url"])),
+        product.get(fields["category"])
+    )
+
+def render_card(values):
+    """Return the markup for one product card from its (name, price, image, url, category) values."""
+    name, price, image, url, category = values
+    category_line = f'\n                <div class="product-category">{escape(str(category))}</div>' if category else ""
+    return f"""
+            <div class="product-card">
+                <img src="{escape(image)}" alt="{escape(name)}" class="product-image" loading="lazy" onerror="this.src='{PLACEHOLDER_IMAGE}';">
+                <div class="product-title">{escape(name)}</div>
+                <div class="product-price">{escape(price)}</div>{category_line}
+                <a href="{escape(url)}" class="btn" target="_blank" rel="noopener">View Product</a>
+            </div>"""
+
+def page_path(path, number):
+    """Return the file for page `number` of the report at path (page 1 is path itself)."""
+    if number == 1:
+        return path
+    stem, extension = os.path.splitext(path)
+    return f"{stem}-{number}{extension}"
+
+def _pager(path, number, pages):
+    if pages == 1:
+        return ""
+    links = []
+    if number > 1:
+        links.append(f'<a class="btn" href="{escape(os.path.basename(page_path(path, number - 1)))}">&laquo; Previous</a>')
+    links.append(f"<span>Page {number} of {pages}</span>")
+    if number < pages:
+        links.append(f'<a class="btn" href="{escape(os.path.basename(page_path(path, number + 1)))}">Next &raquo;</a>')
+    return f'\n        <div class="pager">{" ".join(links)}</div>'
+
+def _write_page(f, path, title, cards, number, pages, total, first_index, stats, categories):
+    f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{escape(title)}{f" - Page {number}" if number > 1 else ""}</title>
+    <style>{STYLE}    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>{escape(title)}</h1>
+""")
+    if stats:
+        f.write('        <div class="stats">\n')
+        for label, value in stats:
+            f.write(f"            <p><strong>{escape(str(label))}:</strong> {escape(str(value))}</p>\n")
+        f.write("        </div>\n")
+    if categories:
+        f.write('        <h2>Categories</h2>\n        <ul class="category-list">\n')
+        for category in categories:
+            f.write(f'            <li><a href="{escape(safe_url(category.get("url")))}" target="_blank" rel="noopener">'
+                    f'{escape(str(category.get("name", "")))}</a></li>\n')
+        f.write("        </ul>\n")
+
+    shown = f"{first_index + 1}-{first_index + len(cards)} of {total}" if cards else f"0 of {total}"
+    f.write(f"""
+        <h2>Products ({shown})</h2>{_pager(path, number, pages)}
+        <div class="product-grid">""")
+    for values in cards:
+        f.write(render_card(values))
+    f.write(f"""
+        </div>{_pager(path, number, pages)}
+    </div>
+</body>
+</html>
+""")
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_report(path, products, title, total=None, stats=(), categories=(), page_size=None, fields=None):
+    """
+    Write an HTML report of products to path, streaming one page at a time.
+
+    products is an iterable of dicts; `fields` overrides which keys hold the
+    name, price, image, url and category (see FIELDS). Pass `total` when
+    products is a generator; otherwise it is taken from len(products).
+    `stats` are (label, value) pairs and `categories` dicts with name/url,
+    both shown on the first page.
+
+    Returns {"paths": [...], "rendered": pages written, "reused": pages unchanged since the last run}.
+    """
+    fields = {**FIELDS, **(fields or {})}
+    page_size = page_size or PAGE_SIZE
+    total = len(products) if total is None else total
+    pages = max(1, -(-total // page_size))
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.splitext(path)[0] + ".manifest.json"
+    previous = _load_manifest(manifest_path)
+    manifest = {}
+    summary = {"paths": [], "rendered": 0, "reused": 0}
+
+    products = iter(products)
+    for number in range(1, pages + 1):
+        cards = [_card_values(product, fields) for product in islice(products, page_size)]
+        target = page_path(path, number)
+        name = os.path.basename(target)
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{TEMPLATE_VERSION}\x1f{title}\x1f{number}\x1f{pages}\x1f{total}".encode())
+        for values in cards:
+            digest.update(hashlib.blake2b("\x1f".join(map(str, values)).encode(), digest_size=16).digest())
+        manifest[name] = digest.hexdigest()
+
+        summary["paths"].append(target)
+        if number > 1 and previous.get(name) == manifest[name] and os.path.exists(target):
+            summary["reused"] += 1
+            continue
+        with open(target, 'w', encoding='utf-8') as f:
+            _write_page(f, path, title, cards, number, pages, total, (number - 1) * page_size,
+                        stats if number == 1 else (), categories if number == 1 else ())
+        summary["rendered"] += 1
+
+    # Remove pages left over from a previous, larger report
+    for name in previous:
+        if name not in manifest:
+            stale = os.path.join(directory, name)
+            if os.path.exists(stale):
+                os.remove(stale)
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return summary
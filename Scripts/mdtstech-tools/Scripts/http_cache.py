@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+HTTP Response Cache
+-------------------
+Persistent on-disk cache of fetched pages shared by the scrapers.
+Bodies are stored zlib-compressed in a SQLite file together with their ETag
+and Last-Modified validators, so the next crawl can send a conditional
+request and reuse the stored body when the server answers 304 Not Modified.
+The store is capped in size and evicts least recently used pages.
+In offline mode pages are replayed from the cache without touching the network.
+
+Configuration (environment variables):
+    SCRAPER_HTTP_CACHE      cache directory (default ".http_cache", "off" disables it)
+    SCRAPER_HTTP_CACHE_MB   size cap for compressed bodies in MB (default 256)
+    SCRAPER_OFFLINE         set to 1 to serve pages from the cache only
+"""
+
+import os
+import time
+import zlib
+import sqlite3
+
+CACHE_DIR = os.environ.get("SCRAPER_HTTP_CACHE", ".http_cache")
+CACHE_MAX_MB = float(os.environ.get("SCRAPER_HTTP_CACHE_MB", "256"))
+OFFLINE = os.environ.get("SCRAPER_OFFLINE", "").lower() in ("1", "true", "yes")
+
+class ResponseCache:
+    """
+    URL-keyed store of page bodies and their validators.
+
+    Typical use around a fetch:
+        if cache.offline: return cache.replay(url)
+        headers.update(cache.headers_for(url))
+        on 304: body = cache.revalidated(url)
+        on 200: cache.store(url, body, response.headers)
+
+    A cache created with path=None is disabled: it never sends validators,
+    stores nothing and replays nothing.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stats = {"stored": 0, "not_modified": 0, "replayed": 0, "misses": 0, "bytes_saved": 0}
+        self.connection = None
+        self.total_bytes = 0
+
+    def _connect(self):
+        """Open (and create) the store on first use, so importing a scraper touches no files."""
+        if self.connection is None and self.path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "body BLOB, size INTEGER, last_used REAL)"
+            )
+            self.total_bytes = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+        return self.connection
+
+    def _row(self, url):
+        if self._connect() is None:
+            return None
+        return self.connection.execute(
+            "SELECT etag, last_modified, body FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+
+    def _touch(self, url):
+        self.connection.execute("UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url))
+        self.connection.commit()
+
+    def headers_for(self, url):
+        """Return If-None-Match/If-Modified-Since headers for a cached url, or {}."""
+        row = self._row(url)
+        if not row:
+            return {}
+        etag, last_modified, _ = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def store(self, url, body, headers):
+        """Save a 200 response body with the ETag/Last-Modified from its headers."""
+        if self._connect() is None:
+            return
+        compressed = zlib.compress(body.encode("utf-8"), 6)
+        if len(compressed) > self.max_bytes:
+            return
+        previous = self.connection.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (url, etag, last_modified, body, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, headers.get("ETag"), headers.get("Last-Modified"), compressed, len(compressed), time.time())
+        )
+        self.total_bytes += len(compressed) - (previous[0] if previous else 0)
+        self.stats["stored"] += 1
+        self._evict()
+        self.connection.commit()
+
+    def _evict(self):
+        """Delete least recently used bodies until the store is within max_bytes."""
+        while self.total_bytes > self.max_bytes:
+            rows = self.connection.execute(
+                "SELECT url, size FROM responses ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.total_bytes -= size
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def _body(self, url):
+        row = self._row(url)
+        if not row:
+            return None
+        self._touch(url)
+        return zlib.decompress(row[2]).decode("utf-8")
+
+    def revalidated(self, url):
+        """Return the cached body after the server answered 304 Not Modified."""
+        body = self._body(url)
+        if body is not None:
+            self.stats["not_modified"] += 1
+            self.stats["bytes_saved"] += len(body)
+        return body
+
+    def replay(self, url):
+        """Return the cached body for offline mode, or None if the url was never stored."""
+        body = self._body(url)
+        self.stats["replayed" if body is not None else "misses"] += 1
+        return body
+
+    def format_summary(self):
+        """Return a one-line description of this run's cache activity."""
+        stats = self.stats
+        return (
+            f"HTTP cache: {stats['not_modified']} not modified (304), {stats['stored']} stored, "
+            f"{stats['replayed']} replayed offline, {stats['misses']} offline misses, "
+            f"{stats['bytes_saved'] / 1024:.0f} KB not re-downloaded"
+        )
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+def default_cache():
+    """Return a ResponseCache configured from the SCRAPER_* environment variables."""
+    if CACHE_DIR.lower() in ("", "off", "0", "none"):
+        return ResponseCache(None)
+    return ResponseCache(
+        os.path.join(CACHE_DIR, "responses.sqlite"),
+        max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+        offline=OFFLINE
+    )
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP Client
+------------------
+Shared keep-alive HTTP client for the standard-library scrapers.
+Connections are kept open per host (and per TLS verification mode) and
+reused across requests, so only the first request to a host pays for the
+TCP and TLS handshakes. Cookies are kept in one CookieJar for the whole run.
+
+open() mirrors urllib.request.urlopen: it follows redirects, returns a
+response with read()/headers/status, and raises urllib.error.HTTPError for
+non-2xx answers, so existing error handling (including 304 checks) keeps working.
+
+HTTP/2 is optional: with http2=True and httpx (with its h2 extra) installed
+the requests go through an httpx client instead; otherwise HTTP/1.1
+keep-alive is used.
+"""
+
+import io
+import ssl
+import threading
+import http.client
+import urllib.error
+import urllib.request
+from http.cookiejar import CookieJar
+from urllib.parse import urljoin, urlsplit
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+# Errors that mean a reused keep-alive connection was closed by the server
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError,
+                           BrokenPipeError, http.client.CannotSendRequest)
+
+class PooledResponse:
+    """A fully read response; read() returns the body bytes."""
+
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def read(self):
+        return self.body
+
+    def info(self):
+        return self.headers
+
+    def getcode(self):
+        return self.status
+
+class PooledClient:
+    """
+    HTTP client that keeps up to `max_per_host` idle connections per host.
+
+    verify=False disables certificate checks, like the scrapers' unverified
+    SSL contexts; it can also be overridden per call in open().
+    """
+
+    def __init__(self, timeout=30, verify=True, max_per_host=4, cookie_jar=None, http2=False):
+        self.timeout = timeout
+        self.verify = verify
+        self.max_per_host = max_per_host
+        self.cookie_jar = cookie_jar if cookie_jar is not None else CookieJar()
+        self.stats = {"requests": 0, "connections": 0, "reused": 0}
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._contexts = {}
+        self._http2 = self._http2_client() if http2 else None
+
+    def _http2_client(self):
+        try:
+            import httpx
+            return {
+                verify: httpx.Client(http2=True, verify=verify, cookies=self.cookie_jar, timeout=self.timeout)
+                for verify in (True, False)
+            }
+        except ImportError:
+            # httpx[http2] is not installed; stay on HTTP/1.1 keep-alive
+            return None
+
+    def _context(self, verify):
+        if verify not in self._contexts:
+            context = ssl.create_default_context()
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self._contexts[verify] = context
+        return self._contexts[verify]
+
+    def _connection(self, key, timeout):
+        """Return (connection, reused) for key = (scheme, host, port, verify)."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats["reused"] += 1
+                return idle.pop(), True
+            self.stats["connections"] += 1
+
+        scheme, host, port, verify = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._context(verify)), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def _release(self, key, connection, response):
+        """Keep the connection for reuse unless the server is closing it."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if not response.will_close and len(idle) < self.max_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _send(self, url, headers, timeout, verify):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname, port, verify)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        # The CookieJar works on urllib Request/response objects
+        cookie_request = urllib.request.Request(url, headers=headers)
+        self.cookie_jar.add_cookie_header(cookie_request)
+        request_headers = dict(cookie_request.header_items())
+
+        while True:
+            connection, reused = self._connection(key, timeout)
+            try:
+                connection.request("GET", path, headers=request_headers)
+                raw = connection.getresponse()
+                body = raw.read()
+                break
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+                # The server dropped an idle connection; retry on a fresh one
+            except Exception:
+                connection.close()
+                raise
+
+        self._release(key, connection, raw)
+        response = PooledResponse(url, raw.status, raw.reason, raw.msg, body)
+        self.cookie_jar.extract_cookies(response, cookie_request)
+        return response
+
+    def _send_http2(self, url, headers, timeout, verify):
+        raw = self._http2[verify].get(url, headers=headers, timeout=timeout)
+        message = http.client.HTTPMessage()
+        for name, value in raw.headers.multi_items():
+            message[name] = value
+        return PooledResponse(url, raw.status_code, raw.reason_phrase, message, raw.content)
+
+    def open(self, url, headers=None, timeout=None, verify=None):
+        """GET url, following redirects; raise urllib.error.HTTPError for non-2xx statuses."""
+        headers = dict(headers or {})
+        timeout = timeout if timeout is not None else self.timeout
+        verify = self.verify if verify is None else verify
+        send = self._send_http2 if self._http2 else self._send
+
+        for _ in range(MAX_REDIRECTS + 1):
+            self.stats["requests"] += 1
+            response = send(url, headers, timeout, verify)
+            location = response.headers.get("Location")
+            if response.status in REDIRECT_CODES and location:
+                url = urljoin(url, location)
+                continue
+            break
+
+        if not 200 <= response.status < 300:
+            raise urllib.error.HTTPError(url, response.status, response.reason,
+                                         response.headers, io.BytesIO(response.body))
+        return response
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+            self._idle.clear()
+        if self._http2:
+            for client in self._http2.values():
+                client.close()
+
+_default_client = None
+
+def default_client():
+    """Return the process-wide PooledClient shared by the scrapers."""
+    global _default_client
+    if _default_client is None:
+        _default_client = PooledClient()
+    return _default_client
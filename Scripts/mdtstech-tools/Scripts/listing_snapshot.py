@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Listing Snapshot
+----------------
+Change detection for listing crawls (MobileSentrixScraper, DatabaseScraper).
+Product detail pages are fetched only for products whose listing card changed.
+
+Every product's listing-card fields (name, price, image URL, stock badge) are
+reduced to a fingerprint and stored with the product's last scraped record,
+in an SQLite file kept across runs. In incremental mode a card whose
+fingerprint is unchanged reuses the stored record instead of fetching the
+product page, so a daily price check costs the category pages plus the pages
+of new and changed products.
+
+Each run's result is also a delta against the snapshot:
+
+    inserted   a product not in the snapshot (or listed again after removal)
+    updated    a product whose card or scraped record changed
+    removed    a product of the snapshot not listed by a complete crawl
+
+A product stays in the delta until the delta has been written, so changes
+seen by an interrupted run are reported by the run that finishes.
+
+Configuration (environment variables):
+    SCRAPER_INCREMENTAL   "1" skips product pages of unchanged listing cards (default "0": fetch every page)
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+
+from crawl_checkpoint import CHECKPOINT_DIR
+
+INCREMENTAL = os.environ.get("SCRAPER_INCREMENTAL", "0").lower() in ("1", "true", "yes", "on")
+
+INSERTED = "inserted"
+UPDATED = "updated"
+REMOVED = "removed"
+UNCHANGED = "unchanged"
+
+# Listing-card fields that make up a product's fingerprint
+LISTING_FIELDS = ("name", "price", "image_url", "stock")
+
+def listing_fingerprint(card, fields=LISTING_FIELDS):
+    """Return a hash of the listing-card fields of card."""
+    values = json.dumps([card.get(field) for field in fields], ensure_ascii=False)
+    return hashlib.blake2b(values.encode(), digest_size=16).hexdigest()
+
+class ListingSnapshot:
+    """
+    Fingerprint and last scraped record of every listed product, kept across runs.
+
+    Typical use in a crawl:
+        snapshot.start(resume)
+        record = snapshot.lookup(url, fingerprint)   # stored record if the card is unchanged
+        if record is None: ... snapshot.store(url, fingerprint, record)
+        snapshot.mark_removed()                     # only after a complete crawl
+        for change, record in snapshot.changes(): ...
+        snapshot.mark_reported()
+
+    A snapshot created with path=None lives in memory, so every product is inserted.
+    """
+
+    def __init__(self, path, flush_every=1000):
+        self.path = path
+        self.flush_every = flush_every
+        self.connection = None
+        self.run = 0
+        self.reported = 0
+        self._unflushed = 0
+
+    def _connect(self):
+        """Open (and create) the store on first use, so importing a scraper touches no files."""
+        if self.connection is None:
+            if self.path is None:
+                self.connection = sqlite3.connect(":memory:")
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self.connection = sqlite3.connect(self.path)
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot ("
+                "url TEXT PRIMARY KEY, fingerprint TEXT, record TEXT, change TEXT, seen_run INTEGER, changed_run INTEGER)"
+            )
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            self.connection.commit()
+        return self.connection
+
+    def _meta(self, key):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, key, value):
+        self._connect().execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def start(self, resume=False):
+        """Begin a run; a resumed run carries on with the interrupted one."""
+        self.run = self._meta("run")
+        self.reported = self._meta("reported")
+        if not resume or not self.run:
+            self.run += 1
+            self._set_meta("run", self.run)
+        self.flush()
+
+    def _written(self):
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def lookup(self, url, fingerprint):
+        """
+        Mark url as listed in this run and return its stored record if its
+        listing card is unchanged; None if it is new, removed or changed.
+        """
+        connection = self._connect()
+        row = connection.execute("SELECT fingerprint, record, change FROM snapshot WHERE url = ?", (url,)).fetchone()
+        if row is None or row[2] == REMOVED:
+            return None
+        connection.execute("UPDATE snapshot SET seen_run = ? WHERE url = ?", (self.run, url))
+        self._written()
+        return json.loads(row[1]) if row[0] == fingerprint else None
+
+    def store(self, url, fingerprint, record):
+        """Store the scraped record of a listed product and return its change (inserted, updated or unchanged)."""
+        connection = self._connect()
+        encoded = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        row = connection.execute(
+            "SELECT fingerprint, record, change, changed_run FROM snapshot WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None or row[2] == REMOVED:
+            change = INSERTED
+        elif row[0] == fingerprint and row[1] == encoded:
+            connection.execute("UPDATE snapshot SET seen_run = ? WHERE url = ?", (self.run, url))
+            self._written()
+            return UNCHANGED
+        elif row[2] == INSERTED and row[3] > self.reported:
+            change = INSERTED  # Inserted by a run whose delta was never written
+        else:
+            change = UPDATED
+        connection.execute(
+            "INSERT OR REPLACE INTO snapshot (url, fingerprint, record, change, seen_run, changed_run) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, fingerprint, encoded, change, self.run, self.run)
+        )
+        self._written()
+        return change
+
+    def mark_removed(self):
+        """Mark every product not listed in this run as removed; call only after a complete crawl."""
+        removed = self._connect().execute(
+            "UPDATE snapshot SET change = ?, changed_run = ? WHERE seen_run < ? AND change != ?",
+            (REMOVED, self.run, self.run, REMOVED)
+        ).rowcount
+        self.flush()
+        return removed
+
+    def changes(self):
+        """Yield (change, record) for every product inserted, updated or removed since the last written delta."""
+        cursor = self._connect().execute(
+            "SELECT change, record FROM snapshot WHERE changed_run > ? ORDER BY rowid", (self.reported,)
+        )
+        for change, record in cursor:
+            yield change, json.loads(record)
+
+    def counts(self):
+        """Return {change: count} for the changes not yet reported."""
+        rows = self._connect().execute(
+            "SELECT change, COUNT(*) FROM snapshot WHERE changed_run > ? GROUP BY change", (self.reported,)
+        )
+        return {change: count for change, count in rows}
+
+    def mark_reported(self):
+        """Record that the delta up to this run has been written."""
+        self.reported = self.run
+        self._set_meta("reported", self.run)
+        self.flush()
+
+    def format_summary(self):
+        """Return a one-line description of the pending delta."""
+        counts = self.counts()
+        return (
+            f"Listing delta: {counts.get(INSERTED, 0)} inserted, {counts.get(UPDATED, 0)} updated, "
+            f"{counts.get(REMOVED, 0)} removed"
+        )
+
+    def flush(self):
+        """Commit buffered writes to disk."""
+        if self.connection is not None:
+            self.connection.commit()
+        self._unflushed = 0
+
+    def close(self):
+        """Commit and close the underlying SQLite connection."""
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+def default_snapshot(name):
+    """Return the ListingSnapshot for scraper `name`, next to its crawl checkpoint."""
+    if CHECKPOINT_DIR.lower() in ("", "off", "0", "none"):
+        return ListingSnapshot(None)
+    return ListingSnapshot(os.path.join(CHECKPOINT_DIR, f"{name}_snapshot.sqlite"))
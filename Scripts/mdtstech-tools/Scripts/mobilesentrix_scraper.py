@@ -1,7 +1,8 @@
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
-import pandas as pd
+import argparse
+import csv
+import json
 from urllib.parse import urljoin
 import re
 import logging
@@ -10,33 +11,372 @@ import platform
 import os
 from datetime import datetime
 
+from crawl_checkpoint import FAILED, PENDING, default_checkpoint
+from crawl_scheduler import CrawlScheduler, PageCache
+from html_report import write_report
+from http_cache import default_cache
+from listing_snapshot import INCREMENTAL, default_snapshot, listing_fingerprint
+from page_parser import PARSE_WORKERS, ExtractionPool, PageParser
+from record_sink import SINK_FORMATS, RecordSink
+from retry_policy import default_policy
+from sitemap_discovery import DISCOVERY, SITEMAP_INCLUDE, SITEMAP_URL, default_lastmod_store, iter_sitemap
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Output columns and their types
+PRODUCT_FIELDS = {
+    "name": str,
+    "price": float,
+    "image_url": str,
+    "specifications": str,
+    "description": str,
+    "product_url": str,
+    "category": str,
+    "stock": str
+}
+# Delta file columns: the change (inserted, updated, removed) and the product
+DELTA_FIELDS = {"change": str, **PRODUCT_FIELDS}
+
+# Navigation menu selectors, tried in order
+NAV_SELECTORS = [
+    "ul.nav-menu li.nav-item a",
+    "nav ul li a",
+    ".navigation a",
+    ".menu a",
+    ".categories a"
+]
+# Product grid selectors
+PRODUCT_SELECTORS = [
+    "div.product-card",
+    ".product-item",
+    ".product",
+    "li.product",
+    ".item.product"
+]
+# Product name selectors (within a product card)
+NAME_SELECTORS = [
+    "h2.product-title a",
+    "a.product-link",
+    ".product-name a",
+    "h3 a",
+    ".item-title a",
+    ".product-item-link",
+    ".product-title",
+    "h2 a",
+    ".item-name"
+]
+# Price selectors (within a product card)
+PRICE_SELECTORS = [
+    "span.price--main",
+    "span.price",
+    ".product-price",
+    ".price-box",
+    ".amount",
+    ".price-container",
+    ".special-price",
+    "[data-price-type=finalPrice]"
+]
+# Image selectors (within a product card, or on the product page)
+IMG_SELECTORS = [
+    "img.product-img",
+    "img.primary-image",
+    ".product-image img",
+    ".product-photo img",
+    "img.main-image",
+    ".product-item-photo img",
+    ".product img",
+    "img[data-role=product-image]",
+    "img"
+]
+# Stock badge selectors (within a product card, or on the product page)
+STOCK_SELECTORS = [
+    ".stock",
+    ".availability",
+    ".stock-status",
+    ".out-of-stock",
+    "[data-stock]"
+]
+# Product name selectors (on the product page, for sitemap discovery)
+PAGE_NAME_SELECTORS = [
+    "h1.page-title",
+    "h1.product-name",
+    ".product-info-main h1",
+    "h1"
+]
+# Price selectors (on the product page, for sitemap discovery)
+PAGE_PRICE_SELECTORS = [
+    ".product-info-main span.price",
+    ".product-info-price span.price",
+    "[data-price-type=finalPrice] .price"
+] + PRICE_SELECTORS
+# Product description/specs selectors (on the product page)
+SPECS_SELECTORS = [
+    "div.product-description",
+    "div.specs-table",
+    ".product-details",
+    ".product-info",
+    "#product-details"
+]
+
+class MobileSentrixExtractor:
+    """
+    Turns MobileSentrix page HTML into plain lists and dicts.
+
+    Holds the parser and the compiled selector cascades. Its methods take page
+    text and return only built-in types, so they can run in a worker process
+    (see page_parser.ExtractionPool).
+    """
+
+    def __init__(self, base_url, parser=None):
+        self.base_url = base_url
+        self.parser = PageParser(parser)
+        # Selector cascades are compiled once and remember the winner per layout
+        self.nav_chain = self.parser.chain(NAV_SELECTORS)
+        self.product_chain = self.parser.chain(PRODUCT_SELECTORS)
+        self.name_chain = self.parser.chain(NAME_SELECTORS)
+        self.price_chain = self.parser.chain(PRICE_SELECTORS)
+        self.img_chain = self.parser.chain(IMG_SELECTORS)
+        self.stock_chain = self.parser.chain(STOCK_SELECTORS)
+        self.page_stock_chain = self.parser.chain(STOCK_SELECTORS)
+        self.page_img_chain = self.parser.chain(IMG_SELECTORS)
+        self.specs_chain = self.parser.chain(SPECS_SELECTORS)
+        self.page_name_chain = self.parser.chain(PAGE_NAME_SELECTORS)
+        self.page_price_chain = self.parser.chain(PAGE_PRICE_SELECTORS)
+
+    def _image_url(self, img_elem):
+        # Try different image attributes (src, data-src, etc.)
+        if img_elem:
+            for attr in ['src', 'data-src', 'data-original', 'data-lazy-src']:
+                if img_elem.get(attr):
+                    return urljoin(self.base_url, img_elem[attr])
+        return None
+
+    def _price(self, price_elem):
+        """Return the price in an element as a float, or None."""
+        price = price_elem.get_text(strip=True) if price_elem else "N/A"
+
+        # Clean up price - extract only numbers and decimal point
+        if price != "N/A":
+            # First, try to find a pattern like $XX.XX
+            price_match = re.search(r'\$?\s*(\d+\.?\d*)', price)
+            if price_match:
+                price = price_match.group(1)
+            else:
+                # If no match, just remove all non-numeric characters except decimal point
+                price = re.sub(r'[^\d.]', '', price)
+
+            # Ensure we have a valid number
+            try:
+                price = float(price)
+            except ValueError:
+                price = None
+        else:
+            price = None
+        return price
+
+    def category_links(self, html: str) -> List[str]:
+        """Extract category links from the homepage."""
+        soup = self.parser.parse(html)
+        category_links = []
+
+        # Try different selectors for navigation menu
+        nav_menu, selector = self.nav_chain.all(soup)
+        if nav_menu:
+            logger.info(f"Found navigation menu with selector: {selector}")
+
+        # If no predefined selector works, try to find links with category in URL
+        if not nav_menu:
+            nav_menu = [a for a in self.parser.select(soup, 'a') if 'category' in (a.get('href') or '').lower()]
+
+        for link in nav_menu:
+            href = link.get('href', '')
+            if href and not href.startswith('#') and ('category' in href.lower() or 'product' in href.lower()):
+                full_url = urljoin(self.base_url, href)
+                category_links.append(full_url)
+        return category_links
+
+    def product_cards(self, html: str) -> List[Dict]:
+        """Extract name, product URL, price and image of every product card on a category page."""
+        soup = self.parser.parse(html)
+
+        # Try different product grid selectors
+        products, selector = self.product_chain.all(soup)
+        if products:
+            logger.info(f"Found products with selector: {selector}")
+
+        cards = []
+        for product in products:
+            try:
+                cards.append(self.product_card(product))
+            except Exception as e:
+                logger.error(f"Error parsing product: {e}")
+        return cards
+
+    def product_card(self, product) -> Dict:
+        """Parse one product card node."""
+        # Cards sharing a template share their winning selectors
+        layout = self.parser.layout_key(product)
+
+        # Try different selectors for product name
+        name_elem, selector = self.name_chain.first(product, layout)
+        if name_elem:
+            logger.info(f"Found product name with selector: {selector}")
+
+        name = name_elem.get_text(strip=True) if name_elem else "N/A"
+        product_url = urljoin(self.base_url, name_elem['href']) if name_elem and name_elem.get('href') else None
+
+        # If we couldn't find a name, try to extract it from the URL
+        if name == "N/A" and product_url:
+            url_parts = product_url.split('/')
+            if url_parts and len(url_parts) > 0:
+                last_part = url_parts[-1]
+                if last_part:
+                    name = last_part.replace('-', ' ').title()
+
+        # Try different selectors for price
+        price_elem, selector = self.price_chain.first(product, layout)
+        if price_elem:
+            logger.info(f"Found price with selector: {selector}")
+
+        price = self._price(price_elem)
+
+        # Try different selectors for image
+        img_elem, selector = self.img_chain.first(product, layout)
+        if img_elem:
+            logger.info(f"Found image with selector: {selector}")
+
+        # Stock badge, compared with the last run by incremental crawls
+        stock_elem, _ = self.stock_chain.first(product, layout)
+
+        return {
+            "name": name,
+            "price": price,
+            "image_url": self._image_url(img_elem),
+            "product_url": product_url,
+            "stock": stock_elem.get_text(strip=True) if stock_elem else ""
+        }
+
+    def product_details(self, html: str) -> Dict:
+        """Extract image, specs and description from a product page."""
+        return self._details(self.parser.parse(html))
+
+    def product_page(self, html: str) -> Dict:
+        """Extract a whole product (name, price, image, specs, description) from its page, without a listing card."""
+        product_soup = self.parser.parse(html)
+        product = self._details(product_soup)
+
+        name_elem, _ = self.page_name_chain.first(product_soup)
+        if name_elem:
+            product["name"] = name_elem.get_text(strip=True)
+        else:
+            og_title = self.parser.select_one(product_soup, 'meta[property="og:title"]')
+            product["name"] = og_title.get("content", "").strip() if og_title else "N/A"
+
+        price_elem, _ = self.page_price_chain.first(product_soup)
+        product["price"] = self._price(price_elem)
+
+        stock_elem, _ = self.page_stock_chain.first(product_soup)
+        product["stock"] = stock_elem.get_text(strip=True) if stock_elem else ""
+        return product
+
+    def _details(self, product_soup) -> Dict:
+        details = {}
+        img_elem, _ = self.page_img_chain.first(product_soup)
+        image_url = self._image_url(img_elem)
+        if image_url:
+            details["image_url"] = image_url
+
+        # Try different selectors for product description/specs
+        specs_elem, _ = self.specs_chain.first(product_soup)
+        details["specifications"] = specs_elem.get_text(strip=True) if specs_elem else "N/A"
+
+        meta_description = self.parser.select_one(product_soup, 'meta[name="description"]')
+        details["description"] = meta_description.get("content", "").strip() if meta_description else ""
+        return details
+
 class MobileSentrixScraper:
-    def __init__(self):
-        self.base_url = "https://www.mobilesentrix.com/"
+    def __init__(self, base_url="https://www.mobilesentrix.com/", response_cache=None, parser=None, checkpoint=None,
+                 retry_policy=None, lastmod_store=None, snapshot=None):
+        self.base_url = base_url
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.5",
         }
-        self.products_data = []
         self.max_pages_per_category = 2  # Limited for demo, increase for production
-        self.rate_limit_delay = 1.0  # Seconds between requests
+        self.concurrency = 8  # Worker tasks (categories scraped at once)
+        self.per_host_limit = 4  # Requests in flight per host
+        self.requests_per_second = 4.0  # Per-host token-bucket rate
+        self.scheduler = None
+        self.page_cache_chars = 64 * 1024 * 1024  # Budget for the per-run page cache
+        self.page_cache = PageCache(self.page_cache_chars)
+        self.response_cache = response_cache or default_cache()  # On-disk store reused across runs
+        self.checkpoint = checkpoint or default_checkpoint("mobilesentrix")  # Frontier and scraped records
+        self.retry_policy = retry_policy or default_policy()  # Backoff and per-host circuit breaker
+        self.discovery = DISCOVERY  # "crawl" walks the menu and listings, "sitemap" reads sitemap.xml
+        self.sitemap_url = SITEMAP_URL or urljoin(base_url, "sitemap.xml")
+        self.sitemap_include = SITEMAP_INCLUDE  # Pattern for product URLs in the sitemap
+        self.sitemap_batch = 500  # Sitemap product pages scraped per batch
+        self.lastmod_store = lastmod_store or default_lastmod_store("mobilesentrix")  # Kept across runs
+        self.snapshot = snapshot or default_snapshot("mobilesentrix")  # Listing cards of the last run, kept across runs
+        self.incremental = INCREMENTAL  # Skip product pages whose listing card or sitemap lastmod is unchanged
+        self.output_dir = 'output'
+        self.sink_formats = SINK_FORMATS  # Files written as products are scraped
+        self.sink = None
+        self.parse_workers = PARSE_WORKERS  # Processes for parsing; 0 parses on the event loop
+        # Workers get the backend by name; a backend object is not picklable
+        self.extraction = ExtractionPool(MobileSentrixExtractor, (base_url, getattr(parser, "name", parser)))
+        self.parser = self.extraction.parser
 
     async def fetch_page(self, session: aiohttp.ClientSession, url: str) -> str:
-        """Fetch page content with rate limiting."""
-        try:
-            async with session.get(url, headers=self.headers) as response:
-                if response.status == 200:
-                    return await response.text()
-                logger.error(f"Failed to fetch {url}: Status {response.status}")
+        """
+        Fetch page content with rate limiting.
+
+        Repeats within a run are served from the page cache. Pages stored by an
+        earlier run are revalidated with a conditional request, and in offline
+        mode they are replayed from the response cache without a request.
+        Failures are retried under the retry policy; the backoff is awaited
+        outside the host's throttle slot, so other requests keep going.
+        """
+        cached = self.page_cache.get(url)
+        if cached is not None:
+            return cached
+        if self.response_cache.offline:
+            html = self.response_cache.replay(url)
+            if html is not None:
+                self.page_cache.put(url, html)
+            return html
+        headers = {**self.headers, **self.response_cache.headers_for(url)}
+        for attempt in range(self.retry_policy.attempts):
+            if not self.retry_policy.allow(url):
+                logger.error(f"Circuit open for {self.retry_policy.host(url)}, not fetching {url}")
                 return None
-        except Exception as e:
-            logger.error(f"Error fetching {url}: {e}")
-            return None
+            status, response_headers, error = None, None, None
+            try:
+                async with self.scheduler.throttle(url), session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        html = self.response_cache.revalidated(url)
+                    elif response.status == 200:
+                        html = await response.text()
+                        self.response_cache.store(url, html, response.headers)
+                    else:
+                        html = None
+                    if html is not None:
+                        self.retry_policy.succeeded(url)
+                        self.page_cache.put(url, html)
+                        return html
+                    status, response_headers = response.status, response.headers
+                logger.error(f"Failed to fetch {url}: Status {status} (attempt {attempt + 1})")
+            except Exception as e:
+                logger.error(f"Error fetching {url}: {e!r} (attempt {attempt + 1})")
+                error = e
+            wait = self.retry_policy.failed(url, attempt, error=error, status=status, headers=response_headers)
+            if wait is None:
+                return None
+            await asyncio.sleep(wait)
+        return None
 
     async def get_category_links(self, session: aiohttp.ClientSession) -> List[str]:
         """Extract category links from the homepage."""
@@ -44,40 +384,14 @@ class MobileSentrixScraper:
         if not homepage:
             return []
 
-        soup = BeautifulSoup(homepage, 'html.parser')
-        category_links = []
-
-        # Try different selectors for navigation menu
-        nav_selectors = [
-            "ul.nav-menu li.nav-item a",
-            "nav ul li a",
-            ".navigation a",
-            ".menu a",
-            ".categories a"
-        ]
-
-        for selector in nav_selectors:
-            nav_menu = soup.select(selector)
-            if nav_menu:
-                logger.info(f"Found navigation menu with selector: {selector}")
-                break
-
-        # If no predefined selector works, try to find links with category in URL
-        if not nav_menu:
-            nav_menu = [a for a in soup.find_all('a') if 'category' in a.get('href', '').lower()]
-
-        for link in nav_menu:
-            href = link.get('href', '')
-            if href and not href.startswith('#') and ('category' in href.lower() or 'product' in href.lower()):
-                full_url = urljoin(self.base_url, href)
-                category_links.append(full_url)
-
+        category_links = await self.extraction.run("category_links", homepage)
         logger.info(f"Found {len(category_links)} category links")
         return list(set(category_links))  # Remove duplicates
 
     async def scrape_category(self, session: aiohttp.ClientSession, category_url: str):
         """Scrape products from a category across its pages."""
         page = 1
+        failed_products = 0
         while page <= self.max_pages_per_category:
             # Try different pagination formats
             pagination_formats = [
@@ -91,364 +405,400 @@ class MobileSentrixScraper:
 
             html = await self.fetch_page(session, page_url)
             if not html:
+                if page == 1:
+                    self.checkpoint.mark_failed(category_url, "category", f"Failed to fetch {page_url}")
+                    return
                 break
 
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # Try different product grid selectors
-            product_selectors = [
-                "div.product-card",
-                ".product-item",
-                ".product",
-                "li.product",
-                ".item.product"
-            ]
-
-            products = []
-            for selector in product_selectors:
-                products = soup.select(selector)
-                if products:
-                    logger.info(f"Found products with selector: {selector}")
-                    break
-
-            if not products:
+            cards = await self.extraction.run("product_cards", html)
+            if not cards:
                 logger.info(f"No products found in {category_url} at page {page}")
                 break
 
-            for product in products:
-                try:
-                    product_data = await self.parse_product(product, session)
-                    if product_data:
-                        self.products_data.append(product_data)
-                except Exception as e:
-                    logger.error(f"Error parsing product: {e}")
+            # Complete the cards concurrently; the scheduler bounds requests per host
+            results = await asyncio.gather(
+                *(self.parse_product(card, session) for card in cards),
+                return_exceptions=True
+            )
+            for product_data in results:
+                if isinstance(product_data, Exception):
+                    logger.error(f"Error parsing product: {product_data}")
+            failed_products += sum(
+                1 for card in cards
+                if card["product_url"] and self.checkpoint.state(card["product_url"]) == FAILED
+            )
 
             page += 1
-            await asyncio.sleep(self.rate_limit_delay)  # Respect rate limiting
-
-    async def parse_product(self, product: BeautifulSoup, session: aiohttp.ClientSession) -> Dict:
-        """Parse individual product data."""
-        try:
-            # Try different selectors for product name
-            name_selectors = [
-                "h2.product-title a",
-                "a.product-link",
-                ".product-name a",
-                "h3 a",
-                ".item-title a",
-                ".product-item-link",
-                ".product-title",
-                "h2 a",
-                ".item-name"
-            ]
 
-            name_elem = None
-            for selector in name_selectors:
-                name_elem = product.select_one(selector)
-                if name_elem:
-                    logger.info(f"Found product name with selector: {selector}")
-                    break
-
-            name = name_elem.get_text(strip=True) if name_elem else "N/A"
-            product_url = urljoin(self.base_url, name_elem['href']) if name_elem and name_elem.get('href') else None
-
-            # If we couldn't find a name, try to extract it from the URL
-            if name == "N/A" and product_url:
-                url_parts = product_url.split('/')
-                if url_parts and len(url_parts) > 0:
-                    last_part = url_parts[-1]
-                    if last_part:
-                        name = last_part.replace('-', ' ').title()
-
-            # Try different selectors for price
-            price_selectors = [
-                "span.price--main",
-                "span.price",
-                ".product-price",
-                ".price-box",
-                ".amount",
-                ".price-container",
-                ".special-price",
-                "[data-price-type=finalPrice]"
-            ]
+        # Leave the category to be revisited on resume while any of its product pages failed
+        if failed_products:
+            self.checkpoint.mark_failed(category_url, "category", f"{failed_products} product pages failed")
+        else:
+            self.checkpoint.mark_done(category_url, "category")
 
-            price_elem = None
-            for selector in price_selectors:
-                price_elem = product.select_one(selector)
-                if price_elem:
-                    logger.info(f"Found price with selector: {selector}")
-                    break
-
-            price = price_elem.get_text(strip=True) if price_elem else "N/A"
-
-            # Clean up price - extract only numbers and decimal point
-            if price != "N/A":
-                # First, try to find a pattern like $XX.XX
-                price_match = re.search(r'\$?\s*(\d+\.?\d*)', price)
-                if price_match:
-                    price = price_match.group(1)
-                else:
-                    # If no match, just remove all non-numeric characters except decimal point
-                    price = re.sub(r'[^\d.]', '', price)
-
-                # Ensure we have a valid number
-                try:
-                    price = float(price)
-                except ValueError:
-                    price = None
-            else:
-                price = None
+    async def parse_product(self, card: Dict, session: aiohttp.ClientSession) -> Dict:
+        """
+        Complete a product card with its product page details and store it in
+        the checkpoint. In incremental mode a card unchanged since the last run
+        reuses the record stored in the listing snapshot instead.
+        """
+        try:
+            name = card["name"]
+            price = card["price"]
+            product_url = card["product_url"]
 
-            # Try different selectors for image
-            img_selectors = [
-                "img.product-img",
-                "img.primary-image",
-                ".product-image img",
-                ".product-photo img",
-                "img.main-image",
-                ".product-item-photo img",
-                ".product img",
-                "img[data-role=product-image]",
-                "img"
-            ]
+            # Skip products already scraped from another category, page or an earlier run
+            if product_url and (not self.scheduler.first_visit(product_url) or self.checkpoint.is_done(product_url)):
+                return None
 
-            img_elem = None
-            for selector in img_selectors:
-                img_elem = product.select_one(selector)
-                if img_elem:
-                    logger.info(f"Found image with selector: {selector}")
-                    break
+            fingerprint = listing_fingerprint(card)
+            stored = self.snapshot.lookup(product_url, fingerprint) if product_url else None
+            if stored is not None and self.incremental:
+                self.checkpoint.add_record(product_url, stored)
+                self.sink.write(self._clean_product(stored))
+                self.checkpoint.mark_done(product_url, "product")
+                return stored
 
-            # Try different image attributes (src, data-src, etc.)
-            img_url = None
-            if img_elem:
-                for attr in ['src', 'data-src', 'data-original', 'data-lazy-src']:
-                    if img_elem.get(attr):
-                        img_url = urljoin(self.base_url, img_elem[attr])
-                        break
-
-            # If still no image, try to find it in the product page
-            if not img_url and product_url:
-                try:
-                    product_html = await self.fetch_page(session, product_url)
-                    if product_html:
-                        product_soup = BeautifulSoup(product_html, 'html.parser')
-                        for selector in img_selectors:
-                            img_elem = product_soup.select_one(selector)
-                            if img_elem:
-                                for attr in ['src', 'data-src', 'data-original', 'data-lazy-src']:
-                                    if img_elem.get(attr):
-                                        img_url = urljoin(self.base_url, img_elem[attr])
-                                        break
-                                if img_url:
-                                    break
-                except Exception as e:
-                    logger.error(f"Error fetching product page for image: {e}")
+            # Fetch the product page once for specs, description and a fallback image
+            details = {}
+            if product_url:
+                details = await self.fetch_product_details(session, product_url)
+            page_fetched = details is not None
+            details = details or {}
+            img_url = card["image_url"] or details.get("image_url")
+            specs = details.get("specifications", "N/A")
 
             # Extract category from URL or breadcrumbs
-            category = "Unknown"
-            if product_url:
-                url_parts = product_url.split('/')
-                for part in url_parts:
-                    if part and part not in ['www.mobilesentrix.com', 'https:', '', 'product']:
-                        category = part.replace('-', ' ').title()
-                        break
-
-            # Fetch product page for specs
-            specs = "N/A"
-            if product_url:
-                product_html = await self.fetch_page(session, product_url)
-                if product_html:
-                    product_soup = BeautifulSoup(product_html, 'html.parser')
-
-                    # Try different selectors for product description/specs
-                    specs_selectors = [
-                        "div.product-description",
-                        "div.specs-table",
-                        ".product-details",
-                        ".product-info",
-                        "#product-details"
-                    ]
-
-                    specs_elem = None
-                    for selector in specs_selectors:
-                        specs_elem = product_soup.select_one(selector)
-                        if specs_elem:
-                            break
-
-                    specs = specs_elem.get_text(strip=True) if specs_elem else "N/A"
+            category = self._category(product_url)
 
             # Create product data dictionary
             product_data = {
                 "name": name,
-                "price": price,  # Already converted to float in the price extraction section
+                "price": price,  # Already converted to float by the extractor
                 "image_url": img_url,
                 "specifications": specs,
+                "description": details.get("description", ""),
                 "product_url": product_url,
-                "category": category
+                "category": category,
+                "stock": card.get("stock", "")
             }
 
             # Log the extracted product data
             logger.info(f"Extracted product: {name}, Price: {price}, Category: {category}")
 
+            # Store the record before marking the page done, so a checkpoint never skips a lost record
+            self.checkpoint.add_record(product_url, product_data)
+            self.sink.write(self._clean_product(product_data))
+            if product_url and page_fetched:
+                self.checkpoint.mark_done(product_url, "product")
+                self.snapshot.store(product_url, fingerprint, product_data)
+            elif product_url:
+                # Keep the card data, but fetch the product page again on resume
+                self.checkpoint.mark_failed(product_url, "product", "Product page not fetched")
+
             return product_data
         except Exception as e:
             logger.error(f"Error parsing product: {e}")
+            if card.get("product_url"):
+                self.checkpoint.mark_failed(card["product_url"], "product", e)
             return None
 
-    async def save_to_csv(self, filename: str = "mobilesentrix_products.csv"):
-        """Save scraped data to CSV and other formats."""
-        if not self.products_data:
-            logger.warning("No data to save")
+    @staticmethod
+    def _category(product_url):
+        """Guess a product's category from its URL."""
+        category = "Unknown"
+        if product_url:
+            url_parts = product_url.split('/')
+            for part in url_parts:
+                if part and part not in ['www.mobilesentrix.com', 'https:', '', 'product']:
+                    category = part.replace('-', ' ').title()
+                    break
+        return category
+
+    async def seed_from_sitemap(self, session: aiohttp.ClientSession, resume: bool = False) -> bool:
+        """
+        Add the sitemap's product URLs to the frontier as pending; False if
+        the sitemap listed no URLs at all. In incremental mode only URLs that
+        are new or whose lastmod moved are added, and the stored record of
+        every other listed URL is written to the sink, so the output keeps the
+        unchanged products. A resumed run keeps the frontier and records it
+        already has.
+        """
+        if resume and self.checkpoint.counts("product"):
+            logger.info(f"Resuming: {self.checkpoint.format_summary()}")
+            return True
+
+        listed = seeded = reused = 0
+        batch = []
+        self.lastmod_store.new_listing()
+
+        def seed(entries):
+            changed, unchanged = self.lastmod_store.split(entries, reuse=self.incremental)
+            self.checkpoint.add_pending_many("product", ((url, {"lastmod": lastmod}) for url, lastmod in changed))
+            for url, record in unchanged:
+                self.checkpoint.add_record(url, record)
+                self.sink.write(self._clean_product(record))
+                self.checkpoint.mark_done(url, "product")
+            return len(changed), len(unchanged)
+
+        async for url, lastmod in iter_sitemap(session, self.sitemap_url, self.scheduler.throttle,
+                                               self.sitemap_include):
+            listed += 1
+            batch.append((url, lastmod))
+            if len(batch) >= 10000:
+                changed, unchanged = seed(batch)
+                seeded, reused = seeded + changed, reused + unchanged
+                batch = []
+        changed, unchanged = seed(batch)
+        seeded, reused = seeded + changed, reused + unchanged
+        logger.info(f"Sitemap {self.sitemap_url}: {listed} URLs listed, "
+                    f"{seeded} to crawl, {reused} unchanged since the last run reused, "
+                    f"{listed - seeded - reused} listed more than once")
+        return listed > 0
+
+    async def scrape_sitemap_products(self, session: aiohttp.ClientSession):
+        """Scrape the pending (and, on resume, failed) product pages of the frontier, a batch at a time."""
+        for batch in self.checkpoint.batches("product", [PENDING, FAILED], self.sitemap_batch):
+            results = await asyncio.gather(
+                *(self.scrape_product_page(session, url, data) for url, data in batch),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error scraping product page: {result}")
+
+    async def scrape_product_page(self, session: aiohttp.ClientSession, product_url: str, data: Dict = None) -> Dict:
+        """Scrape a product straight from its page and record the sitemap lastmod it was scraped at."""
+        try:
+            if self.checkpoint.is_done(product_url):
+                return None
+            product_html = await self.fetch_page(session, product_url)
+            if not product_html:
+                self.checkpoint.mark_failed(product_url, "product", "Product page not fetched")
+                return None
+            product_data = await self.extraction.run("product_page", product_html)
+            product_data["product_url"] = product_url
+            product_data["category"] = self._category(product_url)
+            logger.info(f"Extracted product: {product_data['name']}, Price: {product_data['price']}")
+
+            self.checkpoint.add_record(product_url, product_data)
+            self.sink.write(self._clean_product(product_data))
+            self.checkpoint.mark_done(product_url, "product")
+            self.lastmod_store.record(product_url, (data or {}).get("lastmod"), product_data)
+            return product_data
+        except Exception as e:
+            logger.error(f"Error parsing product page {product_url}: {e}")
+            self.checkpoint.mark_failed(product_url, "product", e)
+            return None
+
+    async def fetch_product_details(self, session: aiohttp.ClientSession, product_url: str) -> Dict:
+        """Fetch and parse a product page once, extracting image, specs and description; None if not fetched."""
+        product_html = await self.fetch_page(session, product_url)
+        if not product_html:
+            return None
+        return await self.extraction.run("product_details", product_html)
+
+    def _clean_product(self, product: Dict) -> Dict:
+        """Ensure all required fields have values."""
+        return {
+            "name": product.get("name", "Unknown Product"),
+            "price": product.get("price"),
+            "image_url": product.get("image_url", ""),
+            "specifications": product.get("specifications", "N/A"),
+            "description": product.get("description", ""),
+            "product_url": product.get("product_url", ""),
+            "category": product.get("category", "Unknown"),
+            "stock": product.get("stock", "")
+        }
+
+    def _open_sink(self, resume: bool):
+        """Start the record sink, replaying the records of a resumed checkpoint first."""
+        self.sink = RecordSink(self.output_dir, "mobilesentrix_products", PRODUCT_FIELDS, self.sink_formats)
+        if resume:
+            for product in self.checkpoint.records():
+                # Records of failed product pages are written again when they are retried
+                if self.checkpoint.state(product["product_url"]) != FAILED:
+                    self.sink.write(self._clean_product(product))
+
+    async def save_to_csv(self):
+        """
+        Finish the output files: close the record sink (CSV, JSONL, Parquet),
+        then stream its records back once to write the per-category CSVs, the
+        text and JSON files and the (paginated) HTML report.
+        """
+        if not self.sink or not self.sink.count:
+            logger.warning("No data to save; keeping the previous output files")
+            if self.sink:
+                self.sink.discard()
             return None
 
-        # Create a directory for output if it doesn't exist
-        os.makedirs('output', exist_ok=True)
-        filepath = os.path.join('output', filename)
-
-        # Clean up the data - ensure all required fields are present
-        cleaned_data = []
-        for product in self.products_data:
-            if product and isinstance(product, dict):
-                # Ensure all required fields have values
-                cleaned_product = {
-                    "name": product.get("name", "Unknown Product"),
-                    "price": product.get("price"),
-                    "image_url": product.get("image_url", ""),
-                    "specifications": product.get("specifications", "N/A"),
-                    "product_url": product.get("product_url", ""),
-                    "category": product.get("category", "Unknown")
-                }
-                cleaned_data.append(cleaned_product)
-
-        # Create DataFrame and save to CSV
-        df = pd.DataFrame(cleaned_data)
-        df.to_csv(filepath, index=False, encoding='utf-8')
-        logger.info(f"Saved {len(cleaned_data)} products to {filepath}")
-
-        # Create a more organized version with categories
-        if 'category' in df.columns:
-            categories = df['category'].unique()
-            for category in categories:
-                if pd.notna(category):  # Skip NaN categories
-                    category_df = df[df['category'] == category]
-                    safe_category = str(category).lower().replace(' ', '_')
-                    category_filename = f"mobilesentrix_{safe_category}.csv"
-                    category_filepath = os.path.join('output', category_filename)
-                    category_df.to_csv(category_filepath, index=False, encoding='utf-8')
-                    logger.info(f"Saved {len(category_df)} {category} products to {category_filepath}")
-
-        # Save as plain text file for easier viewing
-        text_filepath = os.path.join('output', 'mobilesentrix_products.txt')
-        with open(text_filepath, 'w', encoding='utf-8') as f:
-            f.write("Name\tPrice\tURL\tImage URL\n")
-            for product in cleaned_data:
+        self.sink.close()
+        filepath = self.sink.paths.get("csv", self.sink.paths["jsonl"])
+        for path in self.sink.paths.values():
+            logger.info(f"Saved {self.sink.count} products to {path}")
+
+        text_filepath = os.path.join(self.output_dir, 'mobilesentrix_products.txt')
+        json_filepath = os.path.join(self.output_dir, 'mobilesentrix_products.json')
+        html_filepath = os.path.join(self.output_dir, 'mobilesentrix_report.html')
+        category_files = {}
+
+        def products():
+            # One pass over the sink feeds every file as the HTML report pulls the records through
+            for i, product in enumerate(self.sink.records()):
+                # Create a more organized version with categories
+                category = product.get("category")
+                if category is not None:  # Skip missing categories
+                    if category not in category_files:
+                        category_files[category] = self._open_category_csv(category)
+                    category_files[category][1].writerow(product)
+                    category_files[category][2] += 1
+
+                # Save as plain text file for easier viewing
                 name = product.get("name", "")
                 price = product.get("price", "")
                 url = product.get("product_url", "")
                 image_url = product.get("image_url", "")
-                f.write(f"{name}\t{price}\t{url}\t{image_url}\n")
+                text_file.write(f"{name}\t{price}\t{url}\t{image_url}\n")
+
+                # Save as JSON for easier programmatic access, laid out like json.dump(..., indent=2)
+                json_file.write(("," if i else "") + "\n  " + json.dumps(product, indent=2).replace("\n", "\n  "))
+                yield product
+
+        with open(text_filepath, 'w', encoding='utf-8') as text_file, \
+                open(json_filepath, 'w', encoding='utf-8') as json_file:
+            text_file.write("Name\tPrice\tURL\tImage URL\n")
+            json_file.write("[")
+            try:
+                report = self._generate_html_report(html_filepath, products(), self.sink.count)
+            finally:
+                for category, (category_file, _, count, category_filepath) in category_files.items():
+                    category_file.close()
+                    logger.info(f"Saved {count} {category} products to {category_filepath}")
+            json_file.write("\n]")
         logger.info(f"Saved products to text file: {text_filepath}")
-
-        # Save as JSON for easier programmatic access
-        json_filepath = os.path.join('output', 'mobilesentrix_products.json')
-        import json
-        with open(json_filepath, 'w', encoding='utf-8') as f:
-            json.dump(cleaned_data, f, indent=2)
         logger.info(f"Saved products to JSON file: {json_filepath}")
-
-        # Generate HTML report
-        html_filepath = os.path.join('output', 'mobilesentrix_report.html')
-        with open(html_filepath, 'w', encoding='utf-8') as f:
-            f.write(self._generate_html_report(cleaned_data))
-        logger.info(f"Generated HTML report: {html_filepath}")
+        logger.info(f"Generated HTML report: {html_filepath} "
+                    f"({len(report['paths'])} pages, {report['reused']} unchanged since the last run)")
 
         return filepath
 
-    def _generate_html_report(self, products):
-        """Generate an HTML report of the scraped products."""
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>MobileSentrix Scraper Report</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; }}
-                .container {{ max-width: 1200px; margin: 0 auto; }}
-                h1, h2 {{ color: #333; }}
-                .stats {{ background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
-                .product-grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(250px, 1fr)); gap: 20px; }}
-                .product-card {{ border: 1px solid #ddd; border-radius: 5px; padding: 15px; }}
-                .product-image {{ width: 100%; height: 200px; object-fit: contain; }}
-                .product-title {{ font-weight: bold; margin: 10px 0 5px; }}
-                .product-price {{ color: #e63946; font-weight: bold; }}
-                .product-category {{ color: #666; font-size: 0.9em; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>MobileSentrix Scraper Report</h1>
-
-                <div class="stats">
-                    <p><strong>Total Products:</strong> {len(products)}</p>
-                    <p><strong>Scrape Date:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                </div>
-
-                <h2>Products</h2>
-                <div class="product-grid">
+    def _write_delta(self):
         """
-
-        # Add product cards
-        for product in products:
-            name = product.get("name", "Unknown Product")
-            price = product.get("price", "N/A")
-            image_url = product.get("image_url", "")
-            product_url = product.get("product_url", "")
-            category = product.get("category", "Unknown")
-
-            # Format price nicely
-            price_display = f"${price:.2f}" if isinstance(price, (int, float)) else price
-
-            html += f"""
-                    <div class="product-card">
-                        <img src="{image_url}" class="product-image" onerror="this.src='data:image/svg+xml;charset=UTF-8,%3Csvg%20width%3D%22200%22%20height%3D%22200%22%20xmlns%3D%22http%3A%2F%2Fwww.w3.org%2F2000%2Fsvg%22%20viewBox%3D%220%200%20200%20200%22%20preserveAspectRatio%3D%22none%22%3E%3Cdefs%3E%3Cstyle%20type%3D%22text%2Fcss%22%3E%23holder_1687a4b89fe%20text%20%7B%20fill%3A%23AAAAAA%3Bfont-weight%3Abold%3Bfont-family%3AArial%2C%20Helvetica%2C%20Open%20Sans%2C%20sans-serif%2C%20monospace%3Bfont-size%3A10pt%20%7D%20%3C%2Fstyle%3E%3C%2Fdefs%3E%3Cg%20id%3D%22holder_1687a4b89fe%22%3E%3Crect%20width%3D%22200%22%20height%3D%22200%22%20fill%3D%22%23EEEEEE%22%3E%3C%2Frect%3E%3Cg%3E%3Ctext%20x%3D%2274.4296875%22%20y%3D%22104.5%22%3ENo%20Image%3C%2Ftext%3E%3C%2Fg%3E%3C%2Fg%3E%3C%2Fsvg%3E';">
-                        <div class="product-title">{name}</div>
-                        <div class="product-price">{price_display}</div>
-                        <div class="product-category">{category}</div>
-                        <a href="{product_url}" target="_blank">View Product</a>
-                    </div>
-            """
-
-        html += """
-                </div>
-            </div>
-        </body>
-        </html>
+        Write the products inserted, updated or removed since the last delta to
+        mobilesentrix_delta.*; removals are only reported after a crawl in which
+        every category was scraped.
+        """
+        if self.checkpoint.counts("category").get(FAILED):
+            logger.warning("Some categories failed; removed products are not reported this run")
+        else:
+            self.snapshot.mark_removed()
+        summary = self.snapshot.format_summary()
+        with RecordSink(self.output_dir, "mobilesentrix_delta", DELTA_FIELDS, self.sink_formats) as delta:
+            for change, record in self.snapshot.changes():
+                delta.write({"change": change, **self._clean_product(record)})
+        self.snapshot.mark_reported()
+        logger.info(f"{summary}; saved to {delta.paths['jsonl']}")
+
+    def _open_category_csv(self, category):
+        """Return [file, csv writer, row count, path] for a category's CSV file."""
+        safe_category = str(category).lower().replace(' ', '_')
+        category_filepath = os.path.join(self.output_dir, f"mobilesentrix_{safe_category}.csv")
+        category_file = open(category_filepath, 'w', newline='', encoding='utf-8')
+        writer = csv.DictWriter(category_file, fieldnames=list(PRODUCT_FIELDS))
+        writer.writeheader()
+        return [category_file, writer, 0, category_filepath]
+
+    def _generate_html_report(self, path, products, total):
+        """Write the HTML report of the scraped products to path, one page at a time."""
+        return write_report(
+            path,
+            products,
+            "MobileSentrix Scraper Report",
+            total=total,
+            stats=[
+                ("Total Products", total),
+                ("Scrape Date", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            ],
+            fields={"image": "image_url", "url": "product_url"}
+        )
+
+    async def crawl(self, session: aiohttp.ClientSession, resume: bool = False) -> bool:
         """
+        Scrape every category through the crawl scheduler; False if none were found.
+
+        Progress is checkpointed as it goes. With resume=True the categories
+        come from the checkpoint instead of the homepage, finished categories
+        are skipped and finished product pages are not fetched again.
 
-        return html
+        With discovery = "sitemap" the product pages listed in the sitemap are
+        scraped directly instead; with incremental = True those unchanged
+        since the last run are skipped.
 
-    async def run(self):
+        A listing crawl also compares every product card with the listing
+        snapshot and writes the inserted/updated/removed delta; with
+        incremental = True only new and changed products' pages are fetched.
+        """
+        self.scheduler = CrawlScheduler(self.concurrency, self.per_host_limit, self.requests_per_second)
+        self.page_cache = PageCache(self.page_cache_chars)
+        self.checkpoint.start(resume)
+        self.snapshot.start(resume)
+        self._open_sink(resume)
+        self.extraction.start(self.parse_workers)
+        try:
+            if self.discovery == "sitemap":
+                if not await self.seed_from_sitemap(session, resume):
+                    return False
+                self.scheduler.add(self.sitemap_url, self.scrape_sitemap_products, session)
+            else:
+                known = self.checkpoint.urls("category") if resume else []
+                if known:
+                    logger.info(f"Resuming: {self.checkpoint.format_summary()}")
+                category_links = [url for url, _ in known] or await self.get_category_links(session)
+                if not category_links:
+                    return False
+
+                for category_url in category_links:
+                    self.checkpoint.add_pending(category_url, "category")
+                    if not self.checkpoint.is_done(category_url):
+                        self.scheduler.add(category_url, self.scrape_category, session, category_url)
+            await self.scheduler.run()
+        finally:
+            self.extraction.close()
+            self.checkpoint.flush()
+            self.lastmod_store.flush()
+            self.snapshot.flush()
+            self.sink.flush()
+        self.scheduler.log_summary()
+        logger.info(f"Page cache: {self.page_cache.hits} hits, {self.page_cache.misses} misses")
+        logger.info(self.response_cache.format_summary())
+        logger.info(self.retry_policy.format_summary())
+        logger.info(self.parser.format_summary())
+        logger.info(self.checkpoint.format_summary())
+        if self.discovery != "sitemap":
+            self._write_delta()
+        return True
+
+    async def run(self, resume: bool = False):
         """Main scraping loop."""
         async with aiohttp.ClientSession() as session:
-            category_links = await self.get_category_links(session)
-            if not category_links:
-                logger.error("No category links found. Exiting.")
-                return
-
-            for category_url in category_links:
-                await self.scrape_category(session, category_url)
-                await asyncio.sleep(self.rate_limit_delay)  # Delay between categories
-
-            csv_file = await self.save_to_csv()
-            return csv_file
-
-async def main():
+            try:
+                if not await self.crawl(session, resume):
+                    logger.error(f"No {'sitemap URLs' if self.discovery == 'sitemap' else 'category links'} found. Exiting.")
+                    return
+
+                csv_file = await self.save_to_csv()
+                return csv_file
+            finally:
+                # A crawl that failed or found nothing leaves the previous output files alone
+                if self.sink:
+                    self.sink.discard()
+
+async def main(resume: bool = False, discovery: str = None, incremental: bool = False):
     logger.info("Starting MobileSentrix scraper...")
     scraper = MobileSentrixScraper()
-    csv_file = await scraper.run()
+    scraper.discovery = discovery or scraper.discovery
+    scraper.incremental = incremental or scraper.incremental
+    csv_file = await scraper.run(resume)
     if csv_file:
         logger.info(f"Scraping completed. Data saved to {csv_file}")
     else:
@@ -458,4 +808,15 @@ if platform.system() == "Emscripten":
     asyncio.ensure_future(main())
 else:
     if __name__ == "__main__":
-        asyncio.run(main())
+        arg_parser = argparse.ArgumentParser(description="Scrape the MobileSentrix catalog")
+        arg_parser.add_argument("--resume", action="store_true",
+                                help="continue the last interrupted crawl from its checkpoint")
+        arg_parser.add_argument("--discovery", choices=["crawl", "sitemap"], default=None,
+                                help="find products through the menu and listings or from sitemap.xml "
+                                     "(default: SCRAPER_DISCOVERY or crawl)")
+        arg_parser.add_argument("--incremental", action="store_true",
+                                help="fetch product pages only for new products and changed listing cards "
+                                     "or sitemap lastmods "
+                                     "(default: SCRAPER_INCREMENTAL)")
+        args = arg_parser.parse_args()
+        asyncio.run(main(args.resume, args.discovery, args.incremental))
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Page Parser
+-----------
+Pluggable HTML parser backend for the BeautifulSoup scrapers
+(MobileSentrixScraper, DatabaseScraper).
+
+Backends:
+    lxml   lxml.html with CSS selectors compiled to XPath by cssselect
+           (used by default when both are installed)
+    bs4    BeautifulSoup with html.parser, as the scrapers always did
+
+Both return nodes with the subset of the BeautifulSoup API the scrapers use:
+select(), select_one(), get(), [attr], .text and get_text(strip=...).
+Set SCRAPER_PARSER=bs4 or SCRAPER_PARSER=lxml to force a backend.
+
+Selectors are compiled once per process. Fallback cascades are wrapped in a
+SelectorChain, which remembers the selector that won for a page layout; on
+the next node with that layout one combined lookup confirms the selectors
+ahead of it still miss, and the winner is tried straight away. PageParser
+keeps per-page parse and select timings.
+
+Parsing is CPU-bound and blocks the scrapers' event loop while it runs.
+ExtractionPool runs a scraper's page extractor either inline or, with
+SCRAPER_PARSE_WORKERS=N, on N worker processes through run_in_executor:
+page text goes in and plain dicts come out, so parse trees never cross
+the process boundary and the loop stays free for I/O.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import soupsieve
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+    from cssselect import HTMLTranslator
+except ImportError:  # lxml or cssselect not installed; the bs4 backend still works
+    lxml = None
+
+logger = logging.getLogger("page_parser")
+
+PARSER = os.environ.get("SCRAPER_PARSER", "")
+PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS", "0"))
+
+class Bs4Backend:
+    """BeautifulSoup with the html.parser tree builder."""
+
+    name = "bs4"
+
+    def parse(self, html):
+        return BeautifulSoup(html, 'html.parser')
+
+    def compile(self, selector):
+        # SoupSieve objects already offer select()/select_one() on a tag
+        return soupsieve.compile(selector)
+
+    def layout_key(self, node):
+        return (node.name, " ".join(node.get('class', [])))
+
+class LxmlNode:
+    """An lxml element exposing the BeautifulSoup methods the scrapers use."""
+
+    __slots__ = ("element", "document")
+
+    def __init__(self, element, document=False):
+        self.element = element
+        self.document = document
+
+    def get(self, name, default=None):
+        return self.element.get(name, default)
+
+    def __getitem__(self, name):
+        value = self.element.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    @property
+    def text(self):
+        return "".join(LxmlBackend.TEXT(self.element))
+
+    def get_text(self, strip=False):
+        if not strip:
+            return self.text
+        return "".join(piece.strip() for piece in LxmlBackend.TEXT(self.element) if piece.strip())
+
+    def select(self, selector):
+        return LXML_BACKEND.compile(selector).select(self)
+
+    def select_one(self, selector):
+        return LXML_BACKEND.compile(selector).select_one(self)
+
+class LxmlSelector:
+    """A CSS selector compiled to XPath, for whole documents and for elements."""
+
+    def __init__(self, selector):
+        translator = HTMLTranslator()
+        # Like BeautifulSoup, an element's select() only matches its descendants
+        self.in_document = etree.XPath(translator.css_to_xpath(selector, prefix="descendant-or-self::"))
+        self.in_element = etree.XPath(translator.css_to_xpath(selector, prefix="descendant::"))
+
+    def select(self, node):
+        xpath = self.in_document if node.document else self.in_element
+        return [LxmlNode(element) for element in xpath(node.element)]
+
+    def select_one(self, node):
+        xpath = self.in_document if node.document else self.in_element
+        matches = xpath(node.element)
+        return LxmlNode(matches[0]) if matches else None
+
+class LxmlBackend:
+    """lxml.html parsing with cssselect-compiled XPath selectors."""
+
+    name = "lxml"
+    TEXT = etree.XPath(".//text()", smart_strings=False) if lxml else None
+
+    def __init__(self):
+        self._parser = lxml.html.HTMLParser(encoding="utf-8")
+        self._selectors = {}
+
+    def parse(self, html):
+        # Encode first: lxml rejects str input that carries an XML encoding declaration
+        data = html.encode("utf-8") if html and html.strip() else b"<html></html>"
+        return LxmlNode(lxml.html.document_fromstring(data, parser=self._parser), document=True)
+
+    def compile(self, selector):
+        if selector not in self._selectors:
+            self._selectors[selector] = LxmlSelector(selector)
+        return self._selectors[selector]
+
+    def layout_key(self, node):
+        return (node.element.tag, " ".join(node.element.get('class', '').split()))
+
+BS4_BACKEND = Bs4Backend()
+LXML_BACKEND = LxmlBackend() if lxml else None
+
+def get_backend(name=None):
+    """Return the named backend, or lxml when available and bs4 otherwise."""
+    name = name or PARSER
+    if name == "bs4":
+        return BS4_BACKEND
+    if LXML_BACKEND is None:
+        logger.warning("lxml/cssselect not installed (see requirements.txt); "
+                       "parsing with the slower BeautifulSoup backend")
+        return BS4_BACKEND
+    return LXML_BACKEND
+
+class SelectorChain:
+    """
+    Ordered fallback selectors, compiled once.
+
+    The first selector that matches wins, as in the scrapers' original loops.
+    The winner is remembered per layout key. On the next node with the same
+    layout, the selectors ahead of it are checked with one combined
+    selector; if none of them match, the winner's match is the cascade's
+    answer, so a consistent page template costs two lookups instead of
+    walking the whole cascade. Otherwise the cascade runs in order.
+    """
+
+    def __init__(self, parser, selectors):
+        self.parser = parser
+        self.selectors = list(selectors)
+        self.compiled = [parser.backend.compile(selector) for selector in self.selectors]
+        self.winners = {}
+        # Selector groups matching any of the first i selectors, by i
+        self.earlier = {}
+
+    def _start(self, node, layout):
+        """Return the index to start the cascade at: the remembered winner if nothing ahead of it matches."""
+        winner = self.winners.get(layout, 0)
+        if winner:
+            if winner not in self.earlier:
+                self.earlier[winner] = self.parser.backend.compile(", ".join(self.selectors[:winner]))
+            if self.earlier[winner].select_one(node) is not None:
+                return 0
+        return winner
+
+    def first(self, node, layout=None):
+        """Return (element, selector) for the first selector with a match, or (None, None)."""
+        start = time.perf_counter()
+        try:
+            for i in range(self._start(node, layout), len(self.compiled)):
+                element = self.compiled[i].select_one(node)
+                if element is not None:
+                    self.winners[layout] = i
+                    return element, self.selectors[i]
+            return None, None
+        finally:
+            self.parser.select_seconds += time.perf_counter() - start
+
+    def all(self, node, layout=None):
+        """Return (elements, selector) for the first selector with any matches, or ([], None)."""
+        start = time.perf_counter()
+        try:
+            for i in range(self._start(node, layout), len(self.compiled)):
+                elements = self.compiled[i].select(node)
+                if elements:
+                    self.winners[layout] = i
+                    return elements, self.selectors[i]
+            return [], None
+        finally:
+            self.parser.select_seconds += time.perf_counter() - start
+
+class PageParser:
+    """Parses pages with one backend and accumulates parse/select timings."""
+
+    def __init__(self, backend=None):
+        self.backend = backend if hasattr(backend, "parse") else get_backend(backend)
+        self.pages = 0
+        self.parse_seconds = 0.0
+        self.select_seconds = 0.0
+
+    def parse(self, html):
+        """Parse a page into a document node."""
+        start = time.perf_counter()
+        document = self.backend.parse(html)
+        self.parse_seconds += time.perf_counter() - start
+        self.pages += 1
+        return document
+
+    def chain(self, selectors):
+        """Compile a fallback cascade of selectors."""
+        return SelectorChain(self, selectors)
+
+    def select(self, node, selector):
+        """node.select(selector) with the selector compiled once and the time recorded."""
+        start = time.perf_counter()
+        try:
+            return self.backend.compile(selector).select(node)
+        finally:
+            self.select_seconds += time.perf_counter() - start
+
+    def select_one(self, node, selector):
+        """node.select_one(selector) with the selector compiled once and the time recorded."""
+        start = time.perf_counter()
+        try:
+            return self.backend.compile(selector).select_one(node)
+        finally:
+            self.select_seconds += time.perf_counter() - start
+
+    def layout_key(self, node):
+        """Return (tag, classes) for a node, used to key remembered selector winners."""
+        return self.backend.layout_key(node)
+
+    def summary(self):
+        """Return pages parsed and mean parse/select milliseconds per page."""
+        pages = max(self.pages, 1)
+        return {
+            "backend": self.backend.name,
+            "pages": self.pages,
+            "parse_ms": self.parse_seconds * 1000 / pages,
+            "select_ms": self.select_seconds * 1000 / pages
+        }
+
+    def format_summary(self):
+        """Return a one-line description of parse and select time per page."""
+        stats = self.summary()
+        return (f"Parser ({stats['backend']}): {stats['pages']} pages, "
+                f"parse {stats['parse_ms']:.2f} ms/page, select {stats['select_ms']:.2f} ms/page")
+
+# Extractors built inside a worker process, reused for every page it is sent
+_worker_extractors = {}
+
+def _run_in_worker(factory, args, method, html):
+    """Worker-process entry point: run one extractor method, return its result and parser timings."""
+    key = (factory, args)
+    extractor = _worker_extractors.get(key)
+    if extractor is None:
+        extractor = _worker_extractors[key] = factory(*args)
+    parser = extractor.parser
+    before = (parser.pages, parser.parse_seconds, parser.select_seconds)
+    result = getattr(extractor, method)(html)
+    return result, (parser.pages - before[0], parser.parse_seconds - before[1], parser.select_seconds - before[2])
+
+class ExtractionPool:
+    """
+    Runs a page extractor's methods inline or on a pool of worker processes.
+
+    The extractor is built as factory(*args) and must have a `parser`
+    attribute (a PageParser); its methods take page HTML and return plain
+    lists and dicts. With workers, each process builds its own extractor on
+    first use, so compiled selectors and remembered winners stay warm there,
+    and the parser timings it reports are added to the local parser so
+    summaries look the same in both modes.
+    """
+
+    def __init__(self, factory, args=()):
+        self.factory = factory
+        self.args = tuple(args)
+        self.extractor = factory(*self.args)
+        self.parser = self.extractor.parser
+        self.workers = 0
+        self.executor = None
+
+    def start(self, workers=PARSE_WORKERS):
+        """Start `workers` processes; with 0, extraction runs inline on the event loop."""
+        self.close()
+        self.workers = workers
+        if workers:
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    async def run(self, method, html):
+        """Return extractor.method(html), computed in a worker process when the pool is started."""
+        if self.executor is None:
+            return getattr(self.extractor, method)(html)
+        loop = asyncio.get_running_loop()
+        result, (pages, parse_seconds, select_seconds) = await loop.run_in_executor(
+            self.executor, _run_in_worker, self.factory, self.args, method, html
+        )
+        self.parser.pages += pages
+        self.parser.parse_seconds += parse_seconds
+        self.parser.select_seconds += select_seconds
+        return result
+
+    def close(self):
+        """Shut the worker processes down."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
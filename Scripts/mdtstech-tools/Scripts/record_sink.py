@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Record Sink
+-----------
+Streaming output for scraped records. Each record is written to CSV, JSONL
+and Parquet files as it is scraped, instead of the scraper collecting a list
+and converting it to a DataFrame at the end.
+
+Records are buffered and written to every file as one batch each time the
+buffer fills (and on flush/close), so writes stay cheap and memory holds at
+most one buffer. Reports are produced afterwards by streaming the records
+back from the JSONL file with RecordSink.records().
+
+The files are written under temporary names (<name>.<extension>.tmp) and
+only renamed over the previous output by close(); discard() (or leaving a
+`with` block on an exception) deletes them instead, so a failed or empty
+run never replaces the last good output.
+
+Parquet needs pyarrow; without it the Parquet file is skipped with a warning.
+
+Configuration (environment variables):
+    SCRAPER_SINK_FORMATS   comma-separated formats to write (default "csv,jsonl,parquet";
+                           JSONL is always written, reports read it back)
+"""
+
+import os
+import csv
+import json
+import logging
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow not installed; CSV and JSONL still work
+    pa = None
+
+logger = logging.getLogger("record_sink")
+
+SINK_FORMATS = [name.strip() for name in os.environ.get("SCRAPER_SINK_FORMATS", "csv,jsonl,parquet").split(",")]
+
+class CsvRecordWriter:
+    """Appends records to a CSV file with a fixed header."""
+
+    extension = "csv"
+
+    def __init__(self, path, fields):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=list(fields))
+        self.writer.writeheader()
+
+    def write_batch(self, records):
+        self.writer.writerows(records)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class JsonlRecordWriter:
+    """Appends records to a JSON Lines file, one object per line."""
+
+    extension = "jsonl"
+
+    def __init__(self, path, fields):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write_batch(self, records):
+        self.file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class ParquetRecordWriter:
+    """Writes each batch of records as a row group of a Parquet file."""
+
+    extension = "parquet"
+    TYPES = {str: "string", float: "float64", int: "int64", bool: "bool_"}
+
+    def __init__(self, path, fields):
+        self.schema = pa.schema([(name, getattr(pa, self.TYPES[kind])()) for name, kind in fields.items()])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_batch(self, records):
+        self.writer.write_table(pa.Table.from_pylist(records, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+WRITERS = {writer.extension: writer for writer in (CsvRecordWriter, JsonlRecordWriter, ParquetRecordWriter)}
+
+class RecordSink:
+    """
+    Fan scraped records out to one file per format under `directory`.
+
+    `fields` maps each column to its type (str, float, int or bool); records
+    are reduced to those columns in that order. Files are named
+    `<name>.<extension>`, e.g. output/mobilesentrix_products.csv, and only
+    replace the existing files when the sink is closed.
+    """
+
+    def __init__(self, directory, name, fields, formats=None, buffer_size=1000):
+        self.fields = dict(fields)
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.count = 0
+        formats = list(formats or SINK_FORMATS)
+        if "jsonl" not in formats:
+            formats.append("jsonl")
+        if "parquet" in formats and pa is None:
+            logger.warning("pyarrow not installed; not writing Parquet")
+            formats.remove("parquet")
+
+        os.makedirs(directory, exist_ok=True)
+        self.paths = {}
+        self.temp_paths = {}
+        self.writers = []
+        for extension in formats:
+            self.paths[extension] = os.path.join(directory, f"{name}.{extension}")
+            self.temp_paths[extension] = self.paths[extension] + ".tmp"
+            self.writers.append(WRITERS[extension](self.temp_paths[extension], self.fields))
+
+    def write(self, record):
+        """Buffer one record, writing the buffer out when it is full."""
+        self.buffer.append({name: record.get(name) for name in self.fields})
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered records to every file."""
+        if self.buffer:
+            for writer in self.writers:
+                writer.write_batch(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        """Flush and close every file, then move them over the previous output."""
+        if self.writers:
+            self.flush()
+            for writer in self.writers:
+                writer.close()
+            self.writers = []
+            for extension, path in self.paths.items():
+                os.replace(self.temp_paths[extension], path)
+
+    def discard(self):
+        """Close and delete the files written so far, leaving the previous output in place."""
+        if self.writers:
+            self.buffer = []
+            for writer in self.writers:
+                writer.close()
+            self.writers = []
+            for path in self.temp_paths.values():
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def records(self):
+        """Yield the written records back from the JSONL file, one at a time."""
+        self.flush()
+        path = self.temp_paths["jsonl"] if self.writers else self.paths["jsonl"]
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
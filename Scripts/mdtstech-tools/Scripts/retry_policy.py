@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Retry Policy
+------------
+Shared retry rules for page fetches in the standard-library scrapers
+(fixed_scraper, resilient_scraper fetch_url) and the asyncio scrapers
+(MobileSentrixScraper.fetch_page).
+
+    classification   timeouts, dropped connections and 408/425/429/5xx
+                     answers are retryable; other 4xx answers (404, 403,
+                     410, ...) and anything else are terminal and are not
+                     retried
+    backoff          exponential with full jitter: a random wait between 0
+                     and base * 2^attempt, capped at the maximum; a
+                     Retry-After header (seconds or an HTTP date) replaces
+                     the backoff for that retry, within the same cap
+    circuit breaker  per host: after N retryable failures in a row the
+                     circuit opens and requests to that host fail at once
+                     without touching the network; after the cool-down one
+                     trial request is let through, and its success closes
+                     the circuit again
+
+The policy only makes decisions; the caller sleeps, with time.sleep or
+await asyncio.sleep, so one policy serves both kinds of scraper:
+
+    for attempt in range(policy.attempts):
+        if not policy.allow(url): give up
+        try: fetch; policy.succeeded(url); return
+        except error: wait = policy.failed(url, attempt, error=error)
+        if wait is None: give up
+        sleep(wait)
+
+Configuration (environment variables):
+    SCRAPER_RETRIES            attempts per URL, including the first (default 3)
+    SCRAPER_RETRY_BASE         backoff base in seconds (default 0.5)
+    SCRAPER_RETRY_MAX          longest wait, including Retry-After, in seconds (default 30)
+    SCRAPER_BREAKER_FAILURES   retryable failures in a row that open a host's circuit (default 5)
+    SCRAPER_BREAKER_SECONDS    seconds a circuit stays open before a trial request (default 30)
+"""
+
+import os
+import ssl
+import time
+import random
+import socket
+import asyncio
+import http.client
+import urllib.error
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp not installed; only the standard-library scrapers use the policy
+    aiohttp = None
+
+RETRIES = int(os.environ.get("SCRAPER_RETRIES", "3"))
+RETRY_BASE = float(os.environ.get("SCRAPER_RETRY_BASE", "0.5"))
+RETRY_MAX = float(os.environ.get("SCRAPER_RETRY_MAX", "30"))
+BREAKER_FAILURES = int(os.environ.get("SCRAPER_BREAKER_FAILURES", "5"))
+BREAKER_SECONDS = float(os.environ.get("SCRAPER_BREAKER_SECONDS", "30"))
+
+RETRYABLE = "retryable"
+TERMINAL = "terminal"
+
+# Statuses worth asking again: timeouts, rate limiting and server-side failures
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Transport errors worth retrying; certificate failures are not (they will fail again)
+RETRYABLE_ERRORS = (TimeoutError, socket.timeout, asyncio.TimeoutError, ConnectionError,
+                    http.client.HTTPException, urllib.error.URLError, OSError)
+if aiohttp is not None:
+    RETRYABLE_ERRORS += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+TERMINAL_ERRORS = (ssl.SSLCertVerificationError,)
+
+def classify(status=None, error=None):
+    """Return RETRYABLE or TERMINAL for an HTTP status or a fetch exception."""
+    if isinstance(error, urllib.error.HTTPError):
+        status = error.code
+    elif error is not None:
+        if isinstance(error, TERMINAL_ERRORS):
+            return TERMINAL
+        if isinstance(error, urllib.error.URLError) and isinstance(error.reason, TERMINAL_ERRORS):
+            return TERMINAL
+        return RETRYABLE if isinstance(error, RETRYABLE_ERRORS) else TERMINAL
+    if status is None:
+        return RETRYABLE
+    return RETRYABLE if status in RETRYABLE_STATUSES else TERMINAL
+
+def retry_after_seconds(value):
+    """Parse a Retry-After header (delta seconds or an HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+class CircuitBreaker:
+    """
+    Per-host circuit: closed (requests go out), open (fail fast) and
+    half-open (one trial request after the cool-down).
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_SECONDS, clock=time.monotonic):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.hosts = {}  # host -> [consecutive failures, opened at or None, trial in flight]
+        self.opened = 0
+
+    def _host(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = [0, None, False]
+        return self.hosts[host]
+
+    def allow(self, host):
+        """Return True if a request to host may go out now."""
+        state = self._host(host)
+        opened_at = state[1]
+        if opened_at is None:
+            return True
+        if self.clock() - opened_at < self.reset_seconds or state[2]:
+            return False
+        state[2] = True  # half-open: let one trial request through
+        return True
+
+    def record_success(self, host):
+        """Close the host's circuit and reset its failure count."""
+        self.hosts[host] = [0, None, False]
+
+    def record_failure(self, host):
+        """Count a retryable failure, opening the circuit at the threshold or when a trial fails."""
+        state = self._host(host)
+        state[0] += 1
+        if state[2] or (state[1] is None and state[0] >= self.failures):
+            if state[1] is None:
+                self.opened += 1
+            state[1] = self.clock()
+            state[2] = False
+
+    def is_open(self, host):
+        """Return True while the host's circuit is open or half-open."""
+        return self._host(host)[1] is not None
+
+class RetryPolicy:
+    """
+    Decides whether and how long to wait before fetching a URL again.
+
+    `jitter` returns a float in [0, 1) (random.random by default) and scales
+    the exponential backoff; pass a fixed function for reproducible waits.
+    """
+
+    def __init__(self, attempts=RETRIES, base_delay=RETRY_BASE, max_delay=RETRY_MAX,
+                 breaker=None, jitter=random.random):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.jitter = jitter
+        self.stats = {"retries": 0, "terminal": 0, "gave_up": 0, "short_circuited": 0, "waited": 0.0}
+
+    @staticmethod
+    def host(url):
+        return urlsplit(url).netloc
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait after failed attempt number `attempt` (0-based)."""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return self.jitter() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+    def allow(self, url):
+        """Return False if the host's circuit is open and the request should not be sent."""
+        if self.breaker.allow(self.host(url)):
+            return True
+        self.stats["short_circuited"] += 1
+        return False
+
+    def succeeded(self, url):
+        """Record a successful fetch of url."""
+        self.breaker.record_success(self.host(url))
+
+    def failed(self, url, attempt, error=None, status=None, headers=None):
+        """
+        Record a failed attempt and return the seconds to wait before the next
+        one, or None when the failure is terminal or the attempts are used up.
+        `headers` (the response headers, if any) are checked for Retry-After.
+        """
+        if classify(status, error) == TERMINAL:
+            # The host answered (e.g. 404), so it is healthy as far as the circuit is concerned
+            self.breaker.record_success(self.host(url))
+            self.stats["terminal"] += 1
+            return None
+        self.breaker.record_failure(self.host(url))
+        if attempt + 1 >= self.attempts:
+            self.stats["gave_up"] += 1
+            return None
+        if headers is None and isinstance(error, urllib.error.HTTPError):
+            headers = error.headers
+        wait = self.backoff(attempt, retry_after_seconds(headers.get("Retry-After") if headers else None))
+        self.stats["retries"] += 1
+        self.stats["waited"] += wait
+        return wait
+
+    def format_summary(self):
+        """Return a one-line description of this run's retries."""
+        stats = self.stats
+        return (
+            f"Retries: {stats['retries']} retried ({stats['waited']:.1f} s waiting), "
+            f"{stats['terminal']} terminal errors not retried, {stats['gave_up']} gave up, "
+            f"{stats['short_circuited']} skipped by {self.breaker.opened} open circuits"
+        )
+
+def default_policy():
+    """Return a RetryPolicy configured from the SCRAPER_* environment variables."""
+    return RetryPolicy()
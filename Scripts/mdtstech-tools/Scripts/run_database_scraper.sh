@@ -7,6 +7,9 @@ YELLOW='\033[1;33m'
 RED='\033[0;31m'
 NC='\033[0m' # No Color
 
+# Directory of this script, which holds the scrapers and their requirements
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 echo -e "${YELLOW}Starting database scraper...${NC}"
 
 # Check for Python
@@ -42,12 +45,12 @@ echo -e "${GREEN}✓ Database exists${NC}"
 
 # Install required Python packages
 echo -e "\n${YELLOW}Installing required Python packages...${NC}"
-pip3 install -r Scripts/requirements.txt
+pip3 install -r "$SCRIPT_DIR/requirements.txt"
 echo -e "${GREEN}✓ Python packages installed${NC}"
 
 # Run the scraper
 echo -e "\n${YELLOW}Running database scraper...${NC}"
-python3 Scripts/database_scraper.py
+python3 "$SCRIPT_DIR/database_scraper.py" "$@"
 if [ $? -ne 0 ]; then
     echo -e "${RED}Error running database scraper. Check the logs for details.${NC}"
     exit 1
@@ -0,0 +1,1414 @@
+#!/usr/bin/env python3
+"""
+Scraper Benchmarks
+------------------
+Benchmarks for the scraper building blocks, run against local stand-ins
+(a SQLite database, a local aiohttp server) instead of the live site and database.
+
+Usage:
+    python scraper_benchmark.py upsert --products 10000 --batch-sizes 1 100 1000
+    python scraper_benchmark.py crawl --categories 10 --products 20 --latency 0.05
+    python scraper_benchmark.py http-cache --categories 10 --products 20
+    python scraper_benchmark.py pool --requests 500
+    python scraper_benchmark.py extract --pages 5 --products 2000 [--corpus DIR ...]
+    python scraper_benchmark.py parse --pages 20 --products 200
+    python scraper_benchmark.py offload --categories 8 --products 300 --workers 4
+    python scraper_benchmark.py resume --categories 10 --products 20
+    python scraper_benchmark.py sink --records 10000 100000
+    python scraper_benchmark.py report --records 100000 --page-size 1000
+    python scraper_benchmark.py retry --delay 0.5 --fail-every 5
+    python scraper_benchmark.py sitemap --urls 500000 --moved 5000
+    python scraper_benchmark.py delta --categories 20 --products 50 --changed 10 --removed 5
+"""
+
+import io
+import csv
+import os
+import re
+import json
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import contextlib
+import tempfile
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT, slug TEXT UNIQUE, description TEXT, image_url TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT, slug TEXT UNIQUE, sku TEXT, description TEXT, price REAL,
+        stock_quantity INTEGER, is_featured BOOLEAN, is_new BOOLEAN, image_url TEXT,
+        category_id INTEGER, brand TEXT, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE product_specifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER UNIQUE, display TEXT, processor TEXT, memory TEXT, storage TEXT,
+        camera TEXT, battery TEXT, connectivity TEXT, operating_system TEXT,
+        additional_features TEXT
+    )
+    """
+]
+
+def synthetic_products(count):
+    """Return scraped-product dicts shaped like DatabaseScraper.scrape_product output."""
+    categories = ["LCD Assemblies", "Batteries", "Back Covers", "Cameras"]
+    return [
+        {
+            "name": f"Replacement Part {i}",
+            "slug": f"replacement-part-{i}",
+            "price": 10 + i % 90,
+            "image_url": f"https://example.com/images/{i}.webp",
+            "description": "Synthetic benchmark product",
+            "specifications": {"display": "6.1 inch", "battery": "3000 mAh"} if i % 2 else {},
+            "product_url": f"https://example.com/replacement-part-{i}",
+            "category": categories[i % len(categories)],
+            "sku": f"SKU-{i}",
+            "stock_quantity": 10,
+            "is_featured": False,
+            "is_new": True,
+            "brand": "Generic"
+        }
+        for i in range(count)
+    ]
+
+def benchmark_upsert(product_count, batch_sizes):
+    """Time DatabaseScraper.insert_products_to_db against SQLite for each batch size."""
+    from sqlalchemy import text
+    from crawl_checkpoint import CrawlCheckpoint
+    from database_scraper import DatabaseScraper
+
+    products = synthetic_products(product_count)
+    print(f"{'batch':>8} {'pass':>8} {'seconds':>10} {'rows/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for batch_size in batch_sizes:
+            db_path = os.path.join(tmp_dir, f"bench_{batch_size}.db")
+            scraper = DatabaseScraper(db_url=f"sqlite:///{db_path}", batch_size=batch_size,
+                                      checkpoint=CrawlCheckpoint(None))
+            with scraper.engine.begin() as connection:
+                for statement in SQLITE_SCHEMA:
+                    connection.execute(text(statement))
+            for product in products:
+                scraper.checkpoint.add_record(product["product_url"], product)
+
+            # The second pass hits ON CONFLICT for every row
+            for label in ("insert", "update"):
+                start = time.perf_counter()
+                asyncio.run(scraper.insert_products_to_db())
+                elapsed = time.perf_counter() - start
+                print(f"{batch_size:>8} {label:>8} {elapsed:>10.2f} {product_count / elapsed:>10.0f}")
+
+            with scraper.engine.connect() as connection:
+                stored = connection.execute(text("SELECT COUNT(*) FROM products")).scalar()
+                orphans = connection.execute(text(
+                    "SELECT COUNT(*) FROM product_specifications "
+                    "WHERE product_id NOT IN (SELECT id FROM products)"
+                )).scalar()
+            assert stored == product_count and orphans == 0, (stored, orphans)
+
+def catalog_app(categories, products_per_page, latency, filler_kb=0, fail_every=0):
+    """
+    Build an aiohttp app that serves a fake catalog shaped like the live site.
+
+    The homepage links to each category, category pages list product cards
+    (page 2 lists different products) and product pages answer after `latency`
+    seconds. Responses carry an ETag and conditional requests for an unchanged
+    page get a 304; app["traffic"]["bytes_sent"] counts the body bytes served.
+    filler_kb pads category pages with that much extra markup to parse.
+    With fail_every=N, the first request for every Nth product page gets a
+    503 (every other one of those a 429 with Retry-After: 1) and
+    app["traffic"]["faults"] counts them. /sitemap.xml is an index pointing
+    at a gzipped sitemap of every product page, each with the lastmod in
+    app["lastmod"] (default 2024-01-01); app["traffic"]["product_fetches"]
+    counts product page requests. Listing cards carry a stock badge; a card's
+    price can be overridden in app["prices"] (product name -> "$12.99") and
+    products named in app["delisted"] are left off their category page.
+    """
+    import zlib
+    import hashlib
+    from aiohttp import web
+
+    import gzip
+
+    traffic = {"bytes_sent": 0, "faults": 0, "product_fetches": 0}
+    lastmod = {}
+    prices = {}
+    delisted = set()
+    product_names = [f"c{i}-{page}-{j}" for i in range(categories) for page in (1, 2) for j in range(products_per_page)]
+    failed_once = set()
+
+    @web.middleware
+    async def fault_middleware(request, handler):
+        path = request.path
+        if fail_every and path.startswith("/product/") and path not in failed_once:
+            bucket = zlib.crc32(path.encode()) % fail_every
+            if bucket == 0:
+                failed_once.add(path)
+                traffic["faults"] += 1
+                if traffic["faults"] % 2:
+                    return web.Response(status=503)
+                return web.Response(status=429, headers={"Retry-After": "1"})
+        return await handler(request)
+    filler = '<div class="promo"><p>Free shipping on orders over $50</p></div>' * (filler_kb * 16)
+
+    @web.middleware
+    async def etag_middleware(request, handler):
+        response = await handler(request)
+        etag = '"' + hashlib.md5(response.body).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        traffic["bytes_sent"] += len(response.body)
+        return response
+
+    async def homepage(request):
+        links = "".join(f'<li><a href="/category/c{i}">Category {i}</a></li>' for i in range(categories))
+        return web.Response(text=f"<html><body><nav><ul>{links}</ul></nav></body></html>",
+                            content_type="text/html")
+
+    async def category(request):
+        await asyncio.sleep(latency)
+        name = request.match_info["name"]
+        page = request.query.get("page", "1")
+        cards = "".join(
+            f'<div class="product-card"><h2 class="product-title">'
+            f'<a href="/product/{name}-{page}-{j}">Part {name} {page} {j}</a></h2>'
+            f'<span class="price">{prices.get(f"{name}-{page}-{j}", f"${10 + j}.99")}</span>'
+            f'<span class="stock">In stock</span>'
+            f'<img class="product-img" src="/img/{name}-{page}-{j}.webp"></div>'
+            for j in range(products_per_page) if f"{name}-{page}-{j}" not in delisted
+        )
+        return web.Response(text=f"<html><body>{filler}{cards}</body></html>", content_type="text/html")
+
+    async def product(request):
+        await asyncio.sleep(latency)
+        traffic["product_fetches"] += 1
+        name = request.match_info["name"]
+        return web.Response(
+            text=f'<html><body><h1 class="page-title">Part {name}</h1><span class="price">$10.99</span>'
+                 f'<div class="product-description">Specs for {name}</div></body></html>',
+            content_type="text/html"
+        )
+
+    async def sitemap_index(request):
+        return web.Response(
+            text='<?xml version="1.0" encoding="UTF-8"?>'
+                 '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                 f'<sitemap><loc>{request.url.origin()}/sitemap-products.xml.gz</loc></sitemap></sitemapindex>',
+            content_type="application/xml"
+        )
+
+    async def product_sitemap(request):
+        origin = request.url.origin()
+        urls = "".join(
+            f"<url><loc>{origin}/product/{name}</loc><lastmod>{lastmod.get(name, '2024-01-01')}</lastmod></url>"
+            for name in product_names
+        )
+        body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+        return web.Response(body=gzip.compress(body.encode()), content_type="application/gzip")
+
+    app = web.Application(middlewares=[fault_middleware, etag_middleware])
+    app["traffic"] = traffic
+    app["lastmod"] = lastmod
+    app["prices"] = prices
+    app["delisted"] = delisted
+    app["product_names"] = product_names
+    app.router.add_get("/", homepage)
+    app.router.add_get("/category/{name}", category)
+    app.router.add_get("/product/{name}", product)
+    app.router.add_get("/sitemap.xml", sitemap_index)
+    app.router.add_get("/sitemap-products.xml.gz", product_sitemap)
+    return app
+
+_output = None
+
+def _output_dir():
+    """Scratch directory for the files scrapers write during a benchmark, removed when it ends."""
+    global _output
+    if _output is None:
+        _output = tempfile.TemporaryDirectory(prefix="scraper_benchmark_")
+    return _output.name
+
+def _crawl_scraper(base_url, concurrency, per_host_limit, requests_per_second, response_cache=None,
+                   parse_workers=0, checkpoint=None, retry_policy=None, snapshot=None):
+    from http_cache import ResponseCache
+    from crawl_checkpoint import CrawlCheckpoint
+    from listing_snapshot import ListingSnapshot
+    from mobilesentrix_scraper import MobileSentrixScraper
+
+    scraper = MobileSentrixScraper(base_url=base_url, response_cache=response_cache or ResponseCache(None),
+                                   checkpoint=checkpoint or CrawlCheckpoint(None), retry_policy=retry_policy,
+                                   snapshot=snapshot or ListingSnapshot(None))
+    scraper.output_dir = _output_dir()
+    scraper.concurrency = concurrency
+    scraper.per_host_limit = per_host_limit
+    scraper.requests_per_second = requests_per_second
+    scraper.parse_workers = parse_workers
+    return scraper
+
+async def _crawl_once(base_url, concurrency, per_host_limit, requests_per_second, response_cache=None,
+                      parse_workers=0):
+    import aiohttp
+
+    scraper = _crawl_scraper(base_url, concurrency, per_host_limit, requests_per_second,
+                             response_cache, parse_workers)
+    async with aiohttp.ClientSession() as session:
+        await scraper.crawl(session)
+    return scraper
+
+async def _benchmark_crawl(categories, products_per_page, latency, requests_per_second):
+    from aiohttp import web
+
+    runner = web.AppRunner(catalog_app(categories, products_per_page, latency))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}/"
+
+    print(f"{'mode':>12} {'products':>9} {'fetches':>8} {'seconds':>8} {'pages/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'cache hit/miss':>15}")
+    try:
+        for mode, concurrency, per_host_limit in (("sequential", 1, 1), ("concurrent", 8, 8)):
+            scraper = await _crawl_once(base_url, concurrency, per_host_limit, requests_per_second)
+            stats = scraper.scheduler.summary()
+            print(f"{mode:>12} {scraper.checkpoint.record_count():>9} {stats['fetches']:>8} {stats['seconds']:>8.2f} "
+                  f"{stats['fetches_per_second']:>8.1f} {stats['p50_latency'] * 1000:>7.0f} "
+                  f"{stats['p95_latency'] * 1000:>7.0f} "
+                  f"{f'{scraper.page_cache.hits}/{scraper.page_cache.misses}':>15}")
+    finally:
+        await runner.cleanup()
+
+def benchmark_crawl(categories, products_per_page, latency, requests_per_second):
+    """Crawl a local fake catalog with one worker and with eight, and compare throughput."""
+    import mobilesentrix_scraper  # configures logging on import; quieten it afterwards
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(_benchmark_crawl(categories, products_per_page, latency, requests_per_second))
+
+async def _benchmark_http_cache(categories, products_per_page, latency, cache_path):
+    from aiohttp import web
+    from http_cache import ResponseCache
+
+    app = catalog_app(categories, products_per_page, latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}/"
+
+    print(f"{'run':>10} {'products':>9} {'requests':>9} {'304s':>6} {'KB sent':>8} {'seconds':>8}")
+    try:
+        for run, offline in (("cold", False), ("warm", False), ("offline", True)):
+            cache = ResponseCache(cache_path, offline=offline)
+            app["traffic"]["bytes_sent"] = 0
+            start = time.perf_counter()
+            scraper = await _crawl_once(base_url, 8, 8, 1000.0, cache)
+            elapsed = time.perf_counter() - start
+            print(f"{run:>10} {scraper.checkpoint.record_count():>9} {scraper.scheduler.summary()['fetches']:>9} "
+                  f"{cache.stats['not_modified']:>6} {app['traffic']['bytes_sent'] / 1024:>8.1f} {elapsed:>8.2f}")
+            cache.close()
+    finally:
+        await runner.cleanup()
+
+def benchmark_http_cache(categories, products_per_page, latency):
+    """Crawl a local fake catalog cold, again with conditional requests, then offline from the cache."""
+    import mobilesentrix_scraper  # configures logging on import; quieten it afterwards
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "responses.sqlite")
+        asyncio.run(_benchmark_http_cache(categories, products_per_page, latency, cache_path))
+
+def _tls_server(tmp_dir, body):
+    """Start a local HTTPS keep-alive server with a throwaway self-signed certificate."""
+    import ssl
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    cert_path = os.path.join(tmp_dir, "cert.pem")
+    key_path = os.path.join(tmp_dir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key_path, "-out", cert_path],
+        check=True, capture_output=True
+    )
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def benchmark_pool(request_count, page_kb):
+    """Compare requests/second of per-call urllib.urlopen and the pooled keep-alive client over TLS."""
+    import ssl
+    import urllib.request
+    from http_client import PooledClient
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = _tls_server(tmp_dir, b"x" * (page_kb * 1024))
+        url = f"https://127.0.0.1:{server.server_address[1]}/product"
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+
+        def unpooled():
+            for _ in range(request_count):
+                urllib.request.urlopen(url, context=context, timeout=30).read()
+
+        client = PooledClient(verify=False)
+
+        def pooled():
+            for _ in range(request_count):
+                client.open(url).read()
+
+        print(f"{'client':>10} {'requests':>9} {'seconds':>8} {'req/s':>8} {'connections':>12}")
+        try:
+            for label, run in (("unpooled", unpooled), ("pooled", pooled)):
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+                connections = client.stats["connections"] if label == "pooled" else request_count
+                print(f"{label:>10} {request_count:>9} {elapsed:>8.2f} {request_count / elapsed:>8.0f} {connections:>12}")
+        finally:
+            client.close()
+            server.shutdown()
+
+def _fault_server(body_size=2048):
+    """
+    Start a local HTTP server that injects faults by path:
+        /ok/N        200
+        /missing/N   404 every time
+        /flaky/N     503 on the first request, then 200
+        /limited/N   429 with Retry-After: 1 on the first request, then 200
+        /degraded/N  503 every time
+    server.hits counts requests per path; clear it between runs.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    body = b"<html><body>" + b"x" * body_size + b"</body></html>"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            hits = server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            kind = self.path.split("/")[1]
+            headers = {}
+            if kind == "missing":
+                status = 404
+            elif kind == "degraded" or (kind == "flaky" and hits == 1):
+                status = 503
+            elif kind == "limited" and hits == 1:
+                status, headers = 429, {"Retry-After": "1"}
+            else:
+                status = 200
+            payload = body if status == 200 else b"error"
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.hits = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _fixed_delay_fetch(url, max_retries=3, delay=2):
+    """fetch_url's previous retry loop: every failure retried after delay * attempt seconds."""
+    import fixed_scraper
+
+    for attempt in range(max_retries):
+        try:
+            html = fixed_scraper.HTTP_CLIENT.open(url, timeout=30).read().decode('utf-8', errors='replace')
+            if html and len(html) > 500:
+                return html
+        except Exception:
+            pass
+        if attempt < max_retries - 1:
+            time.sleep(delay * (attempt + 1))
+    return None
+
+async def _benchmark_retry_crawl(categories, products_per_page, latency, fail_every):
+    from aiohttp import web
+    from crawl_checkpoint import FAILED
+    from retry_policy import RetryPolicy
+
+    print(f"\nasync crawl, first request for 1 in {fail_every} product pages fails (503 or 429 + Retry-After)")
+    print(f"{'policy':>16} {'products':>9} {'pages lost':>11} {'faults':>7} {'seconds':>8}")
+    for label, policy in (("no retries", RetryPolicy(attempts=1)), ("retry policy", RetryPolicy())):
+        app = catalog_app(categories, products_per_page, latency, fail_every=fail_every)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            import aiohttp
+            scraper = _crawl_scraper(f"http://127.0.0.1:{port}/", 8, 8, 1000.0, retry_policy=policy)
+            start = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                await scraper.crawl(session)
+            elapsed = time.perf_counter() - start
+            lost = scraper.checkpoint.counts("product").get(FAILED, 0)
+            print(f"{label:>16} {scraper.checkpoint.record_count():>9} {lost:>11} "
+                  f"{app['traffic']['faults']:>7} {elapsed:>8.2f}")
+        finally:
+            await runner.cleanup()
+
+def benchmark_retry(delay, categories, products_per_page, latency, fail_every):
+    """
+    Fetch a mix of healthy, missing, flaky, rate-limited and degraded-host
+    URLs from a local fault-injecting server with fetch_url's previous
+    fixed-delay retry loop and with the retry policy, then crawl a faulty
+    fake catalog with MobileSentrixScraper without and with retries.
+    `delay` scales both sync loops (the old delay and the backoff base).
+    """
+    import fixed_scraper
+    import mobilesentrix_scraper  # configures logging on import; quieten it afterwards
+    from http_cache import ResponseCache
+    from retry_policy import CircuitBreaker, RetryPolicy
+    logging.getLogger().setLevel(logging.CRITICAL)
+    fixed_scraper.RESPONSE_CACHE = ResponseCache(None)
+
+    server = _fault_server()
+    degraded = _fault_server()  # a second origin that only answers 503
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = ([f"{base}/ok/{i}" for i in range(40)] + [f"{base}/missing/{i}" for i in range(10)]
+            + [f"{base}/flaky/{i}" for i in range(10)] + [f"{base}/limited/{i}" for i in range(2)]
+            + [f"http://127.0.0.1:{degraded.server_address[1]}/degraded/{i}" for i in range(10)])
+
+    def previous():
+        return [_fixed_delay_fetch(url, delay=delay) for url in urls]
+
+    def with_policy():
+        policy = RetryPolicy(base_delay=delay / 4, breaker=CircuitBreaker(failures=5, reset_seconds=60))
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [fixed_scraper.fetch_url(url, policy=policy) for url in urls]
+
+    print(f"sync fetch_url, {len(urls)} URLs: 40 ok, 10 404, 10 flaky 503, 2 429 + Retry-After, "
+          f"10 on a degraded host; old delay {delay} s")
+    print(f"{'loop':>16} {'fetched':>8} {'requests':>9} {'seconds':>8}")
+    try:
+        for label, run in (("fixed delay", previous), ("retry policy", with_policy)):
+            server.hits.clear()
+            degraded.hits.clear()
+            start = time.perf_counter()
+            pages = run()
+            elapsed = time.perf_counter() - start
+            requests = sum(server.hits.values()) + sum(degraded.hits.values())
+            print(f"{label:>16} {sum(page is not None for page in pages):>8} {requests:>9} {elapsed:>8.2f}")
+    finally:
+        server.shutdown()
+        degraded.shutdown()
+
+    asyncio.run(_benchmark_retry_crawl(categories, products_per_page, latency, fail_every))
+
+def sitemap_fixture(url_count, per_file, origin, moved=(), repeated=0):
+    """
+    Return {path: body} for a sitemap index and gzipped child sitemaps listing
+    url_count product URLs, per_file per sitemap; URLs whose index is in
+    `moved` carry a later lastmod. The first `repeated` URLs are listed
+    again at the end of the last sitemap.
+    """
+    import gzip
+
+    files = {}
+    children = []
+    for first in range(0, url_count, per_file):
+        path = f"/sitemap-{first // per_file}.xml.gz"
+        children.append(f"<sitemap><loc>{origin}{path}</loc></sitemap>")
+        indexes = list(range(first, min(first + per_file, url_count)))
+        if first + per_file >= url_count:
+            indexes += range(repeated)
+        urls = "".join(
+            f"<url><loc>{origin}/product/p{i}.html</loc>"
+            f"<lastmod>{'2024-06-01' if i in moved else '2024-01-01'}T00:00:00+00:00</lastmod></url>"
+            for i in indexes
+        )
+        files[path] = gzip.compress(('<?xml version="1.0" encoding="UTF-8"?>'
+                                     f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>').encode(), 6)
+    files["/sitemap.xml"] = ('<?xml version="1.0" encoding="UTF-8"?>'
+                             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                             f'{"".join(children)}</sitemapindex>').encode()
+    return files
+
+async def _serve_files(files):
+    """Serve {path: body} from a local aiohttp server; return (runner, origin)."""
+    from aiohttp import web
+
+    async def serve(request):
+        body = files.get(request.path)
+        if body is None:
+            return web.Response(status=404)
+        return web.Response(body=body, content_type="application/xml")
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", serve)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+async def _seed_once(origin, store, incremental=True, trace=False):
+    """Seed a fresh frontier from the fixture sitemap; return (scraper, seconds, peak heap bytes)."""
+    import tracemalloc
+    import aiohttp
+    from crawl_scheduler import CrawlScheduler
+
+    scraper = _crawl_scraper(origin + "/", 8, 8, 1000.0)
+    scraper.lastmod_store = store
+    scraper.incremental = incremental
+    scraper.sitemap_url = origin + "/sitemap.xml"
+    scraper.scheduler = CrawlScheduler(8, 8, 1000.0)
+    scraper.checkpoint.start()
+    # Unchanged URLs write their stored records to the sink
+    scraper._open_sink(resume=False)
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await scraper.seed_from_sitemap(session)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    if trace:
+        tracemalloc.stop()
+    scraper.sink.discard()
+    return scraper, elapsed, peak
+
+async def _benchmark_sitemap(url_count, per_file, moved_count, tmp_dir):
+    import random
+    from crawl_checkpoint import PENDING
+    from sitemap_discovery import LastmodStore
+
+    files = {}
+    runner, origin = await _serve_files(files)
+    store = LastmodStore(os.path.join(tmp_dir, "lastmod.sqlite"))
+    moved = set(random.Random(0).sample(range(url_count), moved_count))
+    # Some URLs are listed twice, across sitemaps and seeding batches; each must be crawled or reused once
+    repeated = url_count // 20
+    print(f"{url_count} URLs in {-(-url_count // per_file)} gzipped sitemaps of {per_file}, behind a sitemap index; "
+          f"{repeated} listed twice")
+    print(f"{'run':>24} {'listed':>8} {'to crawl':>9} {'reused':>8} {'seconds':>8}")
+    try:
+        runs = [("first run", (), True), ("full, unchanged", (), False), ("incremental, unchanged", (), True),
+                (f"incremental, {moved_count} moved", moved, True)]
+        for label, moved_now, incremental in runs:
+            files.clear()
+            files.update(sitemap_fixture(url_count, per_file, origin, moved_now, repeated))
+            scraper, elapsed, _ = await _seed_once(origin, store, incremental)
+            pending = scraper.checkpoint.counts("product").get(PENDING, 0)
+            print(f"{label:>24} {url_count + repeated:>8} {pending:>9} {scraper.sink.count:>8} {elapsed:>8.2f}")
+            # Stand in for scraping the pending pages: record the lastmod each was listed with
+            for batch in scraper.checkpoint.batches("product", [PENDING], 10000):
+                for url, data in batch:
+                    store.record(url, data["lastmod"], {"product_url": url})
+            store.flush()
+
+        # Peak heap in a separate pass, since tracing slows the runs down
+        _, _, peak = await _seed_once(origin, LastmodStore(None), trace=True)
+        print(f"peak heap while seeding (including the in-process fixture server): {peak / (1024 * 1024):.1f} MB")
+    finally:
+        store.close()
+        await runner.cleanup()
+
+async def _benchmark_sitemap_crawl(categories, products_per_page, latency, tmp_dir):
+    import aiohttp
+    from aiohttp import web
+    from sitemap_discovery import LastmodStore
+
+    app = catalog_app(categories, products_per_page, latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+    store = LastmodStore(os.path.join(tmp_dir, "crawl_lastmod.sqlite"))
+
+    print(f"\nfake catalog crawl, {len(app['product_names'])} products")
+    print(f"{'discovery':>24} {'products':>9} {'fetches':>8} {'product pages':>14} {'seconds':>8} "
+          f"{'output rows':>12}")
+    try:
+        runs = [("listing crawl", "crawl", False, None), ("sitemap, first run", "sitemap", True, None),
+                ("sitemap, full", "sitemap", False, None), ("sitemap, incr. unchanged", "sitemap", True, None),
+                ("sitemap, incr. 5 modified", "sitemap", True, 5)]
+        for label, discovery, incremental, modified in runs:
+            for name in app["product_names"][:modified or 0]:
+                app["lastmod"][name] = "2024-06-01"
+            app["traffic"]["product_fetches"] = 0
+            scraper = _crawl_scraper(base_url, 8, 8, 1000.0)
+            scraper.discovery = discovery
+            scraper.incremental = incremental
+            scraper.lastmod_store = store
+            start = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                await scraper.crawl(session)
+            elapsed = time.perf_counter() - start
+            # Every run must leave the whole catalog in the output files, not just what it fetched
+            csv_path = await scraper.save_to_csv()
+            with open(csv_path, encoding='utf-8') as f:
+                output_rows = sum(1 for _ in csv.reader(f)) - 1
+            print(f"{label:>24} {scraper.checkpoint.record_count():>9} {scraper.scheduler.summary()['fetches']:>8} "
+                  f"{app['traffic']['product_fetches']:>14} {elapsed:>8.2f} {output_rows:>12}")
+    finally:
+        store.close()
+        await runner.cleanup()
+
+def benchmark_sitemap(url_count, per_file, moved_count, categories, products_per_page, latency):
+    """
+    Seed the frontier from a local fixture sitemap index of url_count URLs:
+    first run, unchanged in full and incremental mode, and incremental with
+    moved_count lastmods moved; then crawl the fake catalog through its
+    listings and through its sitemap.
+    """
+    import mobilesentrix_scraper  # configures logging on import; quieten it afterwards
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(_benchmark_sitemap(url_count, per_file, moved_count, tmp_dir))
+        asyncio.run(_benchmark_sitemap_crawl(categories, products_per_page, latency, tmp_dir))
+
+async def _benchmark_delta(categories, products_per_page, latency, changed, removed, snapshot_path):
+    import aiohttp
+    from aiohttp import web
+    from listing_snapshot import ListingSnapshot
+
+    app = catalog_app(categories, products_per_page, latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+    names = app["product_names"]
+
+    print(f"fake catalog of {len(names)} products, {latency * 1000:.0f} ms per page")
+    print(f"{'run':>30} {'products':>9} {'fetches':>8} {'product pages':>14} {'seconds':>8} "
+          f"{'inserted':>9} {'updated':>8} {'removed':>8}")
+    try:
+        runs = [("full, first run", False), ("full, unchanged", False), ("incremental, unchanged", True),
+                (f"incremental, {changed} repriced {removed} gone", True),
+                (f"full, {changed} repriced {removed} gone", False)]
+        for label, incremental in runs:
+            if "repriced" in label:
+                # Reprice and delist fresh products each time, so both runs have changes to find
+                offset = len(app["prices"]) + len(app["delisted"])
+                for name in names[offset:offset + changed]:
+                    app["prices"][name] = "$99.99"
+                app["delisted"].update(names[offset + changed:offset + changed + removed])
+            app["traffic"]["product_fetches"] = 0
+            snapshot = ListingSnapshot(snapshot_path)
+            scraper = _crawl_scraper(base_url, 8, 8, 1000.0, snapshot=snapshot)
+            scraper.incremental = incremental
+            start = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                await scraper.crawl(session)
+            elapsed = time.perf_counter() - start
+            counts = {}
+            with open(os.path.join(scraper.output_dir, "mobilesentrix_delta.jsonl"), encoding="utf-8") as f:
+                for line in f:
+                    change = json.loads(line)["change"]
+                    counts[change] = counts.get(change, 0) + 1
+            print(f"{label:>30} {scraper.checkpoint.record_count():>9} {scraper.scheduler.summary()['fetches']:>8} "
+                  f"{app['traffic']['product_fetches']:>14} {elapsed:>8.2f} {counts.get('inserted', 0):>9} "
+                  f"{counts.get('updated', 0):>8} {counts.get('removed', 0):>8}")
+            snapshot.close()
+    finally:
+        await runner.cleanup()
+
+def benchmark_delta(categories, products_per_page, latency, changed, removed):
+    """
+    Crawl the fake catalog in full and incremental mode: first run, unchanged,
+    and with `changed` products repriced and `removed` products delisted,
+    reporting page fetches and the inserted/updated/removed delta of each run.
+    """
+    import mobilesentrix_scraper  # configures logging on import; quieten it afterwards
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        asyncio.run(_benchmark_delta(categories, products_per_page, latency, changed, removed,
+                                     os.path.join(tmp_dir, "snapshot.sqlite")))
+
+def synthetic_category_page(products, categories=200, seed=0):
+    """Return a large category page with nested navigation menus, product cards and images."""
+    import random
+    rng = random.Random(seed)
+    nav = "".join(
+        f'<li class="level0"><a href="/category/c{i}"><span>Category {i}</span></a>'
+        f'<ul><li><a href="/category/c{i}/sub{j}">Sub {i}.{j}</a></li></ul></li>'
+        if i % 3 == 0 else f'<li><a href="/category/c{i}"><span>Category {i}</span></a></li>'
+        for i in range(categories)
+        for j in [rng.randint(0, 9)]
+    )
+    cards = []
+    for i in range(products):
+        name = f"Replacement Part {i} for Model {rng.randint(1, 500)}"
+        if i % 4 == 0:
+            cards.append(f'<li class="item product"><a href="/product/p{i}"><h3>{name}</h3></a>'
+                         f'<img src="/media/p{i}.jpg"><span class="price">${rng.randint(5, 300)}.99</span></li>')
+        else:
+            cards.append(f'<div class="product-item"><div class="product-item-info">'
+                         f'<a href="/product/p{i}"><img src="/media/p{i}.webp" alt="{name}"></a>'
+                         f'<span class="price-box"><span class="price">${rng.randint(5, 300)}.99</span></span>'
+                         f'</div></div>')
+    filler = '<script>var config = {"a": 1};</script>' * 50
+    return (f'<html><head><title>Category</title><meta name="description" content="Parts">{filler}</head>'
+            f'<body><nav><ul>{nav}</ul></nav><main>{"".join(cards)}</main>'
+            f'<article><a href="/blog/post">Latest news</a></article></body></html>')
+
+def mixed_title_page(products, seed=0):
+    """
+    Return a category page whose cards share one layout but not one title
+    markup: every third title (the first included) has no link, the rest
+    are links inside h2.product-title.
+    """
+    import random
+    rng = random.Random(seed)
+    cards = []
+    for i in range(products):
+        name = f"Replacement Part {i} for Model {rng.randint(1, 500)}"
+        title = name if i % 3 == 0 else f'<a href="/product/p{i}">{name}</a>'
+        cards.append(f'<div class="product-item"><h2 class="product-title">{title}</h2>'
+                     f'<span class="price">${rng.randint(5, 300)}.99</span></div>')
+    return f'<html><body><main>{"".join(cards)}</main></body></html>'
+
+# The regex scrapers' extraction before html_extract, frozen as the reference
+# for `extract` (their progress prints left out). resilient_scraper and
+# fixed_scraper shared every function except the product block parsing.
+
+def _former_absolute(url, base_url):
+    if not url.startswith('http'):
+        url = base_url.rstrip('/') + ('/' if not url.startswith('/') else '') + url.lstrip('/')
+    return url
+
+def _former_unique(items):
+    unique_items = []
+    seen_urls = set()
+    for item in items:
+        if item['url'] not in seen_urls:
+            unique_items.append(item)
+            seen_urls.add(item['url'])
+    return unique_items
+
+def former_extract_title(html):
+    title_match = re.search('<title>(.*?)</title>', html, re.IGNORECASE)
+    return title_match.group(1) if title_match else "Unknown Title"
+
+def former_extract_description(html):
+    desc_match = re.search('<meta\\s+name=["\']description["\']\\s+content=["\']([^"\'>]*)["\']', html, re.IGNORECASE)
+    if not desc_match:
+        desc_match = re.search('<meta\\s+content=["\']([^"\'>]*)["\']\\s+name=["\']description["\']', html, re.IGNORECASE)
+    return desc_match.group(1) if desc_match else "No description available"
+
+def former_extract_categories(html, base_url):
+    categories = []
+    patterns = [
+        '<a\\s+href=["\']([^"\']*category[^"\']*)["\'][^>]*>(.*?)</a>',
+        '<a\\s+href=["\']([^"\']*)["\'][^>]*>\\s*<span[^>]*>\\s*(.*?)\\s*</span>\\s*</a>',
+        '<li[^>]*>\\s*<a\\s+href=["\']([^"\']*)["\'][^>]*>(.*?)</a>\\s*</li>'
+    ]
+    for pattern in patterns:
+        for url_part, name in re.findall(pattern, html, re.IGNORECASE | re.DOTALL):
+            clean_name = re.sub('<[^<]+?>', '', name).strip()
+            if not clean_name or len(clean_name) > 50:
+                continue
+            if 'login' in url_part.lower() or 'account' in url_part.lower() or 'cart' in url_part.lower():
+                continue
+            categories.append({"name": clean_name, "url": _former_absolute(url_part, base_url)})
+    return _former_unique(categories)
+
+def _former_block_fields(block, base_url, product_url, product_name, dollar_price):
+    """The tail both scrapers' block loops shared: name check, image, price and absolute URLs."""
+    product_name = re.sub('<[^<]+?>', '', product_name).strip()
+    if len(product_name) < 5 or product_name.lower() in ['home', 'next', 'previous', 'category']:
+        return None
+    img_match = re.search('<img[^>]*src=["\']([^"\']+)["\']', block, re.DOTALL | re.IGNORECASE)
+    image_url = img_match.group(1) if img_match else ""
+    price_match = re.search('<span[^>]*class=["\'][^"\']*(?:price|amount)[^"\']*["\'][^>]*>(.*?)</span>',
+                            block, re.DOTALL | re.IGNORECASE)
+    if not price_match and dollar_price:
+        price_match = re.search('\\$([\\d,\\.]+)', block)
+    price = price_match.group(1) if price_match else "N/A"
+    price = re.sub('<[^<]+?>', '', price).strip()
+    price_clean = re.search('[$€£]?\\s*(\\d[\\d,.]*)', price)
+    price = price_clean.group(1) if price_clean else price
+    if image_url and not image_url.startswith('http'):
+        image_url = _former_absolute(image_url, base_url)
+    return {"name": product_name, "url": _former_absolute(product_url, base_url), "image": image_url, "price": price}
+
+def former_resilient_block(block, base_url):
+    url_match = re.search('<a\\s+href=["\']([^"\']+)["\'][^>]*>(?:.*?<img[^>]*alt=["\']([^"\']+)["\']|'
+                          '.*?<span[^>]*>([^<]+)</span>)', block, re.DOTALL | re.IGNORECASE)
+    if not url_match:
+        return None
+    product_name = (url_match.group(2) if url_match.group(2)
+                    else url_match.group(3) if len(url_match.groups()) > 2 else "Unknown Product")
+    return _former_block_fields(block, base_url, url_match.group(1), product_name, dollar_price=False)
+
+def former_fixed_block(block, base_url):
+    url_match = None
+    for pattern in ('<a\\s+href=["\']([^"\']+)["\'][^>]*>.*?<img[^>]*alt=["\']([^"\']+)["\']',
+                    '<a\\s+href=["\']([^"\']+)["\'][^>]*>.*?<span[^>]*>([^<]+)</span>',
+                    '<a\\s+href=["\']([^"\']+)["\'][^>]*>.*?<h[2-4][^>]*>([^<]+)</h[2-4]>',
+                    '<a\\s+href=["\']([^"\']+)["\'][^>]*>([^<]+)</a>'):
+        url_match = url_match or re.search(pattern, block, re.DOTALL | re.IGNORECASE)
+    if url_match:
+        product_url = url_match.group(1)
+        product_name = url_match.group(2) if len(url_match.groups()) > 1 else "Unknown Product"
+    else:
+        url_match = re.search('<a\\s+href=["\']([^"\']+)["\']', block, re.DOTALL | re.IGNORECASE)
+        if not url_match:
+            return None
+        product_url = url_match.group(1)
+        url_parts = product_url.split('/')
+        product_name = url_parts[-1].replace('-', ' ').title() if url_parts else "Unknown Product"
+    return _former_block_fields(block, base_url, product_url, product_name, dollar_price=True)
+
+def former_extract_products(html, base_url, parse_block):
+    products = []
+    product_block_patterns = [
+        '<div\\s+class=["\'](?:product|item)[^"\']*["\'][^>]*>(.*?)</div>\\s*(?:</div>|<div)',
+        '<li[^>]*class=["\'][^"\']*product[^"\']*["\'][^>]*>(.*?)</li>',
+        '<article[^>]*>(.*?)</article>'
+    ]
+    for block_pattern in product_block_patterns:
+        product_blocks = re.findall(block_pattern, html, re.DOTALL | re.IGNORECASE)
+        if not product_blocks:
+            continue
+        for block in product_blocks[:30]:
+            try:
+                product = parse_block(block, base_url)
+            except Exception:
+                continue
+            if product:
+                products.append(product)
+        if products:
+            break
+    return _former_unique(products)
+
+def former_extract_images(html, base_url):
+    unique_images = []
+    seen_urls = set()
+    for img_url in re.findall('src=["\']([^"\'>]*\\.(?:jpg|jpeg|png|gif|webp))["\']', html, re.IGNORECASE):
+        img_url = _former_absolute(img_url, base_url)
+        if img_url not in seen_urls:
+            unique_images.append(img_url)
+            seen_urls.add(img_url)
+    return unique_images
+
+def former_extract_page(html, base_url, parse_block):
+    """What the regex scrapers extracted from a page before html_extract, shaped like html_extract.extract_page."""
+    return {
+        "title": former_extract_title(html),
+        "description": former_extract_description(html),
+        "categories": former_extract_categories(html, base_url),
+        "products": former_extract_products(html, base_url, parse_block),
+        "images": former_extract_images(html, base_url)
+    }
+
+def benchmark_extract(page_count, products, corpus_dirs, repeats=3):
+    """
+    Check that the single-pass index finds exactly what per-pattern re.findall
+    does, and that html_extract.extract_page returns what each regex scraper
+    extracted before it (the former_* functions), on synthetic category pages
+    and every page under corpus_dirs; then time the two ways of extracting a page.
+    """
+    import html_extract
+    import fixed_scraper
+    import resilient_scraper
+
+    pages = [(f"synthetic-{i}", synthetic_category_page(products, seed=i)) for i in range(page_count)]
+    for corpus_dir in corpus_dirs:
+        for root, _, files in os.walk(corpus_dir):
+            for file_name in sorted(files):
+                if file_name.endswith((".html", ".htm")):
+                    with open(os.path.join(root, file_name), encoding="utf-8", errors="replace") as f:
+                        pages.append((os.path.join(root, file_name), f.read()))
+
+    patterns = html_extract.CATEGORY_PATTERNS + html_extract.PRODUCT_BLOCK_PATTERNS + [html_extract.IMAGE_PATTERN]
+    base_url = "https://www.mobilesentrix.com/"
+    # Each scraper's block parser now, and the one it had before
+    parsers = {
+        "resilient": (resilient_scraper.parse_product_block, former_resilient_block),
+        "fixed": (fixed_scraper.parse_product_block, former_fixed_block)
+    }
+
+    mismatches = 0
+    totals = {"former": 0.0, "single pass": 0.0}
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for name, html in pages:
+            index = html_extract.PageIndex(html)
+            for pattern in patterns:
+                if index.findall(pattern) != pattern.regex.findall(html):
+                    mismatches += 1
+                    print(f"Mismatch for {pattern.regex.pattern[:40]!r} on {name}", file=sys.stderr)
+            for parser_name, (parse_block, former_block) in parsers.items():
+                if html_extract.extract_page(html, base_url, parse_block) != former_extract_page(html, base_url, former_block):
+                    mismatches += 1
+                    print(f"Mismatch in {parser_name} extraction on {name}", file=sys.stderr)
+
+            totals["former"] += min(
+                _timed(former_extract_page, html, base_url, former_fixed_block) for _ in range(repeats)
+            )
+            totals["single pass"] += min(
+                _timed(html_extract.extract_page, html, base_url, fixed_scraper.parse_product_block)
+                for _ in range(repeats)
+            )
+
+    total_mb = sum(len(html) for _, html in pages) / (1024 * 1024)
+    print(f"{len(pages)} pages, {total_mb:.1f} MB, {mismatches} mismatches against the former extraction")
+    print(f"{'method':>12} {'seconds':>8} {'MB/s':>8}")
+    for label, seconds in totals.items():
+        print(f"{label:>12} {seconds:>8.3f} {total_mb / seconds:>8.1f}")
+    if mismatches:
+        sys.exit(1)
+
+def _card_fields(element):
+    if element is None:
+        return None
+    return (element.get_text(strip=True), element.get('href'), element.get('src'))
+
+def _cascade(node, selectors):
+    """The scrapers' original loop: select_one with each selector until one matches."""
+    for selector in selectors:
+        element = node.select_one(selector)
+        if element:
+            return element
+    return None
+
+def benchmark_parse(page_count, products):
+    """
+    Parse synthetic category pages and pick the name/price/image of every product
+    card, first with the original BeautifulSoup loops, then through PageParser
+    with each backend, checking all of them extract the same fields.
+    """
+    from bs4 import BeautifulSoup
+    import page_parser
+    from mobilesentrix_scraper import PRODUCT_SELECTORS, NAME_SELECTORS, PRICE_SELECTORS, IMG_SELECTORS
+
+    pages = [synthetic_category_page(products, categories=50, seed=i) for i in range(page_count)]
+    # Cards of one layout where an earlier name selector matches some cards only
+    pages.append(mixed_title_page(products))
+    card_selectors = (NAME_SELECTORS, PRICE_SELECTORS, IMG_SELECTORS)
+
+    def original():
+        parse_seconds = select_seconds = 0.0
+        fields = []
+        for html in pages:
+            start = time.perf_counter()
+            soup = BeautifulSoup(html, 'html.parser')
+            parse_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            cards = []
+            for selector in PRODUCT_SELECTORS:
+                cards = soup.select(selector)
+                if cards:
+                    break
+            for card in cards:
+                fields.append(tuple(_card_fields(_cascade(card, selectors)) for selectors in card_selectors))
+            select_seconds += time.perf_counter() - start
+        return fields, parse_seconds, select_seconds
+
+    def pooled(backend_name):
+        parser = page_parser.PageParser(backend_name)
+        product_chain = parser.chain(PRODUCT_SELECTORS)
+        chains = [parser.chain(selectors) for selectors in card_selectors]
+        fields = []
+        for html in pages:
+            cards, _ = product_chain.all(parser.parse(html))
+            for card in cards:
+                layout = parser.layout_key(card)
+                fields.append(tuple(_card_fields(chain.first(card, layout)[0]) for chain in chains))
+        return fields, parser.parse_seconds, parser.select_seconds
+
+    runs = [("original bs4", original)]
+    runs.append(("bs4", lambda: pooled("bs4")))
+    if page_parser.LXML_BACKEND is not None:
+        runs.append(("lxml", lambda: pooled("lxml")))
+
+    reference = None
+    print(f"{'parser':>14} {'cards':>7} {'parse ms/page':>14} {'select ms/page':>15} {'same fields':>12}")
+    for label, run in runs:
+        fields, parse_seconds, select_seconds = run()
+        reference = fields if reference is None else reference
+        print(f"{label:>14} {len(fields):>7} {parse_seconds * 1000 / len(pages):>14.1f} "
+              f"{select_seconds * 1000 / len(pages):>15.1f} {str(fields == reference):>12}")
+
+async def _benchmark_offload(categories, products_per_page, latency, filler_kb, worker_counts):
+    from aiohttp import web
+
+    runner = web.AppRunner(catalog_app(categories, products_per_page, latency, filler_kb))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}/"
+
+    reference = None
+    print(f"{'parsing':>12} {'products':>9} {'seconds':>8} {'pages/s':>8} {'p95 ms':>7} "
+          f"{'lag p95 ms':>11} {'lag max ms':>11} {'same':>5}")
+    try:
+        for workers in worker_counts:
+            scraper = await _crawl_once(base_url, 8, 8, 1000.0, parse_workers=workers)
+            stats = scraper.scheduler.summary()
+            products = sorted(scraper.checkpoint.records(), key=lambda product: product["product_url"])
+            reference = products if reference is None else reference
+            label = f"{workers} procs" if workers else "inline"
+            print(f"{label:>12} {len(products):>9} {stats['seconds']:>8.2f} {stats['fetches_per_second']:>8.1f} "
+                  f"{stats['p95_latency'] * 1000:>7.0f} {stats['p95_loop_lag'] * 1000:>11.1f} "
+                  f"{stats['max_loop_lag'] * 1000:>11.1f} {str(products == reference):>5}")
+    finally:
+        await runner.cleanup()
+
+def benchmark_offload(categories, products_per_page, latency, filler_kb, worker_counts):
+    """
+    Crawl a local catalog with heavy category pages, parsing inline on the
+    event loop and then on process pools, and compare pages/s and loop lag.
+    """
+    import mobilesentrix_scraper  # configures logging on import; quieten it afterwards
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(_benchmark_offload(categories, products_per_page, latency, filler_kb, worker_counts))
+
+async def _benchmark_resume(categories, products_per_page, latency, checkpoint_path):
+    import aiohttp
+    from aiohttp import web
+    from crawl_checkpoint import CrawlCheckpoint
+
+    runner = web.AppRunner(catalog_app(categories, products_per_page, latency))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}/"
+
+    def records(scraper):
+        return sorted(scraper.checkpoint.records(), key=lambda product: product["product_url"])
+
+    print(f"{'run':>12} {'fetches':>8} {'records':>8} {'seconds':>8}")
+    try:
+        full = await _crawl_once(base_url, 4, 4, 1000.0)
+        print(f"{'full':>12} {full.scheduler.summary()['fetches']:>8} {full.checkpoint.record_count():>8} "
+              f"{full.scheduler.summary()['seconds']:>8.2f}")
+
+        # Cancel the first run half way, as Ctrl-C would, then resume from its checkpoint file
+        target = full.checkpoint.record_count() // 2
+        runs = []
+        for label, resume in (("interrupted", False), ("resumed", True)):
+            scraper = _crawl_scraper(base_url, 4, 4, 1000.0, checkpoint=CrawlCheckpoint(checkpoint_path))
+            async with aiohttp.ClientSession() as session:
+                crawl = asyncio.create_task(scraper.crawl(session, resume))
+                while not resume and not crawl.done() and scraper.checkpoint.record_count() < target:
+                    await asyncio.sleep(0.005)
+                if not resume:
+                    crawl.cancel()
+                await asyncio.gather(crawl, return_exceptions=True)
+            stats = scraper.scheduler.summary()
+            print(f"{label:>12} {stats['fetches']:>8} {scraper.checkpoint.record_count():>8} {stats['seconds']:>8.2f}")
+            runs.append(scraper)
+            if not resume:
+                scraper.checkpoint.close()
+
+        resumed = runs[-1]
+        refetched = sum(run.scheduler.summary()["fetches"] for run in runs) - full.scheduler.summary()["fetches"]
+        print(f"same records as the full crawl: {records(resumed) == records(full)}, "
+              f"pages fetched twice: {refetched}")
+        resumed.checkpoint.close()
+    finally:
+        await runner.cleanup()
+
+def benchmark_resume(categories, products_per_page, latency):
+    """Interrupt a crawl half way, resume it from the checkpoint and compare with an uninterrupted crawl."""
+    import mobilesentrix_scraper  # configures logging on import; quieten it afterwards
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoint_path = os.path.join(tmp_dir, "checkpoint.sqlite")
+        asyncio.run(_benchmark_resume(categories, products_per_page, latency, checkpoint_path))
+
+def synthetic_listing(count):
+    """Yield scraped-product dicts shaped like MobileSentrixScraper.parse_product output."""
+    categories = ["Lcd Assemblies", "Batteries", "Back Covers", "Cameras"]
+    for i in range(count):
+        yield {
+            "name": f"Replacement Part {i} for Model {i % 500}",
+            "price": 10.99 + i % 90 if i % 10 else None,
+            "image_url": f"https://example.com/media/p{i}.webp",
+            "specifications": "Compatible with the original part. " * 4,
+            "description": f"Synthetic benchmark product {i}",
+            "product_url": f"https://example.com/product/p{i}",
+            "category": categories[i % len(categories)]
+        }
+
+def _concatenated_report(products):
+    """The scrapers' previous report: one unescaped string with every product card."""
+    html = "<!DOCTYPE html><html><body><div class=\"product-grid\">"
+    for product in products:
+        price = product.get("price", "N/A")
+        html += f"""
+            <div class="product-card">
+                <img src="{product.get('image_url', '')}" class="product-image">
+                <div class="product-title">{product.get('name', 'Unknown Product')}</div>
+                <div class="product-price">{f"${price:.2f}" if isinstance(price, (int, float)) else price}</div>
+                <div class="product-category">{product.get('category', 'Unknown')}</div>
+                <a href="{product.get('product_url', '')}" target="_blank">View Product</a>
+            </div>"""
+    return html + "</div></body></html>"
+
+def _save_in_memory(scraper, products):
+    """The scraper's previous save path: list, cleaned copy, DataFrame, JSON dump and report string."""
+    import json
+    import pandas as pd
+
+    products_data = list(products)
+    cleaned_data = [scraper._clean_product(product) for product in products_data]
+    df = pd.DataFrame(cleaned_data)
+    df.to_csv(os.path.join(scraper.output_dir, "in_memory.csv"), index=False, encoding='utf-8')
+    for category in df['category'].unique():
+        df[df['category'] == category].to_csv(os.path.join(scraper.output_dir, f"in_memory_{category}.csv"),
+                                              index=False, encoding='utf-8')
+    with open(os.path.join(scraper.output_dir, "in_memory.json"), 'w', encoding='utf-8') as f:
+        json.dump(cleaned_data, f, indent=2)
+    report = _concatenated_report(cleaned_data)
+    with open(os.path.join(scraper.output_dir, "in_memory.html"), 'w', encoding='utf-8') as f:
+        f.write(report)
+
+def _save_streaming(scraper, products):
+    """Write each product to the record sink as it arrives, then stream the reports from it."""
+    scraper._open_sink(resume=False)
+    for product in products:
+        scraper.sink.write(scraper._clean_product(product))
+    asyncio.run(scraper.save_to_csv())
+
+def benchmark_sink(record_counts):
+    """
+    Compare peak Python heap (tracemalloc) and time of saving N products the
+    previous in-memory way and through the streaming record sink. Buffers
+    held by pyarrow are outside the Python heap and are not counted. Then
+    checks that a run that collects nothing leaves the previous files intact.
+    """
+    import tracemalloc
+    import pandas as pd
+    from crawl_checkpoint import CrawlCheckpoint
+    from mobilesentrix_scraper import MobileSentrixScraper
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'records':>9} {'method':>10} {'seconds':>8} {'peak MB':>8}")
+    for count in record_counts:
+        for label, save in (("in memory", _save_in_memory), ("streaming", _save_streaming)):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                scraper = MobileSentrixScraper(checkpoint=CrawlCheckpoint(None))
+                scraper.output_dir = tmp_dir
+                tracemalloc.start()
+                start = time.perf_counter()
+                save(scraper, synthetic_listing(count))
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print(f"{count:>9} {label:>10} {elapsed:>8.2f} {peak / (1024 * 1024):>8.1f}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in (100, 0):
+            scraper = MobileSentrixScraper(checkpoint=CrawlCheckpoint(None))
+            scraper.output_dir = tmp_dir
+            _save_streaming(scraper, synthetic_listing(count))
+        rows = {extension: len(pd.read_parquet(path) if extension == "parquet" else
+                               pd.read_json(path, lines=True) if extension == "jsonl" else pd.read_csv(path))
+                for extension, path in scraper.sink.paths.items()}
+        leftovers = [name for name in os.listdir(tmp_dir) if name.endswith(".tmp")]
+        print(f"empty run after 100 records: {rows} rows still readable, {len(leftovers)} temporary files left")
+
+def benchmark_report(count, page_size, changed):
+    """
+    Render a report of N products as one concatenated string (the previous
+    generators), then through html_report: a first run, a rerun with nothing
+    changed and a rerun with `changed` products in the middle edited. Prints
+    the time and how many pages were rendered or reused, then the peak Python
+    heap (tracemalloc, in a separate pass since tracing slows the runs down).
+    """
+    import tracemalloc
+    from html_report import write_report
+
+    def edited(products):
+        for i, product in enumerate(products):
+            if count // 2 <= i < count // 2 + changed:
+                product["price"] = 1.0
+            yield product
+
+    def concatenated(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_concatenated_report(synthetic_listing(count)))
+
+    def streamed(path, products=None):
+        return write_report(path, products or synthetic_listing(count), "Benchmark report", total=count,
+                            page_size=page_size, fields={"image": "image_url", "url": "product_url"})
+
+    print(f"{count} products, {page_size} per page")
+    print(f"{'run':>22} {'seconds':>8} {'rendered':>9} {'reused':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "report.html")
+        runs = [
+            ("concatenated string", lambda: concatenated(os.path.join(tmp_dir, "concatenated.html"))),
+            ("streamed, first run", lambda: streamed(path)),
+            ("streamed, unchanged", lambda: streamed(path)),
+            (f"streamed, {changed} edited", lambda: streamed(path, edited(synthetic_listing(count))))
+        ]
+        for label, run in runs:
+            start = time.perf_counter()
+            summary = run() or {"rendered": "-", "reused": "-"}
+            elapsed = time.perf_counter() - start
+            print(f"{label:>22} {elapsed:>8.2f} {summary['rendered']:>9} {summary['reused']:>7}")
+
+    for label, run in (("concatenated string", concatenated), ("streamed", streamed)):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tracemalloc.start()
+            run(os.path.join(tmp_dir, "report.html"))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print(f"peak heap, {label}: {peak / (1024 * 1024):.1f} MB")
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def main():
+    """Parse arguments and run the selected benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark scraper components")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    upsert_parser = subparsers.add_parser("upsert", help="DatabaseScraper batched upsert throughput")
+    upsert_parser.add_argument("--products", type=int, default=10_000)
+    upsert_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000])
+
+    crawl_parser = subparsers.add_parser("crawl", help="crawl scheduler throughput against a local server")
+    crawl_parser.add_argument("--categories", type=int, default=10)
+    crawl_parser.add_argument("--products", type=int, default=20, help="products per category page")
+    crawl_parser.add_argument("--latency", type=float, default=0.05, help="server response delay in seconds")
+    crawl_parser.add_argument("--rps", type=float, default=100.0, help="per-host requests per second")
+
+    cache_parser = subparsers.add_parser("http-cache", help="cold vs revalidated vs offline crawl")
+    cache_parser.add_argument("--categories", type=int, default=10)
+    cache_parser.add_argument("--products", type=int, default=20, help="products per category page")
+    cache_parser.add_argument("--latency", type=float, default=0.05, help="server response delay in seconds")
+
+    pool_parser = subparsers.add_parser("pool", help="pooled keep-alive client vs urlopen over local TLS")
+    pool_parser.add_argument("--requests", type=int, default=500)
+    pool_parser.add_argument("--page-kb", type=int, default=50, help="response body size in KB")
+
+    extract_parser = subparsers.add_parser("extract", help="single-pass regex extraction parity and speed")
+    extract_parser.add_argument("--pages", type=int, default=5, help="synthetic category pages to generate")
+    extract_parser.add_argument("--products", type=int, default=2000, help="product cards per synthetic page")
+    extract_parser.add_argument("--corpus", nargs="*", default=[], help="directories of saved HTML pages")
+
+    parse_parser = subparsers.add_parser("parse", help="BeautifulSoup vs lxml parse and select time")
+    parse_parser.add_argument("--pages", type=int, default=20)
+    parse_parser.add_argument("--products", type=int, default=200, help="product cards per page")
+
+    offload_parser = subparsers.add_parser("offload", help="parsing on the event loop vs a process pool")
+    offload_parser.add_argument("--categories", type=int, default=8)
+    offload_parser.add_argument("--products", type=int, default=300, help="products per category page")
+    offload_parser.add_argument("--latency", type=float, default=0.02, help="server response delay in seconds")
+    offload_parser.add_argument("--filler-kb", type=int, default=200, help="extra markup per category page")
+    offload_parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4],
+                                help="parse worker counts to compare (0 = inline)")
+
+    resume_parser = subparsers.add_parser("resume", help="interrupted and resumed crawl vs a full crawl")
+    resume_parser.add_argument("--categories", type=int, default=10)
+    resume_parser.add_argument("--products", type=int, default=20, help="products per category page")
+    resume_parser.add_argument("--latency", type=float, default=0.02, help="server response delay in seconds")
+
+    sink_parser = subparsers.add_parser("sink", help="in-memory vs streaming output files, peak memory")
+    sink_parser.add_argument("--records", type=int, nargs="+", default=[10_000, 100_000])
+
+    report_parser = subparsers.add_parser("report", help="concatenated vs streamed, paginated HTML report")
+    report_parser.add_argument("--records", type=int, default=100_000)
+    report_parser.add_argument("--page-size", type=int, default=1000)
+    report_parser.add_argument("--changed", type=int, default=10, help="products edited before the last run")
+
+    retry_parser = subparsers.add_parser("retry", help="fixed-delay retries vs the retry policy under faults")
+    retry_parser.add_argument("--delay", type=float, default=0.5, help="old fixed retry delay in seconds (was 2)")
+    retry_parser.add_argument("--categories", type=int, default=10)
+    retry_parser.add_argument("--products", type=int, default=20, help="products per category page")
+    retry_parser.add_argument("--latency", type=float, default=0.02, help="server response delay in seconds")
+    retry_parser.add_argument("--fail-every", type=int, default=5, help="fail 1 in N product pages once")
+
+    sitemap_parser = subparsers.add_parser("sitemap", help="sitemap discovery and lastmod change detection")
+    sitemap_parser.add_argument("--urls", type=int, default=500_000)
+    sitemap_parser.add_argument("--per-file", type=int, default=50_000, help="URLs per child sitemap")
+    sitemap_parser.add_argument("--moved", type=int, default=5000, help="lastmods moved before the last run")
+    sitemap_parser.add_argument("--categories", type=int, default=5)
+    sitemap_parser.add_argument("--products", type=int, default=10, help="products per category page")
+    sitemap_parser.add_argument("--latency", type=float, default=0.02, help="server response delay in seconds")
+
+    delta_parser = subparsers.add_parser("delta", help="full vs incremental crawl and the listing delta")
+    delta_parser.add_argument("--categories", type=int, default=20)
+    delta_parser.add_argument("--products", type=int, default=50, help="products per category page")
+    delta_parser.add_argument("--latency", type=float, default=0.02, help="server response delay in seconds")
+    delta_parser.add_argument("--changed", type=int, default=10, help="products repriced before a run")
+    delta_parser.add_argument("--removed", type=int, default=5, help="products delisted before a run")
+
+    args = parser.parse_args()
+
+    if args.command == "upsert":
+        benchmark_upsert(args.products, args.batch_sizes)
+    elif args.command == "crawl":
+        benchmark_crawl(args.categories, args.products, args.latency, args.rps)
+    elif args.command == "http-cache":
+        benchmark_http_cache(args.categories, args.products, args.latency)
+    elif args.command == "pool":
+        benchmark_pool(args.requests, args.page_kb)
+    elif args.command == "extract":
+        benchmark_extract(args.pages, args.products, args.corpus)
+    elif args.command == "parse":
+        benchmark_parse(args.pages, args.products)
+    elif args.command == "offload":
+        benchmark_offload(args.categories, args.products, args.latency, args.filler_kb, args.workers)
+    elif args.command == "resume":
+        benchmark_resume(args.categories, args.products, args.latency)
+    elif args.command == "sink":
+        benchmark_sink(args.records)
+    elif args.command == "report":
+        benchmark_report(args.records, args.page_size, args.changed)
+    elif args.command == "retry":
+        benchmark_retry(args.delay, args.categories, args.products, args.latency, args.fail_every)
+    elif args.command == "sitemap":
+        benchmark_sitemap(args.urls, args.per_file, args.moved, args.categories, args.products, args.latency)
+    elif args.command == "delta":
+        benchmark_delta(args.categories, args.products, args.latency, args.changed, args.removed)
+
+    if _output is not None:
+        _output.cleanup()
+
+if __name__ == "__main__":
+    main()
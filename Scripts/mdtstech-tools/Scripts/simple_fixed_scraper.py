@@ -5,16 +5,21 @@ Simple Fixed MobileSentrix Scraper
 A very simple scraper that focuses on correctly extracting product names and prices.
 """
 
-import urllib.request
+import urllib.error
 import re
 import os
 import json
-import ssl
 from datetime import datetime
 
+import html_report
+from http_cache import default_cache
+from http_client import default_client
+
 # Configuration
 TARGET_URL = "https://www.mobilesentrix.com/"
 OUTPUT_DIR = "output"
+RESPONSE_CACHE = default_cache()
+HTTP_CLIENT = default_client()  # Keep-alive connections shared by every fetch
 
 def create_output_dir():
     """Create output directory if it doesn't exist."""
@@ -23,30 +28,35 @@ def create_output_dir():
     return True
 
 def fetch_url(url):
-    """Fetch URL content with SSL verification disabled."""
+    """Fetch URL content with SSL verification disabled, revalidating cached copies."""
     print(f"Fetching {url}...")
     
+    # In offline mode, serve the page from the response cache only
+    if RESPONSE_CACHE.offline:
+        return RESPONSE_CACHE.replay(url)
+    
     # Create request with headers
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.5',
     }
+    headers.update(RESPONSE_CACHE.headers_for(url))
     
-    # Create request
-    req = urllib.request.Request(url, headers=headers)
-    
-    # Disable SSL verification
-    context = ssl.create_default_context()
-    context.check_hostname = False
-    context.verify_mode = ssl.CERT_NONE
-    
-    # Fetch content
+    # Fetch content over a pooled keep-alive connection, with SSL verification disabled
     try:
-        response = urllib.request.urlopen(req, context=context, timeout=30)
+        response = HTTP_CLIENT.open(url, headers=headers, timeout=30, verify=False)
         html = response.read().decode('utf-8', errors='replace')
         print(f"Successfully fetched {url}")
+        RESPONSE_CACHE.store(url, html, response.headers)
         return html
+    except urllib.error.HTTPError as e:
+        # 304 Not Modified: the cached copy is still current
+        if e.code == 304:
+            print(f"Not modified since last crawl, using cached copy of {url}")
+            return RESPONSE_CACHE.revalidated(url)
+        print(f"Error fetching {url}: {e}")
+        return None
     except Exception as e:
         print(f"Error fetching {url}: {e}")
         return None
@@ -141,48 +151,18 @@ def save_products_to_file(products):
     return filepath
 
 def generate_html_report(products):
-    """Generate a simple HTML report."""
-    html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>MobileSentrix Products</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; }}
-        .container {{ max-width: 1200px; margin: 0 auto; }}
-        h1 {{ color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px; }}
-        .product-grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(250px, 1fr)); gap: 20px; }}
-        .product-card {{ border: 1px solid #ddd; border-radius: 5px; padding: 15px; }}
-        .product-image {{ width: 100%; height: 200px; object-fit: contain; }}
-        .product-title {{ font-weight: bold; margin: 10px 0 5px; }}
-        .product-price {{ color: #e63946; font-weight: bold; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>MobileSentrix Products</h1>
-        <p>Scraped on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        <p>Total Products: {len(products)}</p>
-        
-        <div class="product-grid">
-            {"".join(f'''
-            <div class="product-card">
-                <img src="{product['image']}" alt="{product['name']}" class="product-image" onerror="this.src='data:image/svg+xml;charset=UTF-8,%3Csvg%20width%3D%22200%22%20height%3D%22200%22%20xmlns%3D%22http%3A%2F%2Fwww.w3.org%2F2000%2Fsvg%22%20viewBox%3D%220%200%20200%20200%22%20preserveAspectRatio%3D%22none%22%3E%3Cdefs%3E%3Cstyle%20type%3D%22text%2Fcss%22%3E%23holder_1687a4b89fe%20text%20%7B%20fill%3A%23AAAAAA%3Bfont-weight%3Abold%3Bfont-family%3AArial%2C%20Helvetica%2C%20Open%20Sans%2C%20sans-serif%2C%20monospace%3Bfont-size%3A10pt%20%7D%20%3C%2Fstyle%3E%3C%2Fdefs%3E%3Cg%20id%3D%22holder_1687a4b89fe%22%3E%3Crect%20width%3D%22200%22%20height%3D%22200%22%20fill%3D%22%23EEEEEE%22%3E%3C%2Frect%3E%3Cg%3E%3Ctext%20x%3D%2274.4296875%22%20y%3D%22104.5%22%3ENo%20Image%3C%2Ftext%3E%3C%2Fg%3E%3C%2Fg%3E%3C%2Fsvg%3E';">
-                <div class="product-title">{product['name']}</div>
-                <div class="product-price">{product['price']}</div>
-                <a href="{product['url']}" target="_blank">View Product</a>
-            </div>
-            ''' for product in products)}
-        </div>
-    </div>
-</body>
-</html>"""
-    
+    """Write the HTML report of the products and return its first page's path."""
     filepath = os.path.join(OUTPUT_DIR, 'mobilesentrix_report.html')
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(html)
-    print(f"Generated HTML report: {filepath}")
+    report = html_report.write_report(
+        filepath,
+        products,
+        "MobileSentrix Products",
+        stats=[
+            ("Scraped on", datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+            ("Total Products", len(products))
+        ]
+    )
+    print(f"Generated HTML report: {filepath} ({len(report['paths'])} pages)")
     
     return filepath
 
@@ -212,6 +192,7 @@ def main():
     
     # Generate HTML report
     generate_html_report(products)
+    print(RESPONSE_CACHE.format_summary())
     
     print("\n" + "=" * 60)
     print("SCRAPING COMPLETED SUCCESSFULLY")
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Sitemap Discovery
+-----------------
+Product discovery from sitemap.xml for the asyncio scrapers, instead of
+crawling the navigation menu, category pages and paginated listings.
+
+Sitemaps and sitemap indexes are parsed as they download: chunks go into
+an incremental XML parser and each <url> is handed on and dropped as soon
+as it is complete, so a 50,000-URL sitemap never sits in memory as a
+document. Gzip-compressed sitemaps (.xml.gz) are decompressed as they stream.
+
+Each URL's <lastmod> is compared with the lastmod recorded when the URL
+was last scraped. The records live in LastmodStore, an SQLite file kept
+across runs, together with the product scraped from the URL. In incremental
+mode (SCRAPER_INCREMENTAL, --incremental) only new URLs, URLs whose lastmod
+moved and URLs without a lastmod are handed to the crawl; the stored product
+of every other listed URL is written out again, so the output still holds
+the whole catalog. Otherwise every listed URL is crawled.
+
+Configuration (environment variables):
+    SCRAPER_DISCOVERY         "crawl" (navigation and listings, default) or "sitemap"
+    SCRAPER_SITEMAP_URL       sitemap or sitemap index URL (default <base url>/sitemap.xml)
+    SCRAPER_SITEMAP_INCLUDE   regular expression a URL must match to be crawled as a product
+                              (default: every URL listed)
+"""
+
+import os
+import re
+import json
+import zlib
+import logging
+import sqlite3
+import xml.etree.ElementTree as ET
+
+from crawl_checkpoint import CHECKPOINT_DIR
+
+logger = logging.getLogger("sitemap_discovery")
+
+DISCOVERY = os.environ.get("SCRAPER_DISCOVERY", "crawl")
+SITEMAP_URL = os.environ.get("SCRAPER_SITEMAP_URL", "")
+SITEMAP_INCLUDE = os.environ.get("SCRAPER_SITEMAP_INCLUDE", "")
+
+CHUNK_BYTES = 64 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+
+class SitemapParser:
+    """
+    Incremental parser for sitemaps and sitemap indexes.
+
+    feed() takes the next chunk of the (possibly gzip-compressed) document
+    and returns the entries completed by it as (kind, loc, lastmod) tuples,
+    where kind is "url" for a page and "sitemap" for a child sitemap of an
+    index. close() returns whatever the last chunk completed.
+    """
+
+    def __init__(self):
+        self.parser = ET.XMLPullParser(events=("start", "end"))
+        self.root = None
+        self.decompressor = None
+        self.sniffed = False
+
+    def feed(self, chunk):
+        if not self.sniffed:
+            self.sniffed = True
+            if chunk[:2] == GZIP_MAGIC:
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self.decompressor is not None:
+            chunk = self.decompressor.decompress(chunk)
+        self.parser.feed(chunk)
+        return self._entries()
+
+    def close(self):
+        if self.decompressor is not None:
+            self.parser.feed(self.decompressor.flush())
+        self.parser.close()
+        return self._entries()
+
+    def _entries(self):
+        entries = []
+        for event, element in self.parser.read_events():
+            if event == "start":
+                if self.root is None:
+                    self.root = element
+                continue
+            kind = element.tag.rpartition("}")[2]
+            if kind not in ("url", "sitemap"):
+                continue
+            loc = lastmod = None
+            for child in element:
+                name = child.tag.rpartition("}")[2]
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = (child.text or "").strip() or None
+            # Entries are handed on as they complete; drop them from the tree
+            self.root.clear()
+            if loc:
+                entries.append((kind, loc, lastmod))
+        return entries
+
+class _no_throttle:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc):
+        return False
+
+async def iter_sitemap(session, sitemap_url, throttle=None, include=None):
+    """
+    Yield (url, lastmod) for every page listed in the sitemap at sitemap_url,
+    following sitemap indexes. `throttle(url)` is an optional async context
+    manager held around each download (e.g. CrawlScheduler.throttle); only
+    URLs matching the `include` pattern are yielded.
+    """
+    pattern = re.compile(include) if include else None
+    pending = [sitemap_url]
+    seen = set()
+    while pending:
+        url = pending.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        parser = SitemapParser()
+        try:
+            async with (throttle(url) if throttle else _no_throttle()), session.get(url) as response:
+                if response.status != 200:
+                    logger.warning(f"Sitemap {url}: status {response.status}")
+                    continue
+                async for chunk in response.content.iter_chunked(CHUNK_BYTES):
+                    for kind, loc, lastmod in parser.feed(chunk):
+                        if kind == "sitemap":
+                            pending.append(loc)
+                        elif pattern is None or pattern.search(loc):
+                            yield loc, lastmod
+            entries = parser.close()
+        except (ET.ParseError, zlib.error) as e:
+            logger.error(f"Sitemap {url} is not a valid sitemap: {e}")
+            continue
+        for kind, loc, lastmod in entries:
+            if kind == "sitemap":
+                pending.append(loc)
+            elif pattern is None or pattern.search(loc):
+                yield loc, lastmod
+
+class LastmodStore:
+    """
+    The lastmod of every URL as of its last successful scrape, and the record
+    scraped from it, kept across runs.
+
+    split(entries) divides a batch of (url, lastmod) into the ones to crawl
+    and the stored records of the rest (split(entries, reuse=False) crawls
+    them all); record(url, lastmod, record) is called once a URL has been
+    scraped. A URL listed twice (in one child sitemap or in two) is only
+    returned by split the first time, until new_listing() starts the next
+    pass over the sitemap. A store created with path=None lives in memory,
+    so every URL counts as new.
+    """
+
+    def __init__(self, path, flush_every=1000):
+        self.path = path
+        self.flush_every = flush_every
+        self.connection = None
+        self._unflushed = 0
+        self._batches = 0
+
+    def _connect(self):
+        """Open (and create) the store on first use, so importing a scraper touches no files."""
+        if self.connection is None:
+            if self.path is None:
+                self.connection = sqlite3.connect(":memory:")
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self.connection = sqlite3.connect(self.path)
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS lastmod (url TEXT PRIMARY KEY, lastmod TEXT, record TEXT)"
+            )
+            # Stores written before records were kept get the column; their URLs are crawled once more
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(lastmod)")]
+            if "record" not in columns:
+                self.connection.execute("ALTER TABLE lastmod ADD COLUMN record TEXT")
+            # URLs split during this listing, numbered by the split call that first saw them
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS listed (url TEXT PRIMARY KEY, lastmod TEXT, batch INTEGER)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS temp.listed_batch ON listed (batch)")
+        return self.connection
+
+    def new_listing(self):
+        """Forget the URLs split so far, before the next pass over the sitemap."""
+        if self.connection is not None:
+            self.connection.execute("DELETE FROM listed")
+
+    def split(self, entries, reuse=True):
+        """
+        Return (changed, unchanged): the (url, lastmod) entries that are new,
+        have no lastmod, moved their lastmod or have no stored record, and
+        (url, record) for the others; with reuse=False every entry is changed.
+        URLs already split in this listing are left out, and a URL repeated
+        within entries keeps its first lastmod.
+        """
+        connection = self._connect()
+        self._batches += 1
+        connection.executemany("INSERT OR IGNORE INTO listed (url, lastmod, batch) VALUES (?, ?, ?)",
+                               ((url, lastmod, self._batches) for url, lastmod in entries))
+        rows = connection.execute(
+            "SELECT listed.url, listed.lastmod, lastmod.lastmod, lastmod.record "
+            "FROM listed LEFT JOIN lastmod ON lastmod.url = listed.url "
+            "WHERE listed.batch = ? ORDER BY listed.rowid", (self._batches,)
+        ).fetchall()
+        changed, unchanged = [], []
+        for url, lastmod, stored, record in rows:
+            if not reuse or lastmod is None or record is None or stored != lastmod:
+                changed.append((url, lastmod))
+            else:
+                unchanged.append((url, json.loads(record)))
+        return changed, unchanged
+
+    def changed(self, entries):
+        """Return the (url, lastmod) entries to crawl (see split)."""
+        return self.split(entries)[0]
+
+    def record(self, url, lastmod, record=None):
+        """Remember the lastmod a URL had when it was scraped, and the record scraped from it."""
+        self._connect().execute(
+            "INSERT OR REPLACE INTO lastmod (url, lastmod, record) VALUES (?, ?, ?)",
+            (url, lastmod, json.dumps(record) if record is not None else None)
+        )
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def count(self):
+        """Return the number of URLs with a recorded lastmod."""
+        return self._connect().execute("SELECT COUNT(*) FROM lastmod").fetchone()[0]
+
+    def flush(self):
+        """Commit recorded lastmods to disk."""
+        if self.connection is not None:
+            self.connection.commit()
+        self._unflushed = 0
+
+    def close(self):
+        """Commit and close the underlying SQLite connection."""
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+def default_lastmod_store(name):
+    """Return the LastmodStore for scraper `name`, next to its crawl checkpoint."""
+    if CHECKPOINT_DIR.lower() in ("", "off", "0", "none"):
+        return LastmodStore(None)
+    return LastmodStore(os.path.join(CHECKPOINT_DIR, f"{name}_lastmod.sqlite"))
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the catalog data scripts.
+This script generates synthetic product CSVs and measures the normalization
+pipeline on them (run time, peak memory or output read-back time).
+
+Usage:
+    python database/benchmark.py merge --rows 10000 100000 1000000
+    python database/benchmark.py incremental
+    python database/benchmark.py stream --rows 100000 300000 1000000 --chunksize 50000
+    python database/benchmark.py formats --rows 1000000
+    python database/benchmark.py datatable --rows 1000000 --files 30
+    python database/benchmark.py slugs --rows 1000000 --distinct 200000
+    python database/benchmark.py skus --rows 1000000 --lookups 100000
+    python database/benchmark.py dedupe --rows 10000 100000 1000000
+    python database/benchmark.py schema --rows 1000000
+"""
+
+import io
+import os
+import re
+import csv
+import sys
+import glob
+import shutil
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import skus
+import slugs
+import merge_data
+import source_formats
+import near_duplicates
+import schema_alignment
+
+def generate_product_csv(path, rows, seed=0):
+    """Write a synthetic product CSV with categories, specs and variants."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Title': [f"Replacement Part {i} Compatible For Model {i % 500}" for i in range(rows)],
+        'Price': rng.uniform(1, 300, rows).round(2),
+        'Category': rng.choice(['LCD Assemblies', 'Batteries', 'Back Covers', 'Cameras', None], rows),
+        'Brand': rng.choice(['Apple', 'Samsung', 'Google', 'LG', 'Motorola'], rows),
+        'Stock': rng.integers(0, 100, rows),
+        'display': rng.choice(['6.1"', '6.7"', None], rows),
+        'storage': rng.choice(['64GB', '128GB', None, None], rows),
+        'variant_color': rng.choice(['Black', 'White', 'Red', None], rows),
+        'variant_color_price': rng.choice([0.0, 1.5, 3.0], rows)
+    })
+    df.to_csv(path, index=False)
+    return path
+
+def benchmark_merge(sizes):
+    """Time merge_data.normalize_product_data on synthetic inputs of each size."""
+    print(f"{'rows':>10} {'seconds':>10} {'rows/s':>12} {'products':>10} {'specs':>10} {'variants':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in sizes:
+            csv_path = generate_product_csv(os.path.join(tmp_dir, f"products_{rows}.csv"), rows)
+
+            start = time.perf_counter()
+            tables = merge_data.normalize_product_data([csv_path])
+            elapsed = time.perf_counter() - start
+
+            print(f"{rows:>10} {elapsed:>10.2f} {rows / elapsed:>12.0f} "
+                  f"{len(tables['products']):>10} {len(tables['product_specifications']):>10} "
+                  f"{len(tables['product_variants']):>10}")
+    # The synthetic CSVs have no SKU column, so every variant SKU starts with a generated product SKU
+    unkeyed = tables['product_variants']['sku'].str.match(r'(?:nan)?-').sum()
+    print(f"variant SKUs without a product SKU in front: {unkeyed}")
+
+def _run_merge_data(work_dir, *args):
+    """Run merge_data.py on work_dir/database/data and return the seconds it took."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, merge_data.__file__, *args], cwd=work_dir, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def benchmark_incremental(data_dir):
+    """
+    Normalize a copy of data_dir, rewrite one input file without changing its
+    rows and re-run with --incremental. Only that file is re-processed, and
+    every product should keep its ID and slug.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_dir = os.path.join(tmp_dir, "database", "data")
+        os.makedirs(input_dir)
+        csv_files = sorted(glob.glob(os.path.join(data_dir, "*.csv")))
+        for csv_file in csv_files:
+            shutil.copy(csv_file, input_dir)
+        products_path = os.path.join(input_dir, "normalized", "products.csv")
+
+        full = _run_merge_data(tmp_dir)
+        before = pd.read_csv(products_path, dtype=str)
+        with open(os.path.join(input_dir, os.path.basename(csv_files[0])), "a") as f:
+            f.write("\n")
+        incremental = _run_merge_data(tmp_dir, "--incremental")
+        after = pd.read_csv(products_path, dtype=str)
+
+    print(f"{len(csv_files)} files, {len(before)} products; full run {full:.2f}s, "
+          f"incremental run after rewriting {os.path.basename(csv_files[0])} {incremental:.2f}s")
+    changed = before.merge(after, on='id', how='outer', suffixes=('_before', '_after'))
+    changed = changed[changed['slug_before'].ne(changed['slug_after'])]
+    print(f"products whose slug changed: {len(changed)}, "
+          f"slug column identical: {before['slug'].equals(after['slug'])}")
+
+def _peak_rss_mb(code):
+    """Run code in a fresh interpreter and return its peak RSS in MB."""
+    script = (
+        "import sys, resource\n"
+        f"sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})\n"
+        f"{code}\n"
+        # Linux carries ru_maxrss over from the parent through fork and exec,
+        # so it would report this benchmark's own peak; VmHWM is the child's
+        "try:\n"
+        "    with open('/proc/self/status') as status:\n"
+        "        print(next(line.split()[1] for line in status if line.startswith('VmHWM:')))\n"
+        "except OSError:\n"
+        "    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], check=True,
+                            capture_output=True, text=True).stdout
+    max_rss = int(output.strip().splitlines()[-1])
+    # ru_maxrss is in bytes on macOS; VmHWM and ru_maxrss elsewhere are in kilobytes
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+def benchmark_stream(sizes, chunksize):
+    """
+    Compare peak RSS of the in-memory and streaming normalization paths at
+    each input size. Streaming holds one chunk at a time, so its peak should
+    stay flat as the input grows while the in-memory peak follows the input.
+    """
+    baseline = _peak_rss_mb("import merge_data")
+    print(f"interpreter with merge_data imported: {baseline:.1f} MB; streaming in chunks of {chunksize} rows")
+    print(f"{'rows':>10} {'input MB':>10} {'in-memory MB':>14} {'streaming MB':>14}")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in sizes:
+            csv_path = generate_product_csv(os.path.join(tmp_dir, f"products_{rows}.csv"), rows)
+            # Separate output directories, so neither run starts from the other's slug registry and SKU index
+            in_memory_dir = os.path.join(tmp_dir, f"in_memory_{rows}")
+            streaming_dir = os.path.join(tmp_dir, f"streaming_{rows}")
+            in_memory = _peak_rss_mb(
+                "import merge_data\n"
+                f"tables = merge_data.normalize_product_data([{csv_path!r}])\n"
+                f"merge_data.save_normalized_data(tables, {in_memory_dir!r})"
+            )
+            streaming = _peak_rss_mb(
+                "import merge_data\n"
+                f"merge_data.normalize_streaming([{csv_path!r}], {streaming_dir!r}, {chunksize})"
+            )
+            input_mb = os.path.getsize(csv_path) / (1024 * 1024)
+            print(f"{rows:>10} {input_mb:>10.1f} {in_memory:>14.1f} {streaming:>14.1f}")
+            results.append((input_mb, in_memory, streaming))
+    if len(results) > 1:
+        first_mb, first_in_memory, first_streaming = results[0]
+        last_mb, last_in_memory, last_streaming = results[-1]
+        print(f"input {last_mb / first_mb:.1f}x larger (+{last_mb - first_mb:.1f} MB): "
+              f"in-memory peak +{last_in_memory - first_in_memory:.1f} MB, "
+              f"streaming peak +{last_streaming - first_streaming:.1f} MB")
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def benchmark_formats(rows, repeats=3):
+    """Compare size on disk and read-back time of each normalized output format."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = generate_product_csv(os.path.join(tmp_dir, "products.csv"), rows)
+        tables = merge_data.normalize_product_data([csv_path])
+
+        print(f"{'format':>8} {'table':>24} {'MB':>8} {'write s':>8} {'read s':>8}")
+        for output_format in merge_data.OUTPUT_FORMATS:
+            output_dir = os.path.join(tmp_dir, output_format)
+            os.makedirs(output_dir)
+            for table_name, df in tables.items():
+                path = merge_data.table_path(output_dir, table_name, output_format)
+                schema = merge_data.table_schema(table_name) if output_format != "csv" else None
+
+                start = time.perf_counter()
+                merge_data.write_table(df, path, output_format, schema)
+                write_seconds = time.perf_counter() - start
+
+                read_seconds = min(
+                    _timed(merge_data.read_table, path, output_format) for _ in range(repeats)
+                )
+                size_mb = os.path.getsize(path) / (1024 * 1024)
+                print(f"{output_format:>8} {table_name:>24} {size_mb:>8.1f} "
+                      f"{write_seconds:>8.2f} {read_seconds:>8.2f}")
+
+DATATABLE_BADGES = ['https://static.mobilesentrix.com/wysiwyg/Badges/REFURBISHED.png',
+                    'https://static.mobilesentrix.com/wysiwyg/PREMIUM_1_.png', None]
+DATATABLE_COLORS = ['https://static.mobilesentrix.com/wysiwyg/Color_Badges/Black.png',
+                    'https://static.mobilesentrix.com/wysiwyg/All-Colors.png', None]
+
+def generate_datatable_csv(path, rows, seed=0):
+    """Write a synthetic raw listing export (Col0 name, Col1 "$14.51", Col5_HREF, Col6-8_SRC)."""
+    rng = np.random.default_rng(seed)
+    models = np.array(['LG Q92 5G / Q920', 'Samsung Galaxy S24 5G', 'LG V30 / V35 ThinQ', 'iPhone 13 Pro'])
+    parts = np.array(['LCD Assembly With Frame', 'Replacement Battery', 'Charging Port Board'])
+    ids = np.arange(rows).astype(str)
+    names = pd.Series(parts[rng.integers(0, len(parts), rows)]) + ' Compatible For ' + \
+        models[rng.integers(0, len(models), rows)] + ' (' + ids + ')'
+    images = 'https://static.mobilesentrix.com/catalog/product/small_image/1/7/' + ids + '.webp'
+    badges = rng.choice(np.array(DATATABLE_BADGES, dtype=object), rows)
+    has_badge = pd.notna(badges)
+    pd.DataFrame({
+        'Col0': names,
+        'Col1': pd.Series(rng.uniform(1, 300, rows)).map('${:,.2f}'.format),
+        'Col2': '-',
+        'Col3': '+',
+        'Col4': rng.choice(['Add to Cart', 'Add to Cart', 'Notify Me'], rows),
+        'Col5_HREF': 'https://www.mobilesentrix.com/part-' + ids,
+        # Products without a quality badge show their image first, as in the real exports
+        'Col6_SRC': np.where(has_badge, badges, images),
+        'Col7_SRC': images,
+        'Col8_SRC': rng.choice(np.array(DATATABLE_COLORS, dtype=object), rows)
+    }).to_csv(path, index=False)
+    return path
+
+def map_datatable_rows(path):
+    """Row-at-a-time reference parser for the datatable layout, for comparison."""
+    rows = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            price = re.sub(r'[^\d.\-]', '', row['Col1'] or '')
+            match = source_formats.NAME_PATTERN.match(row['Col0'])
+            sources = [row[column] for column in ('Col6_SRC', 'Col7_SRC', 'Col8_SRC') if row.get(column)]
+            images = [url for url in sources if '/catalog/product/' in url]
+            rows.append({
+                'name': row['Col0'].strip(),
+                'price': float(price) if price else float('nan'),
+                'image_url': images[0] if images else None,
+                'brand': match and match.group('brand'),
+                'stock_quantity': 0 if row['Col4'] == 'Notify Me' else None
+            })
+    return pd.DataFrame(rows)
+
+def benchmark_datatable(rows, file_count, data_dir):
+    """
+    Ingest a directory of synthetic datatable exports row by row and with the
+    vectorized mapper (C and pyarrow CSV engines), then compare how many rows
+    of the real exports in data_dir reach the products table before and after.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        per_file = -(-rows // file_count)
+        paths = [generate_datatable_csv(os.path.join(tmp_dir, f"datatable{i}.csv"), per_file, seed=i)
+                 for i in range(file_count)]
+        print(f"{per_file * file_count} rows in {file_count} files")
+        print(f"{'parser':>22} {'seconds':>8} {'rows/s':>10}")
+
+        start = time.perf_counter()
+        reference = pd.concat([map_datatable_rows(path) for path in paths], ignore_index=True)
+        elapsed = time.perf_counter() - start
+        print(f"{'row by row':>22} {elapsed:>8.2f} {len(reference) / elapsed:>10.0f}")
+
+        default_engine = source_formats.CSV_ENGINE
+        for engine in sorted({"c", default_engine}):
+            source_formats.CSV_ENGINE = engine
+            start = time.perf_counter()
+            mapped = pd.concat([source_formats.read_source(path) for path in paths], ignore_index=True)
+            elapsed = time.perf_counter() - start
+            print(f"{f'vectorized, {engine}':>22} {elapsed:>8.2f} {len(mapped) / elapsed:>10.0f}")
+        source_formats.CSV_ENGINE = default_engine
+
+        same = (
+            np.allclose(mapped['price'], reference['price'], equal_nan=True)
+            and mapped['image_url'].astype(object).equals(reference['image_url'].astype(object))
+            and mapped['stock_quantity'].fillna(-1).equals(reference['stock_quantity'].astype(float).fillna(-1))
+        )
+        print(f"vectorized output matches row by row (price, image, stock): {same}")
+
+    csv_files = sorted(f for f in os.listdir(data_dir) if f.startswith('datatable') and f.endswith('.csv'))
+    if csv_files:
+        before = sum(len(merge_data.normalize_frame(pd.read_csv(os.path.join(data_dir, f)),
+                                                    merge_data.new_normalization_state())['products'])
+                     for f in csv_files)
+        after = len(merge_data.normalize_product_data([os.path.join(data_dir, f) for f in csv_files])['products'])
+        print(f"{len(csv_files)} real exports in {data_dir}: {before} products before, {after} after")
+
+def create_slug_regex(name):
+    """The original slugifier: four regular-expression passes per name."""
+    if not name or not isinstance(name, str):
+        return ""
+    slug = name.lower().strip()
+    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
+    slug = re.sub(r'\s+', '-', slug)
+    slug = re.sub(r'-+', '-', slug)
+    return slug.strip('-')
+
+def synthetic_names(rows, distinct, seed=0):
+    """Return rows product names drawn from distinct names, many of which differ only in punctuation."""
+    rng = np.random.default_rng(seed)
+    parts = np.array(['LCD Assembly', 'Battery', 'Back Cover', 'Charging Port', 'Front Camera'])
+    models = np.array(['iPhone 13 Pro', 'Galaxy S21', 'Pixel 7', 'Moto G Power', 'LG Q92 5G / Q920'])
+    # Spellings of one product that slug alike
+    spellings = np.array(['{} Compatible For {}', '{} - Compatible For {}', '{} Compatible For {}!',
+                          '{}  compatible for {} ', '{} Compatible\xa0For {}'])
+    pool = [spellings[i % 5].format(parts[i // 5 % 5], f"{models[i // 25 % 5]} ({i // 125})")
+            for i in range(distinct)]
+    return pd.Series(np.array(pool, dtype=object)[rng.integers(0, distinct, rows)], dtype=object)
+
+def benchmark_slugs(rows, distinct):
+    """
+    Slug rows names with the original regex slugifier, the memoized per-name
+    slugifier and the column-wide one, then make them unique per SKU with a
+    fresh and a reopened SlugRegistry and check no slug is shared by two SKUs
+    and that renamed products keep their slugs.
+    """
+    names = synthetic_names(rows, distinct)
+    # One SKU per row, except that every tenth product is listed twice
+    sku_numbers = np.arange(rows)
+    sku_numbers[1::10] = sku_numbers[0::10][:len(sku_numbers[1::10])]
+    skus = pd.Series('SKU-' + sku_numbers.astype(str), dtype=object)
+    print(f"{rows} names, {names.nunique()} distinct, {skus.nunique()} SKUs")
+    print(f"{'slugifier':>22} {'seconds':>8} {'names/s':>10}")
+
+    start = time.perf_counter()
+    reference = names.map(create_slug_regex)
+    elapsed = time.perf_counter() - start
+    print(f"{'regex, per name':>22} {elapsed:>8.2f} {rows / elapsed:>10.0f}")
+
+    slugs._slugify.cache_clear()
+    start = time.perf_counter()
+    memoized = names.map(slugs.create_slug)
+    elapsed = time.perf_counter() - start
+    print(f"{'memoized, per name':>22} {elapsed:>8.2f} {rows / elapsed:>10.0f}")
+
+    start = time.perf_counter()
+    vectorized = slugs.create_slugs(names)
+    elapsed = time.perf_counter() - start
+    print(f"{'column-wide':>22} {elapsed:>8.2f} {rows / elapsed:>10.0f}")
+    print(f"same slugs as the regex slugifier: {(memoized == reference).all() and (vectorized == reference).all()}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "slugs.sqlite")
+        assigned = []
+        for label in ("registry, first run", "registry, rerun"):
+            registry = slugs.SlugRegistry(path)
+            start = time.perf_counter()
+            assigned.append(registry.assign(vectorized, skus))
+            elapsed = time.perf_counter() - start
+            registry.close()
+            print(f"{label:>22} {elapsed:>8.2f} {rows / elapsed:>10.0f}")
+        # A product's slug is its URL: renaming every product leaves them as they were
+        registry = slugs.SlugRegistry(path)
+        renamed = registry.assign(vectorized + '-v2', skus)
+        registry.close()
+
+    pairs = pd.DataFrame({'slug': assigned[0], 'sku': skus})
+    print(f"SKUs whose name slug was already taken: {skus.nunique() - vectorized.nunique()}")
+    print(f"slugs shared by two SKUs: {(pairs.groupby('slug')['sku'].nunique() > 1).sum()}, "
+          f"SKUs with two slugs: {(pairs.groupby('sku')['slug'].nunique() > 1).sum()}, "
+          f"same slugs on rerun: {assigned[0].equals(assigned[1])}, "
+          f"after renaming every product: {assigned[0].equals(renamed)}")
+
+def timestamp_sku(name):
+    """The DatabaseScraper's former SKU: initial letters of the name plus the current minute."""
+    prefix = ''.join(word[:3].upper() for word in name.split() if word)[:10]
+    return f"SKU-{prefix}-{time.strftime('%m%d%H%M')}"
+
+def benchmark_skus(rows, lookups):
+    """
+    Give rows products SKUs the former ways (name plus timestamp, SKU-<row>)
+    and from the SkuIndex, then count SKUs shared by two products, SKUs
+    changed by a re-crawl or by one product added at the top of the input,
+    and time index lookups of known products.
+    """
+    names = synthetic_names(rows, rows // 5)
+    urls = pd.Series([f"https://www.mobilesentrix.com/product-{i}" for i in range(rows)], dtype=object)
+    print(f"{rows} products, {names.nunique()} distinct names")
+    print(f"{'SKUs':>28} {'seconds':>8} {'shared':>8} {'changed by rerun':>17} {'changed by insert':>18}")
+
+    start = time.perf_counter()
+    stamped = names.map(timestamp_sku)
+    elapsed = time.perf_counter() - start
+    shared = rows - stamped.nunique()
+    # A crawl a minute later stamps every SKU anew
+    print(f"{'name + timestamp':>28} {elapsed:>8.2f} {shared:>8} {rows:>17} {rows:>18}")
+
+    # SKU-<n> numbers rows in input order, so one row added at the top renumbers all the others
+    print(f"{'SKU-<row>':>28} {'':>8} {0:>8} {0:>17} {rows:>18}")
+
+    added_names = pd.concat([pd.Series(["Brand New Part"]), names], ignore_index=True)
+    added_urls = pd.concat([pd.Series(["https://www.mobilesentrix.com/brand-new"]), urls], ignore_index=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "skus.sqlite")
+        first = None
+        for label, batch_names, batch_urls in (("index, first run", names, urls), ("index, rerun", names, urls),
+                                               ("index, 1 product added", added_names, added_urls)):
+            index = skus.SkuIndex(path)
+            start = time.perf_counter()
+            assigned = index.assign(batch_names, batch_urls)
+            elapsed = time.perf_counter() - start
+            index.close()
+            shared = len(assigned) - assigned.nunique()
+            existing = assigned.iloc[-rows:].reset_index(drop=True)
+            first = existing if first is None else first
+            changed = (existing != first).sum()
+            print(f"{label:>28} {elapsed:>8.2f} {shared:>8} {changed if 'rerun' in label else '':>17} "
+                  f"{changed if 'added' in label else '':>18}")
+
+        index = skus.SkuIndex(path)
+        sample = np.random.default_rng(0).integers(0, rows, lookups)
+        start = time.perf_counter()
+        found = [index.assign_one(names[i], urls[i]) for i in sample]
+        elapsed = time.perf_counter() - start
+        index.close()
+        print(f"{lookups} lookups of known products: {elapsed / lookups * 1e6:.1f} us each, "
+              f"all match: {found == first[sample].tolist()}")
+
+def synthetic_listings(rows, seed=0):
+    """
+    Return rows product titles and the product each one lists: rows / 5
+    products, each listed under several conditions, colours and spellings,
+    some with one more device variant and some cut short the way the listing
+    exports cut long titles.
+    """
+    rng = np.random.default_rng(seed)
+    parts = ['LCD Assembly With Frame', 'LCD Assembly Without Frame', 'Battery With Adhesive', 'Back Cover Glass',
+             'Charging Port Flex', 'Front Camera Module', 'Back Camera Module', 'Loudspeaker Ringer Module',
+             'Sim Card Tray', 'Volume Flex Cable']
+    lines = ['Galaxy A', 'Galaxy S', 'Apple iPhone', 'Google Pixel', 'Moto G', 'LG Q', 'LG K', 'LG Stylo',
+             'OnePlus Nord', 'Nokia G']
+    joiners = np.array([' Compatible For ', ' compatible for ', '  Compatible For '])
+    variants = np.array(['', '', '', '', ' / Global'])
+    suffixes = pd.Series(['', ' (Refurbished)', ' (Premium)', ' (Genuine OEM)'])[rng.integers(0, 4, rows)].to_numpy()
+    suffixes = suffixes + np.array(['', ' (Black)', ' (Moroccan Blue)', ' (All Colors)', ' - Black'])[
+        rng.integers(0, 5, rows)].astype(object)
+    products = rng.integers(0, max(rows // 5, 1), rows)
+    titles = pd.Series([
+        f"{parts[p % 10]}{joiner}{lines[p // 10 % 10]} {p // 100} (X{p // 100} / X{p // 100}F / {2016 + p % 9}){variant}"
+        for p, joiner, variant in zip(products.tolist(), joiners[rng.integers(0, 3, rows)].tolist(),
+                                      variants[rng.integers(0, 5, rows)].tolist())
+    ], dtype=object)
+    # One title in ten loses most of its condition and colour to the "..." cut
+    cut = rng.random(rows) < 0.1
+    suffixes[cut] = pd.Series(suffixes[cut], dtype=object).str.slice(0, 5).to_numpy() + '...'
+    return titles + suffixes, pd.Series(products)
+
+def benchmark_dedupe(sizes, all_pairs_rows=20_000):
+    """
+    Cluster synthetic listings with MinHash/LSH blocking and report the time
+    and how well clusters match products (products split over several
+    clusters, clusters holding several products). The smallest size is also
+    compared with an all-pairs Jaccard comparison of every distinct title,
+    whose cost grows with the square of the rows.
+    """
+    print(f"{'rows':>9} {'titles':>9} {'seconds':>8} {'rows/s':>9} {'clusters':>9} {'products':>9} "
+          f"{'split':>7} {'mixed':>7}")
+    for rows in sizes:
+        titles, products = synthetic_listings(rows)
+        start = time.perf_counter()
+        clusters = near_duplicates.near_duplicate_clusters(titles)
+        elapsed = time.perf_counter() - start
+        pairs = pd.DataFrame({'cluster': clusters, 'product': products})
+        split = (pairs.groupby('product')['cluster'].nunique() > 1).sum()
+        mixed = (pairs.groupby('cluster')['product'].nunique() > 1).sum()
+        print(f"{rows:>9} {titles.nunique():>9} {elapsed:>8.2f} {rows / elapsed:>9.0f} {clusters.nunique():>9} "
+              f"{products.nunique():>9} {split:>7} {mixed:>7}")
+
+    titles, _ = synthetic_listings(all_pairs_rows)
+    normalized = near_duplicates.normalize_titles(titles)
+    uniques = normalized.drop_duplicates().reset_index(drop=True)
+    owners, tokens, _ = near_duplicates.title_tokens(uniques)
+    start = time.perf_counter()
+    matrix = np.zeros((len(uniques), tokens.max() + 1), dtype=np.float32)
+    matrix[owners, tokens] = 1
+    intersection = matrix @ matrix.T
+    counts = matrix.sum(axis=1)
+    jaccard = intersection / (counts[:, None] + counts[None, :] - intersection)
+    similar = np.argwhere(np.triu(jaccard >= near_duplicates.SIMILARITY_THRESHOLD, 1))
+    elapsed = time.perf_counter() - start
+    clusters = near_duplicates.near_duplicate_clusters(uniques).to_numpy()
+    found = (clusters[similar[:, 0]] == clusters[similar[:, 1]]).mean() if len(similar) else 1.0
+    print(f"all pairs of {len(uniques)} distinct titles: {elapsed:.2f}s "
+          f"(about {elapsed * (1_000_000 / all_pairs_rows) ** 2 / 3600:.1f}h at 1M rows); "
+          f"{len(similar)} similar pairs, {found:.1%} of them clustered together by LSH")
+
+def benchmark_schema(rows):
+    """
+    Combine three synthetic sources the way combine_database_files does (a
+    raw datatable export, a product export with Title/Price/Category and a
+    sparse SKU/Name list with an empty Notes column) with the former column
+    intersection and with the schema union, and compare the columns kept,
+    the filled-in price and category values and the memory before and after
+    type coercion. Also checks the empty column stays empty.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        per_source = rows // 3
+        paths = [generate_datatable_csv(os.path.join(tmp_dir, "datatable.csv"), per_source),
+                 generate_product_csv(os.path.join(tmp_dir, "products.csv"), per_source)]
+        sparse_path = os.path.join(tmp_dir, "sparse.csv")
+        pd.DataFrame({'SKU': [f"SP-{i}" for i in range(per_source)],
+                      'Product Name': [f"Spare Part {i}" for i in range(per_source)],
+                      'Notes': None}).to_csv(sparse_path, index=False)
+        paths.append(sparse_path)
+
+        start = time.perf_counter()
+        sources = []
+        for path in paths:
+            # Read like an Excel sheet would be, with the empty column as objects
+            df = pd.read_csv(path, dtype={'Notes': object})
+            df['source_file'] = os.path.basename(path)
+            sources.append(df)
+        read = time.perf_counter() - start
+
+    print(f"{per_source * 3} rows from {len(sources)} sources, read in {read:.2f}s")
+    print(f"{'schema':>12} {'seconds':>8} {'columns':>8} {'rows':>8} {'with price':>11} {'with category':>14} "
+          f"{'MB':>8}")
+
+    start = time.perf_counter()
+    normalized = [df.rename(columns=schema_alignment.normalize_column_name) for df in sources]
+    common = [col for col in normalized[0].columns if all(col in df.columns for df in normalized[1:])]
+    intersection = pd.concat([df[common] for df in normalized], ignore_index=True).drop_duplicates()
+    elapsed = time.perf_counter() - start
+    # Without a shared product column, drop_duplicates collapses each source to one row
+    print(f"{'intersection':>12} {elapsed:>8.2f} {len(common):>8} {len(intersection):>8} {0:>11} {0:>14} "
+          f"{schema_alignment.memory_mb(intersection):>8.1f}")
+
+    start = time.perf_counter()
+    standardized = [schema_alignment.standardize_columns(df.drop(columns='source_file')).assign(
+        source_file=df['source_file']) for df in sources]
+    columns = schema_alignment.union_columns(standardized)
+    combined = pd.concat(standardized, ignore_index=True)[columns]
+    mapped = time.perf_counter() - start
+    print(f"{'union':>12} {mapped:>8.2f} {len(columns):>8} {len(combined):>8} "
+          f"{combined['price'].notna().sum():>11} {combined['category'].notna().sum():>14} {schema_alignment.memory_mb(combined):>8.1f}")
+
+    start = time.perf_counter()
+    unified = schema_alignment.coerce_types(combined).drop_duplicates()
+    elapsed = mapped + time.perf_counter() - start
+    print(f"{'union, typed':>12} {elapsed:>8.2f} {len(columns):>8} {len(unified):>8} "
+          f"{unified['price'].notna().sum():>11} {unified['category'].notna().sum():>14} {schema_alignment.memory_mb(unified):>8.1f}")
+    categorical = [col for col in unified.columns if isinstance(unified[col].dtype, pd.CategoricalDtype)]
+    print(f"categorical columns: {', '.join(categorical)}")
+
+    # An empty column must not come out as "nan"/"None" text (pandas 2's astype(str) does that)
+    coverage = schema_alignment.column_coverage(unified)['notes']
+    written = pd.read_csv(io.StringIO(unified[['notes']].to_csv(index=False)), dtype=str, keep_default_na=False)
+    print(f"empty notes column: {coverage.max():.0%} coverage in every source, "
+          f"{(written['notes'] == '').sum()}/{len(written)} cells written empty")
+
+def main():
+    """Parse arguments and run the selected benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the catalog data scripts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = subparsers.add_parser("merge", help="normalize_product_data scaling")
+    merge_parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+
+    incremental_parser = subparsers.add_parser("incremental", help="--incremental after a no-op change keeps slugs")
+    incremental_parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+    stream_parser = subparsers.add_parser("stream", help="peak RSS of in-memory vs streaming normalization")
+    stream_parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 300_000, 1_000_000],
+                               help="input sizes to compare; two or more show how the peaks grow")
+    stream_parser.add_argument("--chunksize", type=int, default=50_000)
+
+    formats_parser = subparsers.add_parser("formats", help="CSV vs Parquet vs Feather size and read-back time")
+    formats_parser.add_argument("--rows", type=int, default=1_000_000)
+
+    datatable_parser = subparsers.add_parser("datatable", help="raw datatable export ingestion speed")
+    datatable_parser.add_argument("--rows", type=int, default=1_000_000)
+    datatable_parser.add_argument("--files", type=int, default=30)
+    datatable_parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+    slugs_parser = subparsers.add_parser("slugs", help="regex vs memoized vs column-wide slugs, registry uniqueness")
+    slugs_parser.add_argument("--rows", type=int, default=1_000_000)
+    slugs_parser.add_argument("--distinct", type=int, default=200_000)
+
+    skus_parser = subparsers.add_parser("skus", help="timestamp vs row-number vs content-hash SKUs, index lookups")
+    skus_parser.add_argument("--rows", type=int, default=1_000_000)
+    skus_parser.add_argument("--lookups", type=int, default=100_000)
+
+    dedupe_parser = subparsers.add_parser("dedupe", help="MinHash/LSH near-duplicate clustering vs all pairs")
+    dedupe_parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+
+    schema_parser = subparsers.add_parser("schema", help="column intersection vs schema union, typed memory")
+    schema_parser.add_argument("--rows", type=int, default=1_000_000)
+
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        benchmark_merge(args.rows)
+    elif args.command == "incremental":
+        benchmark_incremental(args.data_dir)
+    elif args.command == "stream":
+        benchmark_stream(args.rows, args.chunksize)
+    elif args.command == "formats":
+        benchmark_formats(args.rows)
+    elif args.command == "datatable":
+        benchmark_datatable(args.rows, args.files, args.data_dir)
+    elif args.command == "slugs":
+        benchmark_slugs(args.rows, args.distinct)
+    elif args.command == "skus":
+        benchmark_skus(args.rows, args.lookups)
+    elif args.command == "dedupe":
+        benchmark_dedupe(args.rows)
+    elif args.command == "schema":
+        benchmark_schema(args.rows)
+
+if __name__ == "__main__":
+    main()
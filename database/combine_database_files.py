@@ -9,8 +9,16 @@ import sys
 import pandas as pd
 import glob
 import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from merge_data import OUTPUT_FORMATS, write_table
+from near_duplicates import SIMILARITY_THRESHOLD, find_near_duplicates
+from schema_alignment import (column_coverage, coerce_types, memory_mb, normalize_column_name,
+                              standardize_columns, union_columns)
+
 # Define paths
 NEW_DB_DIR = "New Database"
 PRODUCT_DB_DIR = "Product Database"
@@ -24,126 +32,181 @@ def log_message(message):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{timestamp}] {message}")
 
-def process_excel_files(directory):
-    """Process all Excel files in a directory and return a combined DataFrame"""
-    log_message(f"Processing Excel files in {directory}...")
-    
-    # Get all Excel files
-    excel_files = glob.glob(os.path.join(directory, "*.xlsx"))
-    
-    if not excel_files:
-        log_message(f"No Excel files found in {directory}")
-        return None
-    
-    # Initialize an empty list to store DataFrames
-    dfs = []
-    
-    # Process each Excel file
-    for file_path in excel_files:
-        file_name = os.path.basename(file_path)
-        log_message(f"Processing {file_name}...")
-        
-        try:
-            # Read Excel file
+def read_source_file(file_path):
+    """
+    Read one Excel or CSV file, map its columns onto merge_data's names and
+    tag its rows with the source file name.
+
+    Runs inside worker processes when --workers is greater than 1, so it
+    returns errors instead of logging them: (file_name, df, error, seconds).
+    """
+    file_name = os.path.basename(file_path)
+    start = time.perf_counter()
+    try:
+        if file_path.lower().endswith('.xlsx'):
             df = pd.read_excel(file_path)
-            
-            # Add source file information
-            df['source_file'] = file_name
-            
-            # Append to list
-            dfs.append(df)
-            
-            log_message(f"Successfully processed {file_name} with {len(df)} rows")
-        except Exception as e:
-            log_message(f"Error processing {file_name}: {str(e)}")
-    
-    # Combine all DataFrames
-    if dfs:
-        combined_df = pd.concat(dfs, ignore_index=True)
-        log_message(f"Combined {len(dfs)} Excel files with a total of {len(combined_df)} rows")
-        return combined_df
+        else:
+            df = pd.read_csv(file_path)
+        df = standardize_columns(df)
+        
+        # Add source file information
+        df['source_file'] = file_name
+        return file_name, df, None, time.perf_counter() - start
+    except Exception as e:
+        return file_name, None, str(e), time.perf_counter() - start
+
+def read_source_files(file_paths, workers=1):
+    """Yield read_source_file results in file order, using a process pool if workers > 1."""
+    if workers > 1 and len(file_paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(read_source_file, file_paths)
     else:
-        log_message("No valid Excel files to combine")
-        return None
+        for file_path in file_paths:
+            yield read_source_file(file_path)
 
-def process_csv_files(directory):
-    """Process all CSV files in a directory and return a combined DataFrame"""
-    log_message(f"Processing CSV files in {directory}...")
+def process_files(directory, pattern, label, workers=1, timings=None):
+    """Process all files matching pattern in a directory and return a combined DataFrame"""
+    log_message(f"Processing {label} files in {directory}...")
     
-    # Get all CSV files
-    csv_files = glob.glob(os.path.join(directory, "*.csv"))
+    # Get all matching files
+    file_paths = glob.glob(os.path.join(directory, pattern))
     
-    if not csv_files:
-        log_message(f"No CSV files found in {directory}")
+    if not file_paths:
+        log_message(f"No {label} files found in {directory}")
         return None
     
     # Initialize an empty list to store DataFrames
     dfs = []
     
-    # Process each CSV file
-    for file_path in csv_files:
-        file_name = os.path.basename(file_path)
+    # Results come back in file order whether or not a pool is used
+    for file_name, df, error, seconds in read_source_files(file_paths, workers):
         log_message(f"Processing {file_name}...")
+        if timings is not None:
+            timings.append((file_name, seconds, 0 if df is None else len(df)))
         
-        try:
-            # Read CSV file
-            df = pd.read_csv(file_path)
-            
-            # Add source file information
-            df['source_file'] = file_name
-            
-            # Append to list
+        if error is None:
             dfs.append(df)
-            
             log_message(f"Successfully processed {file_name} with {len(df)} rows")
-        except Exception as e:
-            log_message(f"Error processing {file_name}: {str(e)}")
+        else:
+            log_message(f"Error processing {file_name}: {error}")
     
     # Combine all DataFrames
     if dfs:
         combined_df = pd.concat(dfs, ignore_index=True)
-        log_message(f"Combined {len(dfs)} CSV files with a total of {len(combined_df)} rows")
+        log_message(f"Combined {len(dfs)} {label} files with a total of {len(combined_df)} rows")
         return combined_df
     else:
-        log_message("No valid CSV files to combine")
+        log_message(f"No valid {label} files to combine")
         return None
 
+def process_excel_files(directory, workers=1, timings=None):
+    """Process all Excel files in a directory and return a combined DataFrame"""
+    return process_files(directory, "*.xlsx", "Excel", workers, timings)
+
+def process_csv_files(directory, workers=1, timings=None):
+    """Process all CSV files in a directory and return a combined DataFrame"""
+    return process_files(directory, "*.csv", "CSV", workers, timings)
+
+def log_parse_timings(timings):
+    """Log the per-file parse cost, slowest first"""
+    if not timings:
+        return
+    total = sum(seconds for _, seconds, _ in timings)
+    log_message(f"Parse timing for {len(timings)} files ({total:.2f}s of parsing):")
+    for file_name, seconds, rows in sorted(timings, key=lambda timing: timing[1], reverse=True):
+        log_message(f"  {file_name}: {seconds:.2f}s, {rows} rows")
+
 def normalize_column_names(df):
     """Normalize column names (lowercase, replace spaces with underscores)"""
     if df is None:
         return None
     
-    df.columns = [col.lower().replace(' ', '_').replace('-', '_') for col in df.columns]
+    df.columns = [normalize_column_name(col) for col in df.columns]
     return df
 
+def align_schemas(dfs):
+    """
+    Combine the sources into one table with the union of their columns and
+    unified types, logging each source's column coverage and the memory
+    saved by the types. Returns the table, its columns and the coverage.
+    """
+    columns = union_columns(dfs)
+    common_columns = [col for col in columns if all(col in df.columns for df in dfs)]
+    log_message(f"Unified schema has {len(columns)} columns; {len(common_columns)} are in every source")
+    
+    combined_df = pd.concat(dfs, ignore_index=True)[columns]
+    before = memory_mb(combined_df)
+    unified_df = coerce_types(combined_df)
+    after = memory_mb(unified_df)
+    log_message(f"Unified table memory: {before:.2f} MB as read, {after:.2f} MB with unified types "
+                f"({1 - after / before:.0%} less)" if before else "Unified table is empty")
+    
+    coverage = column_coverage(unified_df)
+    log_message("Column coverage by source file (share of rows with a value):")
+    for source_file, shares in coverage.iterrows():
+        filled = shares[shares > 0]
+        log_message(f"  {source_file}: {len(filled)}/{len(shares)} columns; "
+                    + ", ".join(f"{col} {share:.0%}" for col, share in filled.items()))
+    return unified_df, columns, coverage
+
+def mark_near_duplicates(unified_df, threshold):
+    """Cluster near-duplicate titles, log how many rows repeat another and return the rows and cluster sizes"""
+    start = time.perf_counter()
+    unified_df = find_near_duplicates(unified_df, 'name', threshold)
+    sizes = unified_df['duplicate_cluster'].value_counts()
+    repeated = sizes[sizes > 1]
+    log_message(f"Found {len(repeated)} near-duplicate clusters covering {repeated.sum()} rows "
+                f"({len(unified_df) - len(sizes)} rows beyond their canonical record) "
+                f"in {time.perf_counter() - start:.2f}s")
+    return unified_df, sizes
+
 def main():
     """Main function to combine database files"""
+    parser = argparse.ArgumentParser(description="Combine New Database and Product Database files")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes used to parse files (default: 1, serial)")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="csv",
+                        help="output format for the combined files (default: csv)")
+    parser.add_argument("--similarity", type=float, default=SIMILARITY_THRESHOLD,
+                        help="title similarity (0-1) at which rows are near-duplicates; 0 skips the check "
+                             f"(default: {SIMILARITY_THRESHOLD})")
+    parser.add_argument("--drop-near-duplicates", action="store_true",
+                        help="keep only the canonical record of each near-duplicate cluster")
+    args = parser.parse_args()
+    
     log_message("Starting database file combination process...")
+    timings = []
     
     # Process New Database Excel files
-    new_db_df = process_excel_files(NEW_DB_DIR)
+    new_db_df = process_excel_files(NEW_DB_DIR, args.workers, timings)
     new_db_df = normalize_column_names(new_db_df)
     
     # Process Product Database Excel files
-    product_db_excel_df = process_excel_files(PRODUCT_DB_DIR)
+    product_db_excel_df = process_excel_files(PRODUCT_DB_DIR, args.workers, timings)
     product_db_excel_df = normalize_column_names(product_db_excel_df)
     
     # Process Product Database CSV files
-    product_db_csv_df = process_csv_files(PRODUCT_DB_DIR)
+    product_db_csv_df = process_csv_files(PRODUCT_DB_DIR, args.workers, timings)
     product_db_csv_df = normalize_column_names(product_db_csv_df)
     
+    log_parse_timings(timings)
+    extension = OUTPUT_FORMATS[args.format]
+    
     # Save combined files
     if new_db_df is not None:
-        new_db_df.to_csv(os.path.join(OUTPUT_DIR, "new_database_combined.csv"), index=False)
-        log_message(f"Saved combined New Database to {os.path.join(OUTPUT_DIR, 'new_database_combined.csv')}")
+        output_path = os.path.join(OUTPUT_DIR, f"new_database_combined{extension}")
+        write_table(new_db_df, output_path, args.format)
+        log_message(f"Saved combined New Database to {output_path}")
     
     if product_db_excel_df is not None:
-        product_db_excel_df.to_csv(os.path.join(OUTPUT_DIR, "product_database_excel_combined.csv"), index=False)
-        log_message(f"Saved combined Product Database Excel to {os.path.join(OUTPUT_DIR, 'product_database_excel_combined.csv')}")
+        output_path = os.path.join(OUTPUT_DIR, f"product_database_excel_combined{extension}")
+        write_table(product_db_excel_df, output_path, args.format)
+        log_message(f"Saved combined Product Database Excel to {output_path}")
     
     if product_db_csv_df is not None:
-        product_db_csv_df.to_csv(os.path.join(OUTPUT_DIR, "product_database_csv_combined.csv"), index=False)
-        log_message(f"Saved combined Product Database CSV to {os.path.join(OUTPUT_DIR, 'product_database_csv_combined.csv')}")
+        output_path = os.path.join(OUTPUT_DIR, f"product_database_csv_combined{extension}")
+        write_table(product_db_csv_df, output_path, args.format)
+        log_message(f"Saved combined Product Database CSV to {output_path}")
     
     # Create a unified dataset
     dfs_to_combine = []
@@ -155,31 +218,43 @@ def main():
         dfs_to_combine.append(product_db_csv_df)
     
     if dfs_to_combine:
-        # Find common columns
-        common_columns = set(dfs_to_combine[0].columns)
-        for df in dfs_to_combine[1:]:
-            common_columns = common_columns.intersection(set(df.columns))
-        
-        # Filter DataFrames to only include common columns
-        filtered_dfs = []
-        for df in dfs_to_combine:
-            filtered_dfs.append(df[list(common_columns)])
-        
-        # Combine filtered DataFrames
-        unified_df = pd.concat(filtered_dfs, ignore_index=True)
+        # Keep every source's columns, in first-source order so the output is reproducible
+        unified_df, columns, coverage = align_schemas(dfs_to_combine)
         
         # Remove duplicates
         unified_df = unified_df.drop_duplicates()
         
+        # Flag rows that list the same part under a slightly different title
+        near_duplicates = None
+        if args.similarity > 0 and 'name' in unified_df.columns:
+            unified_df, sizes = mark_near_duplicates(unified_df, args.similarity)
+            clustered = unified_df[unified_df['duplicate_cluster'].isin(sizes.index[sizes > 1])]
+            output_path = os.path.join(OUTPUT_DIR, f"near_duplicate_clusters{extension}")
+            write_table(clustered.sort_values(['duplicate_cluster', 'is_canonical'], ascending=[True, False]),
+                        output_path, args.format)
+            log_message(f"Saved near-duplicate clusters to {output_path}")
+            near_duplicates = {
+                "similarity": args.similarity,
+                "clusters": int((sizes > 1).sum()),
+                "duplicate_records": int(len(unified_df) - len(sizes)),
+                "dropped": args.drop_near_duplicates
+            }
+            if args.drop_near_duplicates:
+                unified_df = unified_df[unified_df['is_canonical']]
+        
         # Save unified dataset
-        unified_df.to_csv(os.path.join(OUTPUT_DIR, "unified_database.csv"), index=False)
-        log_message(f"Saved unified database to {os.path.join(OUTPUT_DIR, 'unified_database.csv')} with {len(unified_df)} rows")
+        output_path = os.path.join(OUTPUT_DIR, f"unified_database{extension}")
+        write_table(unified_df, output_path, args.format)
+        log_message(f"Saved unified database to {output_path} with {len(unified_df)} rows")
         
         # Create metadata file
         metadata = {
             "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "total_records": len(unified_df),
-            "common_columns": list(common_columns),
+            "format": args.format,
+            "columns": columns,
+            "column_coverage": coverage.round(3).to_dict(orient="index"),
+            "near_duplicates": near_duplicates,
             "source_files": {
                 "new_database": len(glob.glob(os.path.join(NEW_DB_DIR, "*.xlsx"))) if new_db_df is not None else 0,
                 "product_database_excel": len(glob.glob(os.path.join(PRODUCT_DB_DIR, "*.xlsx"))) if product_db_excel_df is not None else 0,
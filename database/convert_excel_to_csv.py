@@ -3,18 +3,28 @@
 Script to convert Excel files to CSV format for database import.
 This script processes Excel files from the New Database and Product Database folders,
 converts them to CSV, and saves them in the database/data directory.
+Workbooks whose content hash matches the previous run are skipped.
 """
 
 import os
 import sys
+import csv
 import pandas as pd
 import glob
 import re
+import json
+import argparse
+
+from merge_data import file_fingerprint
 
 # Define paths
 NEW_DB_PATH = "New Database"
 PRODUCT_DB_PATH = "Product Database"
 OUTPUT_PATH = "database/data"
+CACHE_FILE = ".excel_conversion_cache.json"
+
+# Workbooks larger than this are converted with the streaming reader
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
 
 def sanitize_filename(filename):
     """Convert filename to a database-friendly format."""
@@ -24,29 +34,88 @@ def sanitize_filename(filename):
     sanitized = re.sub(r'[^a-zA-Z0-9]', '_', base.lower())
     return sanitized
 
-def convert_excel_to_csv(excel_path, output_dir):
-    """Convert an Excel file to CSV format."""
+def sheet_output_path(excel_path, output_dir, sheet_name=None):
+    """Return the CSV path for a workbook, or for one of its sheets."""
+    sanitized_name = sanitize_filename(os.path.basename(excel_path))
+    if sheet_name is not None:
+        sanitized_name = f"{sanitized_name}_{sanitize_filename(sheet_name)}"
+    return os.path.join(output_dir, f"{sanitized_name}.csv")
+
+def stream_sheets_to_csv(excel_path, output_dir, all_sheets=False):
+    """
+    Convert sheets row by row with openpyxl's read-only reader.
+
+    No DataFrame is built, so memory stays flat for very large sheets.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        worksheets = workbook.worksheets if all_sheets else workbook.worksheets[:1]
+        output_paths = []
+        for worksheet in worksheets:
+            output_path = sheet_output_path(excel_path, output_dir, worksheet.title if all_sheets else None)
+            with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                for row in worksheet.iter_rows(values_only=True):
+                    writer.writerow(['' if value is None else value for value in row])
+            output_paths.append(output_path)
+        return output_paths
+    finally:
+        workbook.close()
+
+def convert_excel_to_csv(excel_path, output_dir, streaming=False, all_sheets=False):
+    """Convert an Excel file to CSV format. Returns the written CSV paths, or None on error."""
     try:
-        # Read the Excel file
-        df = pd.read_excel(excel_path)
-        
-        # Create sanitized output filename
         filename = os.path.basename(excel_path)
-        sanitized_name = sanitize_filename(filename)
-        output_path = os.path.join(output_dir, f"{sanitized_name}.csv")
         
-        # Save as CSV
-        df.to_csv(output_path, index=False)
-        print(f"Converted {filename} to {output_path}")
-        return output_path
+        if streaming:
+            output_paths = stream_sheets_to_csv(excel_path, output_dir, all_sheets)
+        else:
+            # Read the first sheet, or every sheet, of the Excel file
+            sheets = pd.read_excel(excel_path, sheet_name=None if all_sheets else 0)
+            if not all_sheets:
+                sheets = {None: sheets}
+            
+            # Save as CSV
+            output_paths = []
+            for sheet_name, df in sheets.items():
+                output_path = sheet_output_path(excel_path, output_dir, sheet_name)
+                df.to_csv(output_path, index=False)
+                output_paths.append(output_path)
+        
+        for output_path in output_paths:
+            print(f"Converted {filename} to {output_path}")
+        return output_paths
     except Exception as e:
         print(f"Error converting {excel_path}: {str(e)}")
         return None
 
-def process_directory(directory_path, output_dir):
-    """Process all Excel files in a directory."""
+def load_cache(output_dir):
+    """Load the conversion cache (workbook path -> fingerprint and outputs)."""
+    cache_path = os.path.join(output_dir, CACHE_FILE)
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path) as f:
+        return json.load(f)
+
+def save_cache(cache, output_dir):
+    """Save the conversion cache."""
+    with open(os.path.join(output_dir, CACHE_FILE), 'w') as f:
+        json.dump(cache, f, indent=2)
+
+def process_directory(directory_path, output_dir, cache=None, stats=None, streaming=None, all_sheets=False):
+    """
+    Process all Excel files in a directory.
+
+    A workbook is skipped when cache holds the same SHA-256 and sheet
+    selection and its CSV files still exist. streaming=None picks the
+    streaming reader for workbooks above STREAMING_THRESHOLD_BYTES.
+    """
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
+    if stats is None:
+        stats = new_stats()
     
     # Find all Excel files
     excel_files = glob.glob(os.path.join(directory_path, "*.xlsx"))
@@ -54,27 +123,67 @@ def process_directory(directory_path, output_dir):
     # Convert each file
     converted_files = []
     for excel_file in excel_files:
-        output_path = convert_excel_to_csv(excel_file, output_dir)
-        if output_path:
-            converted_files.append(output_path)
+        previous = cache.get(excel_file) if cache is not None else None
+        fingerprint = file_fingerprint(excel_file, previous)
+        
+        if (previous and previous['sha256'] == fingerprint['sha256']
+                and previous.get('all_sheets') == all_sheets
+                and all(os.path.exists(path) for path in previous['outputs'])):
+            print(f"Unchanged {os.path.basename(excel_file)}, skipping")
+            stats['hits'] += 1
+            stats['bytes_skipped'] += fingerprint['size']
+            converted_files.extend(previous['outputs'])
+            continue
+        
+        stats['misses'] += 1
+        stats['bytes_processed'] += fingerprint['size']
+        use_streaming = streaming if streaming is not None else fingerprint['size'] > STREAMING_THRESHOLD_BYTES
+        output_paths = convert_excel_to_csv(excel_file, output_dir, use_streaming, all_sheets)
+        if output_paths:
+            converted_files.extend(output_paths)
+            if cache is not None:
+                cache[excel_file] = {**fingerprint, 'all_sheets': all_sheets, 'outputs': output_paths}
     
     return converted_files
 
+def new_stats():
+    """Return empty cache statistics for one run."""
+    return {'hits': 0, 'misses': 0, 'bytes_processed': 0, 'bytes_skipped': 0}
+
 def main():
     """Main function to process Excel files."""
+    parser = argparse.ArgumentParser(description="Convert Excel files to CSV format")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="convert every workbook even if it is unchanged")
+    parser.add_argument("--streaming", action="store_true",
+                        help="always use the streaming row-by-row reader")
+    parser.add_argument("--all-sheets", action="store_true",
+                        help="write every sheet to its own CSV instead of only the first")
+    args = parser.parse_args()
+    
     print("Converting Excel files to CSV format...")
+    os.makedirs(OUTPUT_PATH, exist_ok=True)
+    cache = None if args.no_cache else load_cache(OUTPUT_PATH)
+    stats = new_stats()
+    streaming = True if args.streaming else None
     
     # Process New Database folder
     print("\nProcessing New Database folder:")
-    new_db_files = process_directory(NEW_DB_PATH, OUTPUT_PATH)
+    new_db_files = process_directory(NEW_DB_PATH, OUTPUT_PATH, cache, stats, streaming, args.all_sheets)
     
     # Process Product Database folder
     print("\nProcessing Product Database folder:")
-    product_db_files = process_directory(PRODUCT_DB_PATH, OUTPUT_PATH)
+    product_db_files = process_directory(PRODUCT_DB_PATH, OUTPUT_PATH, cache, stats, streaming, args.all_sheets)
+    
+    if cache is not None:
+        save_cache(cache, OUTPUT_PATH)
     
     # Summary
     total_files = len(new_db_files) + len(product_db_files)
-    print(f"\nConversion complete. Converted {total_files} files to CSV format.")
+    print(f"\nConversion complete. {total_files} CSV files are up to date.")
+    print(f"Cache hits: {stats['hits']}, misses: {stats['misses']}")
+    print(f"Processed {stats['bytes_processed'] / (1024 * 1024):.1f} MB, "
+          f"skipped {stats['bytes_skipped'] / (1024 * 1024):.1f} MB")
     print(f"CSV files are stored in: {OUTPUT_PATH}")
 
 if __name__ == "__main__":
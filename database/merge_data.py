@@ -3,18 +3,31 @@
 Script to merge and normalize CSV data for database import.
 This script processes CSV files in the database/data directory,
 merges related data, and creates normalized CSV files for each database table.
+Each file's layout is detected from its header (see source_formats), so the
+raw datatable*.csv listing exports are read as well as named-column files.
+Products without a SKU get a stable one derived from their URL or name (see
+skus), and slugs are made unique per SKU; both registries are kept next to the output.
 """
 
 import os
 import sys
+import numpy as np
 import pandas as pd
 import glob
-import re
 import json
+import hashlib
+import argparse
+
+from skus import SkuIndex
+from slugs import SlugRegistry, create_slug, create_slugs
+from source_formats import iter_source, read_source
 
 # Define paths
 DATA_DIR = "database/data"
 OUTPUT_DIR = "database/data/normalized"
+MANIFEST_FILE = "manifest.json"
+SLUG_REGISTRY_FILE = "slugs.sqlite"
+SKU_INDEX_FILE = "skus.sqlite"
 
 # Define table schemas
 TABLES = {
@@ -36,193 +49,630 @@ TABLES = {
     ]
 }
 
-def create_slug(name):
-    """Create a URL-friendly slug from a name."""
-    if not name or not isinstance(name, str):
-        return ""
-    # Convert to lowercase and replace spaces with hyphens
-    slug = name.lower().strip()
-    # Remove special characters
-    slug = re.sub(r'[^a-z0-9\s-]', '', slug)
-    # Replace spaces with hyphens
-    slug = re.sub(r'\s+', '-', slug)
-    # Remove multiple hyphens
-    slug = re.sub(r'-+', '-', slug)
-    # Remove leading/trailing hyphens
-    slug = slug.strip('-')
-    return slug
+# Map common source column names onto the products schema
+COLUMN_MAPPING = {
+    'title': 'name',
+    'product name': 'name',
+    'product_name': 'name',
+    'product': 'name',
+    'cost': 'price',
+    'product price': 'price',
+    'product_price': 'price',
+    'image': 'image_url',
+    'img': 'image_url',
+    'image url': 'image_url',
+    'image_url': 'image_url',
+    'desc': 'description',
+    'product description': 'description',
+    'product_description': 'description',
+    'category name': 'category',
+    'category_name': 'category',
+    'stock': 'stock_quantity',
+    'quantity': 'stock_quantity',
+    'inventory': 'stock_quantity'
+}
+
+# Map product_specifications columns to their source column names
+SPEC_COLUMNS = {
+    'display': 'display',
+    'processor': 'processor',
+    'memory': 'memory',
+    'storage': 'storage',
+    'camera': 'camera',
+    'battery': 'battery',
+    'connectivity': 'connectivity',
+    'operating_system': 'os',
+    'additional_features': 'features'
+}
+
+# Arrow types for typed (Parquet/Feather) output; other columns are strings
+COLUMN_TYPES = {
+    "id": "int64",
+    "product_id": "int64",
+    "category_id": "int64",
+    "parent_id": "int64",
+    "price": "double",
+    "discount_percentage": "double",
+    "weight": "double",
+    "price_adjustment": "double",
+    "stock_quantity": "int64",
+    "is_featured": "bool",
+    "is_new": "bool"
+}
+
+# pandas types for reading CSV tables back: text columns stay text (a name
+# such as 89.99 would otherwise come back as a number), other columns are inferred
+CSV_TYPES = {
+    'category_id': 'Int64',
+    'parent_id': 'Int64',
+    **{column: str for columns in TABLES.values() for column in columns if column not in COLUMN_TYPES}
+}
+
+# Output formats and their file extensions
+OUTPUT_FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".feather"
+}
+
+# Rows per Parquet row group; each row group carries min/max/null statistics
+ROW_GROUP_SIZE = 100_000
+
+def new_normalization_state(skus=None):
+    """
+    Return the state shared across files: known categories, last issued IDs
+    and the SkuIndex generated SKUs come from (in memory unless given).
+    """
+    return {
+        'skus': skus if skus is not None else SkuIndex(None),
+        'categories': {},
+        'last_ids': {
+            'products': 0,
+            'product_specifications': 0,
+            'product_variants': 0
+        }
+    }
+
+def prepare_columns(df):
+    """Lowercase column names and rename them using COLUMN_MAPPING."""
+    df = df.copy()
+    df.columns = [str(col).lower().strip() for col in df.columns]
+    for old_col, new_col in COLUMN_MAPPING.items():
+        if old_col in df.columns:
+            df = df.rename(columns={old_col: new_col})
+    # A renamed column can clash with an existing one; keep the first
+    return df.loc[:, ~df.columns.duplicated()]
+
+def _column(df, name, default):
+    """Return a column, or a Series filled with default if it is missing."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+def _numeric(df, name, default):
+    """Return a column as floats, with missing or unparseable values set to default."""
+    if name not in df.columns:
+        return pd.Series(default, index=df.index, dtype=float)
+    return pd.to_numeric(df[name], errors='coerce').fillna(default)
+
+def _is_set(values):
+    """Vectorized `not pd.isna(value) and value`."""
+    return values.notna() & values.astype(bool)
+
+def _as_text(values):
+    """
+    Convert values to strings, leaving missing values missing. Slugs are made
+    from names as written, so a name read as a number (89.99) slugs the same
+    when the source is parsed as when the saved table is read back.
+    """
+    return values.astype(str).where(values.notna())
+
+def _empty_table(table_name):
+    return pd.DataFrame(columns=TABLES[table_name])
+
+def normalize_frame(df, state):
+    """
+    Normalize one source DataFrame into products, specifications and variants.
+
+    Every column is processed as a whole. Categories and ID counters are read
+    from and written back to state, so calling this once per file (or per
+    chunk) numbers rows exactly as a single pass over all input would.
+    """
+    df = prepare_columns(df)
+    if 'name' not in df.columns:
+        return {table: _empty_table(table) for table in ('products', 'product_specifications', 'product_variants')}
+
+    # Skip rows without a name
+    df = df[df['name'].notna()].reset_index(drop=True)
+    last_ids = dict(state['last_ids'])
+    categories = dict(state['categories'])
+
+    product_ids = np.arange(last_ids['products'] + 1, last_ids['products'] + len(df) + 1)
+    skus = _column(df, 'sku', None).astype(object)
+    missing_sku = ~_is_set(skus)
+    if missing_sku.any():
+        # Products are keyed by URL where the source has one, else by their name's slug;
+        # a repeated key (the same name again) gets its own SKU
+        product_url = _column(df, 'product_url', None).astype(object)
+        keys = product_url.where(_is_set(product_url), create_slugs(df['name']))
+        skus[missing_sku] = state['skus'].assign(df['name'][missing_sku], keys[missing_sku],
+                                                 distinct=True).to_numpy()
+
+    # Register new categories in order of first appearance
+    category = _column(df, 'category', 'Uncategorized')
+    has_category = _is_set(category)
+    for category_name in pd.unique(category[has_category]):
+        if category_name not in categories:
+            categories[category_name] = {
+                'id': len(categories) + 1,
+                'name': category_name,
+                'slug': create_slug(category_name),
+                'description': '',
+                'image_url': '',
+                'parent_id': None
+            }
+    category_ids = {name: record['id'] for name, record in categories.items()}
+    category_id = category.where(has_category).map(category_ids).astype('Int64')
+
+    products_df = pd.DataFrame({
+        'id': product_ids,
+        'name': df['name'],
+        'slug': create_slugs(df['name']),
+        'sku': skus,
+        'description': _column(df, 'description', ''),
+        'price': _numeric(df, 'price', 0),
+        'discount_percentage': _numeric(df, 'discount', 0),
+        'stock_quantity': _numeric(df, 'stock_quantity', 10).astype(int),
+        'is_featured': _column(df, 'featured', False).astype(bool),
+        'is_new': _column(df, 'new', False).astype(bool),
+        'image_url': _column(df, 'image_url', ''),
+        'weight': _numeric(df, 'weight', 0),
+        'dimensions': _column(df, 'dimensions', ''),
+        'category_id': category_id,
+        'brand': _column(df, 'brand', '')
+    }, columns=TABLES['products'])
+
+    # Only add specifications if at least one field has data
+    spec_values = {field: _column(df, source, '') for field, source in SPEC_COLUMNS.items()}
+    has_specs = np.logical_or.reduce([_is_set(values).to_numpy() for values in spec_values.values()])
+    specs_df = pd.DataFrame({'product_id': product_ids, **spec_values})[has_specs]
+    specs_df.insert(0, 'id', np.arange(last_ids['product_specifications'] + 1,
+                                       last_ids['product_specifications'] + len(specs_df) + 1))
+
+    # Extract variants, ordered by product and then by source column
+    variant_frames = []
+    variant_columns = [col for col in df.columns if 'variant' in col]
+    for position, variant_col in enumerate(variant_columns):
+        values = df[variant_col]
+        has_value = _is_set(values)
+        variant_type = variant_col.replace('variant_', '').replace('variant', '')
+        variant_value = values[has_value].astype(str)
+        variant_frames.append(pd.DataFrame({
+            'row': np.flatnonzero(has_value.to_numpy()),
+            'position': position,
+            'product_id': product_ids[has_value.to_numpy()],
+            'variant_type': variant_type,
+            'variant_value': variant_value,
+            'price_adjustment': _numeric(df, f'{variant_col}_price', 0)[has_value],
+            'stock_quantity': _numeric(df, f'{variant_col}_stock', 10)[has_value].astype(int),
+            # Every product has a SKU by now (generated above where the source has none)
+            'sku': skus[has_value].astype(str) + f'-{variant_type}-' + variant_value
+        }))
+    if variant_frames:
+        variants_df = (
+            pd.concat(variant_frames, ignore_index=True)
+            .sort_values(['row', 'position'], kind='stable')
+            .drop(columns=['row', 'position'])
+            .reset_index(drop=True)
+        )
+        variants_df.insert(0, 'id', np.arange(last_ids['product_variants'] + 1,
+                                              last_ids['product_variants'] + len(variants_df) + 1))
+    else:
+        variants_df = _empty_table('product_variants')
+
+    last_ids['products'] += len(products_df)
+    last_ids['product_specifications'] += len(specs_df)
+    last_ids['product_variants'] += len(variants_df)
+    state['last_ids'] = last_ids
+    state['categories'] = categories
+
+    return {
+        'products': products_df,
+        'product_specifications': specs_df.reset_index(drop=True),
+        'product_variants': variants_df
+    }
+
+def categories_frame(state):
+    """Build the categories table from normalization state."""
+    if not state['categories']:
+        return _empty_table('categories')
+    return pd.DataFrame(list(state['categories'].values()), columns=TABLES['categories'])
+
+def concat_tables(frames, table_name):
+    """Concatenate per-file frames for one table in a single pass."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return _empty_table(table_name)
+    return pd.concat(frames, ignore_index=True)
+
+def normalize_files(csv_files, state):
+    """
+    Normalize each CSV file in turn, continuing IDs and categories from state.
+
+    Returns the per-table frames and, for each file that was read, the list
+    of product IDs it produced.
+    """
+    collected = {'products': [], 'product_specifications': [], 'product_variants': []}
+    file_product_ids = {}
 
-def normalize_product_data(csv_files):
-    """Process and normalize product data from CSV files."""
-    # Create empty DataFrames for each table
-    products_df = pd.DataFrame(columns=TABLES["products"])
-    specs_df = pd.DataFrame(columns=TABLES["product_specifications"])
-    categories_df = pd.DataFrame(columns=TABLES["categories"])
-    variants_df = pd.DataFrame(columns=TABLES["product_variants"])
-    
-    # Track unique categories and products
-    categories = {}
-    products = {}
-    
     # Process each CSV file
     for csv_file in csv_files:
         try:
-            # Read CSV file
-            df = pd.read_csv(csv_file)
-            
+            # Read CSV file through the column mapper for its layout
+            df = read_source(csv_file)
+
             # Skip empty files
             if df.empty:
+                file_product_ids[csv_file] = []
                 continue
-                
-            # Normalize column names
-            df.columns = [col.lower().strip() for col in df.columns]
-            
-            # Map common column names
-            column_mapping = {
-                'title': 'name',
-                'product name': 'name',
-                'product_name': 'name',
-                'product': 'name',
-                'cost': 'price',
-                'product price': 'price',
-                'product_price': 'price',
-                'image': 'image_url',
-                'img': 'image_url',
-                'image url': 'image_url',
-                'image_url': 'image_url',
-                'desc': 'description',
-                'product description': 'description',
-                'product_description': 'description',
-                'category name': 'category',
-                'category_name': 'category',
-                'stock': 'stock_quantity',
-                'quantity': 'stock_quantity',
-                'inventory': 'stock_quantity'
-            }
-            
-            # Rename columns based on mapping
-            for old_col, new_col in column_mapping.items():
-                if old_col in df.columns:
-                    df.rename(columns={old_col: new_col}, inplace=True)
-            
-            # Extract product data
-            for _, row in df.iterrows():
-                # Skip rows without a name
-                if 'name' not in row or pd.isna(row['name']):
-                    continue
-                
-                # Create product data
-                product_data = {
-                    'name': row.get('name', ''),
-                    'slug': create_slug(row.get('name', '')),
-                    'sku': row.get('sku', f"SKU-{len(products) + 1}"),
-                    'description': row.get('description', ''),
-                    'price': float(row.get('price', 0)) if not pd.isna(row.get('price', 0)) else 0,
-                    'discount_percentage': float(row.get('discount', 0)) if not pd.isna(row.get('discount', 0)) else 0,
-                    'stock_quantity': int(row.get('stock_quantity', 10)) if not pd.isna(row.get('stock_quantity', 10)) else 10,
-                    'is_featured': bool(row.get('featured', False)),
-                    'is_new': bool(row.get('new', False)),
-                    'image_url': row.get('image_url', ''),
-                    'weight': float(row.get('weight', 0)) if not pd.isna(row.get('weight', 0)) else 0,
-                    'dimensions': row.get('dimensions', ''),
-                    'brand': row.get('brand', '')
-                }
-                
-                # Extract category
-                category_name = row.get('category', 'Uncategorized')
-                if not pd.isna(category_name) and category_name:
-                    if category_name not in categories:
-                        category_id = len(categories) + 1
-                        categories[category_name] = {
-                            'id': category_id,
-                            'name': category_name,
-                            'slug': create_slug(category_name),
-                            'description': '',
-                            'image_url': '',
-                            'parent_id': None
-                        }
-                    product_data['category_id'] = categories[category_name]['id']
-                
-                # Generate product ID
-                product_id = len(products) + 1
-                product_data['id'] = product_id
-                products[product_id] = product_data
-                
-                # Extract specifications
-                spec_fields = {
-                    'display': row.get('display', ''),
-                    'processor': row.get('processor', ''),
-                    'memory': row.get('memory', ''),
-                    'storage': row.get('storage', ''),
-                    'camera': row.get('camera', ''),
-                    'battery': row.get('battery', ''),
-                    'connectivity': row.get('connectivity', ''),
-                    'operating_system': row.get('os', ''),
-                    'additional_features': row.get('features', '')
-                }
-                
-                # Only add specifications if at least one field has data
-                if any(not pd.isna(v) and v for v in spec_fields.values()):
-                    spec_data = {
-                        'id': len(specs_df) + 1,
-                        'product_id': product_id,
-                        **spec_fields
-                    }
-                    specs_df = pd.concat([specs_df, pd.DataFrame([spec_data])], ignore_index=True)
-                
-                # Extract variants
-                variant_columns = [col for col in df.columns if 'variant' in col.lower()]
-                if variant_columns:
-                    for variant_col in variant_columns:
-                        variant_value = row.get(variant_col)
-                        if not pd.isna(variant_value) and variant_value:
-                            variant_type = variant_col.replace('variant_', '').replace('variant', '')
-                            variant_data = {
-                                'id': len(variants_df) + 1,
-                                'product_id': product_id,
-                                'variant_type': variant_type,
-                                'variant_value': str(variant_value),
-                                'price_adjustment': float(row.get(f'{variant_col}_price', 0)) if not pd.isna(row.get(f'{variant_col}_price', 0)) else 0,
-                                'stock_quantity': int(row.get(f'{variant_col}_stock', 10)) if not pd.isna(row.get(f'{variant_col}_stock', 10)) else 10,
-                                'sku': f"{product_data['sku']}-{variant_type}-{variant_value}"
-                            }
-                            variants_df = pd.concat([variants_df, pd.DataFrame([variant_data])], ignore_index=True)
-        
+
+            tables = normalize_frame(df, state)
+            for table_name, frame in tables.items():
+                collected[table_name].append(frame)
+            file_product_ids[csv_file] = tables['products']['id'].tolist()
+
         except Exception as e:
             print(f"Error processing {csv_file}: {str(e)}")
-    
-    # Convert products dictionary to DataFrame
-    products_df = pd.DataFrame(list(products.values()))
-    
-    # Convert categories dictionary to DataFrame
-    categories_df = pd.DataFrame(list(categories.values()))
-    
+
     return {
-        'products': products_df,
-        'product_specifications': specs_df,
-        'categories': categories_df,
-        'product_variants': variants_df
+        table_name: concat_tables(frames, table_name)
+        for table_name, frames in collected.items()
+    }, file_product_ids
+
+def assign_slugs(tables, registry):
+    """
+    Replace the name-derived slugs of the products and categories in tables
+    with their unique slugs from registry (a slugs.SlugRegistry). Products
+    are keyed by SKU (by ID where the SKU is missing), categories by name.
+    """
+    tables = dict(tables)
+    if 'products' in tables and not tables['products'].empty:
+        products = tables['products']
+        keys = products['sku'].astype(object).fillna('id-' + products['id'].astype(str))
+        slugs = registry.assign(create_slugs(_as_text(products['name'])), keys)
+        tables['products'] = products.assign(slug=slugs.to_numpy())
+    if 'categories' in tables and not tables['categories'].empty:
+        categories = tables['categories']
+        slugs = registry.assign(categories['slug'], categories['name'], namespace='categories')
+        tables['categories'] = categories.assign(slug=slugs.to_numpy())
+    return tables
+
+def normalize_product_data(csv_files):
+    """Process and normalize product data from CSV files."""
+    state = new_normalization_state()
+    tables, _ = normalize_files(csv_files, state)
+
+    return assign_slugs({
+        'products': tables['products'],
+        'product_specifications': tables['product_specifications'],
+        'categories': categories_frame(state),
+        'product_variants': tables['product_variants']
+    }, SlugRegistry(None))
+
+def file_fingerprint(path, previous=None):
+    """
+    Return size, mtime and SHA-256 for a file.
+
+    The hash is reused from previous when size and mtime are unchanged, so
+    unchanged files are not read at all.
+    """
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime:
+        fingerprint['sha256'] = previous['sha256']
+        return fingerprint
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+def load_manifest(output_dir):
+    """Load the incremental manifest, or return None if there is none."""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def save_manifest(output_dir, files, state, output_format="csv"):
+    """Save file fingerprints, per-file product IDs and normalization state."""
+    manifest = {
+        'format': output_format,
+        'files': files,
+        'last_ids': state['last_ids'],
+        'categories': list(state['categories'].values())
+    }
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    print(f"Saved manifest to {manifest_path}")
+
+def state_from_manifest(manifest, skus=None):
+    """Rebuild normalization state from a saved manifest."""
+    state = new_normalization_state(skus)
+    state['last_ids'].update(manifest['last_ids'])
+    state['categories'] = {category['name']: category for category in manifest['categories']}
+    return state
+
+def load_normalized_data(output_dir, output_format="csv"):
+    """Load previously saved normalized tables (empty frames for missing ones)."""
+    tables = {}
+    for table_name, columns in TABLES.items():
+        path = table_path(output_dir, table_name, output_format)
+        if os.path.exists(path):
+            tables[table_name] = read_table(path, output_format)
+        else:
+            tables[table_name] = pd.DataFrame(columns=columns)
+    return tables
+
+def _slug_keys(products_df):
+    """
+    Key products by the slug of their name plus occurrence, so repeated names
+    stay distinct; saved slugs may carry a disambiguator, so they are not used.
+    """
+    slugs = create_slugs(_as_text(products_df['name']))
+    occurrence = slugs.groupby(slugs, sort=False).cumcount().astype(str)
+    return slugs + '#' + occurrence
+
+def merge_incremental(existing, changed, file_product_ids, replaced_files, base_id):
+    """
+    Replace the rows of re-processed and removed files in the existing tables.
+
+    Products that still exist in a changed file keep their previous IDs
+    (matched by slug within that file); new products are numbered from
+    base_id + 1. Specifications and variants follow their product.
+    """
+    products = existing['products']
+    old_ids = {product_id for entry in replaced_files.values() for product_id in entry['product_ids']}
+    old_products = products[products['id'].isin(old_ids)]
+
+    # Temporary IDs from normalize_files are all above base_id
+    new_products = changed['products']
+    id_map = pd.Series(new_products['id'].to_numpy(), index=new_products['id'].to_numpy())
+    for csv_file, product_ids in file_product_ids.items():
+        previous_ids = replaced_files.get(os.path.basename(csv_file), {}).get('product_ids', [])
+        if not product_ids or not previous_ids:
+            continue
+        previous = old_products[old_products['id'].isin(previous_ids)]
+        current = new_products[new_products['id'].isin(product_ids)]
+        reused = pd.Series(previous['id'].to_numpy(), index=_slug_keys(previous).to_numpy())
+        matched = _slug_keys(current).map(reused)
+        id_map[current['id'][matched.notna()].to_numpy()] = matched.dropna().astype(int).to_numpy()
+
+    # Renumber genuinely new products compactly after base_id
+    is_new = (id_map > base_id).to_numpy()
+    id_map[is_new] = np.arange(base_id + 1, base_id + is_new.sum() + 1)
+    for csv_file, product_ids in file_product_ids.items():
+        file_product_ids[csv_file] = id_map[product_ids].tolist()
+
+    merged = {}
+    kept_products = products[~products['id'].isin(old_ids)]
+    new_products = new_products.assign(id=new_products['id'].map(id_map))
+    merged['products'] = (
+        concat_tables([kept_products, new_products], 'products')
+        .sort_values('id', kind='stable')
+        .reset_index(drop=True)
+    )
+    for table_name in ('product_specifications', 'product_variants'):
+        table = existing[table_name]
+        kept = table[~table['product_id'].isin(old_ids)]
+        added = changed[table_name]
+        added = added.assign(product_id=added['product_id'].map(id_map))
+        merged[table_name] = concat_tables([kept, added], table_name)
+    return merged
+
+def normalize_full(csv_files, skus=None):
+    """Normalize every CSV file and return the tables, manifest file entries and state."""
+    state = new_normalization_state(skus)
+    tables, file_product_ids = normalize_files(csv_files, state)
+    tables = {
+        'products': tables['products'],
+        'product_specifications': tables['product_specifications'],
+        'categories': categories_frame(state),
+        'product_variants': tables['product_variants']
+    }
+    files = {
+        os.path.basename(csv_file): {**file_fingerprint(csv_file), 'product_ids': product_ids}
+        for csv_file, product_ids in file_product_ids.items()
+    }
+    return tables, files, state
+
+def normalize_incremental(csv_files, output_dir, output_format="csv", skus=None):
+    """
+    Re-normalize only new or changed CSV files and merge them into the tables in output_dir.
+
+    Returns the merged tables (None when nothing changed), the manifest file
+    entries and the updated state. Rows belonging to removed files are dropped; a changed file that
+    fails to parse keeps its previous rows and is retried on the next run.
+    """
+    manifest = load_manifest(output_dir)
+    if manifest is None:
+        print("No manifest found, running a full normalization.")
+        return normalize_full(csv_files, skus)
+    if manifest.get('format', 'csv') != output_format:
+        print(f"Previous run wrote {manifest.get('format', 'csv')} tables, running a full normalization.")
+        return normalize_full(csv_files, skus)
+
+    previous_files = manifest['files']
+    state = state_from_manifest(manifest, skus)
+
+    files = {}
+    changed_files = []
+    for csv_file in csv_files:
+        file_name = os.path.basename(csv_file)
+        previous = previous_files.get(file_name)
+        fingerprint = file_fingerprint(csv_file, previous)
+        if previous and previous['sha256'] == fingerprint['sha256']:
+            files[file_name] = {**fingerprint, 'product_ids': previous['product_ids']}
+        else:
+            changed_files.append(csv_file)
+
+    current_names = {os.path.basename(csv_file) for csv_file in csv_files}
+    removed = [file_name for file_name in previous_files if file_name not in current_names]
+    print(f"Incremental run: {len(changed_files)} changed or new, "
+          f"{len(files)} unchanged, {len(removed)} removed")
+    if not changed_files and not removed:
+        return None, files, state
+
+    # Products of changed files number their repeated names around those of unchanged files
+    existing = load_normalized_data(output_dir, output_format)
+    unchanged_ids = {product_id for entry in files.values() for product_id in entry['product_ids']}
+    state['skus'].mark_given(existing['products']['sku'][existing['products']['id'].isin(unchanged_ids)])
+
+    base_id = state['last_ids']['products']
+    changed, file_product_ids = normalize_files(changed_files, state)
+
+    # Files that failed to parse keep their previous rows and fingerprint
+    for csv_file in changed_files:
+        file_name = os.path.basename(csv_file)
+        if csv_file not in file_product_ids and file_name in previous_files:
+            files[file_name] = previous_files[file_name]
+
+    replaced_files = {
+        file_name: previous_files[file_name]
+        for file_name in removed + [os.path.basename(csv_file) for csv_file in file_product_ids]
+        if file_name in previous_files
+    }
+    merged = merge_incremental(existing, changed, file_product_ids, replaced_files, base_id)
+    state['last_ids']['products'] = max([base_id] + [
+        product_id for product_ids in file_product_ids.values() for product_id in product_ids
+    ])
+
+    for csv_file, product_ids in file_product_ids.items():
+        files[os.path.basename(csv_file)] = {**file_fingerprint(csv_file), 'product_ids': product_ids}
+
+    merged = {
+        'products': merged['products'],
+        'product_specifications': merged['product_specifications'],
+        'categories': categories_frame(state),
+        'product_variants': merged['product_variants']
     }
+    return merged, files, state
 
-def save_normalized_data(data_dict, output_dir):
-    """Save normalized data to CSV files."""
+def table_schema(table_name):
+    """Build the Arrow schema for a normalized table from TABLES and COLUMN_TYPES."""
+    import pyarrow as pa
+    return pa.schema([
+        (column, pa.type_for_alias(COLUMN_TYPES.get(column, "string")))
+        for column in TABLES[table_name]
+    ])
+
+def to_arrow(df, schema=None):
+    """
+    Convert a DataFrame to an Arrow table.
+
+    Text columns are cast to strings first, since CSV and Excel sources often
+    mix numbers and text in one column. Without a schema, types are inferred.
+    """
+    import pyarrow as pa
+    df = df.copy()
+    for column in df.columns:
+        if schema is not None:
+            if schema.field(column).type == pa.string():
+                df[column] = df[column].astype("string")
+        elif df[column].dtype == object:
+            df[column] = df[column].astype("string")
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def table_path(output_dir, table_name, output_format="csv"):
+    """Return the output file path of a table in the given format."""
+    return os.path.join(output_dir, f"{table_name}{OUTPUT_FORMATS[output_format]}")
+
+def write_table(df, path, output_format="csv", schema=None):
+    """Write a DataFrame as CSV, zstd-compressed Parquet or zstd-compressed Feather."""
+    if output_format == "csv":
+        df.to_csv(path, index=False)
+        return
+
+    table = to_arrow(df, schema)
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression="zstd", row_group_size=ROW_GROUP_SIZE,
+                       write_statistics=True)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path, compression="zstd")
+
+def read_table(path, output_format="csv"):
+    """Read a table written by write_table back into a DataFrame."""
+    if output_format == "csv":
+        return pd.read_csv(path, dtype=CSV_TYPES)
+    if output_format == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_feather(path)
+
+class TableAppender:
+    """Append DataFrame chunks to one output table, in any of OUTPUT_FORMATS."""
+
+    def __init__(self, path, output_format="csv", schema=None):
+        self.path = path
+        self.output_format = output_format
+        self.schema = schema
+        self.writer = None
+        self.rows = 0
+
+    def append(self, df):
+        if self.output_format == "csv":
+            df.to_csv(self.path, mode='a', index=False, header=self.rows == 0)
+        else:
+            table = to_arrow(df, self.schema)
+            if self.writer is None:
+                self.writer = self._open_writer(table.schema)
+            self.writer.write_table(table)
+        self.rows += len(df)
+
+    def _open_writer(self, schema):
+        import pyarrow as pa
+        if self.output_format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.path, schema, compression="zstd", write_statistics=True)
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        return pa.ipc.new_file(self.path, schema, options=options)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+def save_normalized_data(data_dict, output_dir, output_format="csv"):
+    """Save normalized data to CSV, Parquet or Feather files."""
     os.makedirs(output_dir, exist_ok=True)
     
     for table_name, df in data_dict.items():
+        output_path = table_path(output_dir, table_name, output_format)
         if not df.empty:
-            output_path = os.path.join(output_dir, f"{table_name}.csv")
-            df.to_csv(output_path, index=False)
+            write_table(df, output_path, output_format, table_schema(table_name) if output_format != "csv" else None)
             print(f"Saved {len(df)} records to {output_path}")
+        elif os.path.exists(output_path):
+            # Don't leave a stale table behind for incremental runs to reload
+            os.remove(output_path)
     
-    # Create a metadata file with table information
+    save_metadata({table_name: len(df) for table_name, df in data_dict.items()}, output_dir, output_format)
+
+def save_metadata(table_counts, output_dir, output_format="csv"):
+    """Create a metadata file with table information."""
     metadata = {
         'tables': {},
-        'total_records': 0
+        'total_records': 0,
+        'format': output_format
     }
     
-    for table_name, df in data_dict.items():
-        metadata['tables'][table_name] = len(df)
-        metadata['total_records'] += len(df)
+    for table_name, count in table_counts.items():
+        metadata['tables'][table_name] = count
+        metadata['total_records'] += count
     
     metadata_path = os.path.join(output_dir, "metadata.json")
     with open(metadata_path, 'w') as f:
@@ -230,15 +680,79 @@ def save_normalized_data(data_dict, output_dir):
     
     print(f"Saved metadata to {metadata_path}")
 
+def normalize_streaming(csv_files, output_dir, chunksize, output_format="csv"):
+    """
+    Normalize CSV files chunk by chunk, appending each chunk to the output tables.
+
+    Only the category dictionary and ID counters are kept between chunks (and
+    the slug registry on disk), so peak memory depends on chunksize rather
+    than on the size of the input.
+    For Parquet output every chunk becomes one row group. The manifest is
+    removed because streamed tables don't record per-file product IDs; run
+    without --chunksize before using --incremental.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stale_paths = [table_path(output_dir, table_name, output_format) for table_name in TABLES]
+    for path in stale_paths + [os.path.join(output_dir, MANIFEST_FILE)]:
+        if os.path.exists(path):
+            os.remove(path)
+
+    state = new_normalization_state(SkuIndex(os.path.join(output_dir, SKU_INDEX_FILE)))
+    registry = SlugRegistry(os.path.join(output_dir, SLUG_REGISTRY_FILE))
+    appenders = {
+        table_name: TableAppender(table_path(output_dir, table_name, output_format), output_format,
+                                  table_schema(table_name) if output_format != "csv" else None)
+        for table_name in TABLES
+    }
+
+    try:
+        for csv_file in csv_files:
+            try:
+                for chunk in iter_source(csv_file, chunksize):
+                    tables = assign_slugs(normalize_frame(chunk, state), registry)
+                    for table_name, frame in tables.items():
+                        if not frame.empty:
+                            appenders[table_name].append(frame)
+            except Exception as e:
+                # Rows from chunks before the failure have already been written
+                print(f"Error processing {csv_file}: {str(e)}")
+
+        categories_df = assign_slugs({'categories': categories_frame(state)}, registry)['categories']
+        if not categories_df.empty:
+            appenders['categories'].append(categories_df)
+    finally:
+        for appender in appenders.values():
+            appender.close()
+        registry.close()
+        state['skus'].close()
+
+    table_counts = {table_name: appender.rows for table_name, appender in appenders.items()}
+    for table_name, count in table_counts.items():
+        if count:
+            print(f"Saved {count} records to {appenders[table_name].path}")
+    save_metadata(table_counts, output_dir, output_format)
+    return table_counts
+
 def main():
     """Main function to process and merge CSV data."""
+    parser = argparse.ArgumentParser(description="Merge and normalize CSV data for database import")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-process CSV files that changed since the last run")
+    parser.add_argument("--chunksize", type=int,
+                        help="stream each CSV in chunks of this many rows to keep memory flat")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="csv",
+                        help="output format for the normalized tables (default: csv)")
+    args = parser.parse_args()
+    if args.incremental and args.chunksize:
+        parser.error("--incremental and --chunksize cannot be combined")
+
     print("Merging and normalizing CSV data...")
     
     # Ensure output directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     # Get all CSV files
-    csv_files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
+    csv_files = sorted(glob.glob(os.path.join(DATA_DIR, "*.csv")))
     
     if not csv_files:
         print("No CSV files found in the data directory.")
@@ -246,11 +760,34 @@ def main():
     
     print(f"Found {len(csv_files)} CSV files to process.")
     
-    # Normalize data
-    normalized_data = normalize_product_data(csv_files)
+    if args.chunksize:
+        normalize_streaming(csv_files, OUTPUT_DIR, args.chunksize, args.format)
+        print("\nData normalization complete.")
+        print(f"Normalized data is stored in: {OUTPUT_DIR}")
+        return
+    
+    # Normalize data; generated SKUs stay the same across runs
+    skus = SkuIndex(os.path.join(OUTPUT_DIR, SKU_INDEX_FILE))
+    if args.incremental:
+        normalized_data, files, state = normalize_incremental(csv_files, OUTPUT_DIR, args.format, skus)
+    else:
+        normalized_data, files, state = normalize_full(csv_files, skus)
+    skus.close()
+    
+    if normalized_data is None:
+        # Still refresh fingerprints so touched-but-unchanged files skip hashing next time
+        save_manifest(OUTPUT_DIR, files, state, args.format)
+        print("\nNormalized data is already up to date.")
+        return
+    
+    # Give every product and category its unique slug, as in earlier runs
+    registry = SlugRegistry(os.path.join(OUTPUT_DIR, SLUG_REGISTRY_FILE))
+    normalized_data = assign_slugs(normalized_data, registry)
+    registry.close()
     
     # Save normalized data
-    save_normalized_data(normalized_data, OUTPUT_DIR)
+    save_normalized_data(normalized_data, OUTPUT_DIR, args.format)
+    save_manifest(OUTPUT_DIR, files, state, args.format)
     
     print("\nData normalization complete.")
     print(f"Normalized data is stored in: {OUTPUT_DIR}")
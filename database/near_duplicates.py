@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate detection for combine_database_files.
+The same part is listed many times across the source files with small title
+variations: "LCD Assembly Compatible For LG Q60 (Refurbished) (Black)" and
+"LCD Assembly LG Q60 (All Colors)" are one product. Titles are normalised to
+sets of tokens and every distinct token set gets a MinHash signature.
+Locality-sensitive hashing (LSH) splits the signatures into bands and only
+compares titles that share a whole band, so the work grows with the number of
+rows instead of the number of pairs; those candidate pairs are then checked
+with the exact Jaccard similarity of their token sets. Similar titles are
+joined into clusters, and the most complete row of each cluster is its
+canonical record.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Jaccard similarity of two titles' token sets at which they are near-duplicates
+SIMILARITY_THRESHOLD = 0.9
+# MinHash signature length, split into LSH bands of BAND_ROWS values each;
+# 8 bands of 8 make candidates of ~99% of the pairs at 0.9 similarity and ~37% at 0.7
+NUM_PERMUTATIONS = 64
+BAND_ROWS = 8
+SEED = 1
+# Candidate pairs whose token sets are compared at once
+VERIFY_CHUNK = 1_000_000
+
+# splitmix64 constants, used to derive one hash function per permutation
+GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+MIX = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+# Words that differ between listings of the same part: conditions and colours.
+# A bracketed group (or " - " suffix) made only of these words is dropped
+NOISE_WORDS = [
+    "refurbished", "premium", "genuine", "oem", "aftermarket", "plus", "service", "pack", "new", "used",
+    "all", "colors", "colours", "black", "white", "silver", "gold", "rose", "blue", "red", "green", "purple",
+    "pink", "yellow", "orange", "gray", "grey", "graphite", "aurora", "moroccan", "lavender", "violet",
+    "cloud", "raspberry", "light", "dark", "mint", "cream", "ice", "platinum", "carmine", "midnight",
+    "starlight", "coral", "titanium", "natural", "lilac", "navy", "beige", "brown", "bronze", "copper"
+]
+_NOISE = "|".join(NOISE_WORDS)
+NOISE_GROUP = rf"\(\s*(?:(?:{_NOISE})\b[\s/&,]*)+\)"
+NOISE_SUFFIX = rf"\s+-\s+(?:(?:{_NOISE})\b\s*)+$"
+# Titles cut short end in an unfinished group or word, e.g. "... (Refurbished) (A..." or "... - Bla..."
+TRUNCATED = r"(?:\([^)]*|\S*\.\.\.)$"
+COMPATIBLE = r"\bcompatible\s+(?:for|with)\b"
+
+def normalize_titles(titles):
+    """Lowercase titles and drop "Compatible For", condition and colour groups and punctuation."""
+    return (
+        pd.Series(titles, dtype=str)
+        .str.lower()
+        .str.replace(NOISE_GROUP, " ", regex=True)
+        .str.replace(NOISE_SUFFIX, " ", regex=True)
+        .str.replace(TRUNCATED, " ", regex=True)
+        .str.replace(COMPATIBLE, " ", regex=True)
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+
+def title_tokens(titles):
+    """
+    Split normalised titles into tokens. Returns (owners, tokens, vocabulary):
+    parallel arrays of title position and token code, sorted by title
+    position, and the token of every code.
+    """
+    tokens = pd.Series(titles, dtype=str).reset_index(drop=True).str.split().explode().dropna()
+    codes, vocabulary = pd.factorize(tokens)
+    pairs = pd.DataFrame({'owner': tokens.index.to_numpy(), 'token': codes}).drop_duplicates()
+    return pairs['owner'].to_numpy(), pairs['token'].to_numpy(), np.asarray(vocabulary, dtype=object)
+
+def mix(values):
+    """splitmix64's finalizer: scramble uint64 values so every output bit depends on every input bit."""
+    values = (values ^ (values >> np.uint64(30))) * MIX[0]
+    values = (values ^ (values >> np.uint64(27))) * MIX[1]
+    return values ^ (values >> np.uint64(31))
+
+def minhash_signatures(owners, tokens, vocabulary, permutations=NUM_PERMUTATIONS, seed=SEED):
+    """
+    Return the MinHash signature of every owner's token set: for each of
+    permutations hash functions, the smallest hash of any of its tokens.
+    Hashes depend only on the token text and seed, so signatures are the
+    same from run to run. owners must be sorted; one signature column is
+    computed at a time with one gather and one segmented minimum.
+    """
+    token_hashes = pd.util.hash_array(vocabulary)
+    offsets = (np.arange(permutations, dtype=np.uint64) + np.uint64(seed * permutations + 1)) * GOLDEN
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    signatures = np.empty((len(starts), permutations), dtype=np.uint32)
+    for k in range(permutations):
+        hashes = (mix(token_hashes + offsets[k]) >> np.uint64(32)).astype(np.uint32)
+        signatures[:, k] = np.minimum.reduceat(hashes[tokens], starts)
+    return owners[starts], signatures
+
+def lsh_candidates(signatures, band_rows=BAND_ROWS, seed=SEED):
+    """
+    Return candidate pairs (left, right) of signature rows that agree on at
+    least one whole band. Rows sharing a band are linked to the first row
+    with that band rather than to each other, so a band shared by k rows
+    yields k - 1 pairs instead of k * (k - 1) / 2.
+    """
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, np.iinfo(np.int64).max, band_rows, dtype=np.uint64) | np.uint64(1)
+    lefts, rights = [], []
+    for start in range(0, signatures.shape[1] - band_rows + 1, band_rows):
+        band = signatures[:, start:start + band_rows].astype(np.uint64)
+        # Wrapping multiply-add; a collision only costs a rejected candidate
+        keys = (band * multipliers).sum(axis=1, dtype=np.uint64)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        first = np.r_[True, keys[1:] != keys[:-1]]
+        group = np.maximum.accumulate(np.where(first, np.arange(len(keys)), 0))
+        lefts.append(order[group[~first]])
+        rights.append(order[~first])
+    pairs = np.unique(np.stack([np.concatenate(lefts), np.concatenate(rights)]), axis=1)
+    return pairs[0], pairs[1]
+
+def _set_members(starts, counts, tokens, rows):
+    """Return (row number, token) for every token of every set in rows, the sets being tokens[starts:starts+counts]."""
+    lengths = counts[rows]
+    number = np.repeat(np.arange(len(rows)), lengths)
+    within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return number, tokens[np.repeat(starts[rows], lengths) + within]
+
+def similar_pairs(owners, tokens, left, right, threshold=SIMILARITY_THRESHOLD):
+    """
+    Keep the candidate pairs of token sets (numbered in owners order) whose
+    Jaccard similarity is at least threshold. The tokens of both sides of a
+    chunk of pairs are sorted together; a token found on both sides of a
+    pair shows up twice in a row.
+    """
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    counts = np.diff(np.r_[starts, len(owners)])
+    width = np.int64(tokens.max() + 1)
+    keep = np.empty(len(left), dtype=bool)
+    for start in range(0, len(left), VERIFY_CHUNK):
+        end = min(start + VERIFY_CHUNK, len(left))
+        pair_left, token_left = _set_members(starts, counts, tokens, left[start:end])
+        pair_right, token_right = _set_members(starts, counts, tokens, right[start:end])
+        members = np.sort(np.r_[pair_left * width + token_left, pair_right * width + token_right])
+        shared = members[1:][members[1:] == members[:-1]] // width
+        intersection = np.bincount(shared, minlength=end - start)
+        union = counts[left[start:end]] + counts[right[start:end]] - intersection
+        keep[start:end] = intersection >= threshold * union
+    return left[keep], right[keep]
+
+def connected_components(count, left, right):
+    """Label every node 0..count-1 with the smallest node of its connected component."""
+    labels = np.arange(count)
+    while True:
+        lowest = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, lowest)
+        np.minimum.at(updated, right, lowest)
+        # Pointer jumping: follow each label to its own label
+        updated = updated[updated]
+        if (updated == labels).all():
+            return labels
+        labels = updated
+
+def near_duplicate_clusters(titles, threshold=SIMILARITY_THRESHOLD):
+    """
+    Return a cluster number for every title, numbered in order of first
+    appearance; titles whose token sets are at least threshold similar share
+    one. Missing and empty titles are clusters of their own.
+    """
+    titles = pd.Series(titles)
+    codes, uniques = pd.factorize(normalize_titles(titles).where(titles.notna()).replace('', None))
+    labels = np.arange(len(uniques))
+    if len(uniques):
+        owners, tokens, vocabulary = title_tokens(uniques)
+        titled, signatures = minhash_signatures(owners, tokens, vocabulary)
+        left, right = lsh_candidates(signatures)
+        left, right = similar_pairs(owners, tokens, left, right, threshold)
+        labels[titled] = titled[connected_components(len(titled), left, right)]
+    # Rows without a title get labels past the titled ones, one each
+    missing = codes < 0
+    row_labels = np.where(missing, len(uniques) + np.cumsum(missing), labels[codes])
+    return pd.Series(pd.factorize(row_labels)[0], index=titles.index)
+
+def canonical_records(df, clusters):
+    """Flag the canonical row of each cluster: the one with the most filled-in fields, then the first."""
+    filled = df.notna().sum(axis=1).to_numpy()
+    order = np.lexsort((np.arange(len(df)), -filled, clusters.to_numpy()))
+    canonical = np.zeros(len(df), dtype=bool)
+    sorted_clusters = clusters.to_numpy()[order]
+    canonical[order[np.r_[True, sorted_clusters[1:] != sorted_clusters[:-1]]]] = True
+    return pd.Series(canonical, index=df.index)
+
+def find_near_duplicates(df, title_column, threshold=SIMILARITY_THRESHOLD):
+    """Return a copy of df with a duplicate_cluster number and an is_canonical flag for every row."""
+    clusters = near_duplicate_clusters(df[title_column], threshold)
+    result = df.copy()
+    result['is_canonical'] = canonical_records(df, clusters)
+    result['duplicate_cluster'] = clusters
+    return result
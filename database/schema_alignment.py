@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Schema alignment for combine_database_files.
+Sources name the same field differently (Title, Name, Product Name; Cost,
+Price; Stock, Quantity) and the raw listing exports only have ColN columns,
+so each file's columns are first mapped onto merge_data's names. The unified
+table then keeps the union of every source's columns, rather than only the
+ones all sources share, and its types are set in one pass over the combined
+rows: known numeric columns become numbers, with missing values as NaN or
+<NA> rather than Python objects, and low-cardinality text (brand, category,
+source_file, ...) becomes categorical.
+"""
+
+import re
+import pandas as pd
+
+from merge_data import COLUMN_MAPPING, COLUMN_TYPES
+from source_formats import DATATABLE, detect_format, map_datatable, parse_prices
+
+# merge_data's column names for the variants found in the sources, spelled the
+# way normalize_column_name leaves them
+SYNONYMS = {re.sub(r"[\s-]", "_", old): new for old, new in COLUMN_MAPPING.items()}
+SYNONYMS.update({
+    "product_title": "name",
+    "item_name": "name",
+    "image_link": "image_url",
+    "brand_name": "brand",
+    "qty": "stock_quantity"
+})
+
+# pandas types for the numeric columns in merge_data.COLUMN_TYPES
+PANDAS_TYPES = {"double": "float64", "int64": "Int64"}
+
+# Text columns with at most this many distinct values per filled-in value are stored as categoricals
+CATEGORY_RATIO = 0.25
+
+def normalize_column_name(column):
+    """Lowercase a column name and replace spaces and hyphens with underscores."""
+    return re.sub(r"[\s-]", "_", str(column).strip().lower())
+
+def standardize_columns(df):
+    """
+    Map one source file's columns onto merge_data's names: raw datatable
+    exports through source_formats.map_datatable, other files through
+    SYNONYMS. A renamed column that clashes with an existing one is dropped.
+    """
+    if detect_format([str(column) for column in df.columns]) == DATATABLE:
+        df = map_datatable(as_text(df))
+    df = df.rename(columns=normalize_column_name).rename(columns=SYNONYMS)
+    return df.loc[:, ~df.columns.duplicated()]
+
+def union_columns(dfs):
+    """Return every column of dfs once, in order of first appearance."""
+    return list(dict.fromkeys(column for df in dfs for column in df.columns))
+
+def as_text(values):
+    """Convert values to strings, leaving missing values missing (pandas 2's astype(str) writes "nan")."""
+    return values.astype(str).where(values.notna())
+
+def is_text(values):
+    """True for object and string columns."""
+    return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+
+def coerce_column(values):
+    """Return a column in its unified type (see the module docstring)."""
+    target = PANDAS_TYPES.get(COLUMN_TYPES.get(values.name))
+    if target is not None:
+        numbers = parse_prices(as_text(values)) if is_text(values) else values.astype(float)
+        # Whole-number columns keep fractional values rather than fail the cast
+        if target == "Int64" and not (numbers.dropna() % 1 == 0).all():
+            return numbers
+        return numbers.astype(target)
+    if not is_text(values):
+        return values
+    filled = values.count()
+    if filled and values.nunique() <= CATEGORY_RATIO * filled:
+        return as_text(values).astype("category")
+    return as_text(values)
+
+def coerce_types(df):
+    """Return df with every column converted to its unified type in one pass."""
+    return pd.DataFrame({column: coerce_column(df[column]) for column in df.columns}, index=df.index)
+
+def column_coverage(df, by="source_file"):
+    """Return the share of filled-in values of every column (columns) for each value of by (rows)."""
+    return df.drop(columns=by).notna().groupby(df[by].astype(str)).mean()
+
+def memory_mb(df):
+    """Return the memory used by df, including the strings it holds, in MB."""
+    return df.memory_usage(deep=True).sum() / 1e6
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+SKU generation shared by merge_data and the DatabaseScraper.
+A product's SKU is derived from its name and a hash of a stable key (its
+product URL, or its canonical name): "LCDASSCOM-3F9A2C1B" is the first three
+letters of the first words of the name plus eight hex digits of the hash.
+The same product therefore gets the same SKU on every run, so re-crawls and
+re-imports update rows instead of minting new ones. SkuIndex keeps every
+SKU it has given out by key, so a lookup is one primary-key read and two
+different keys never share a SKU.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from slugs import WHITESPACE, SlugRegistry, disambiguator
+
+# Hex digits of the key hash in a SKU; more are used if that SKU is taken
+SKU_HASH_LENGTH = 8
+# Name letters in front of the hash
+PREFIX_LENGTH = 10
+
+# Both patterns also run in pyarrow's regex engine (see slugs.WHITESPACE)
+NOT_WORD = f"[^A-Za-z0-9{WHITESPACE}]"
+WORD_START = f"([A-Za-z0-9]{{1,3}})[A-Za-z0-9]*[{WHITESPACE}]*"
+_NOT_WORD = re.compile(NOT_WORD)
+_WORD_START = re.compile(WORD_START)
+
+def sku_prefix(name):
+    """Return the first three letters of each word of name, uppercased, up to PREFIX_LENGTH letters."""
+    if not name or not isinstance(name, str):
+        return ""
+    words = _NOT_WORD.sub('', name).strip()
+    return _WORD_START.sub(r'\1', words).upper()[:PREFIX_LENGTH]
+
+def sku_prefixes(names):
+    """Return sku_prefix for a whole Series of names, with column-wide string operations once per distinct name."""
+    names = pd.Series(names)
+    codes, uniques = pd.factorize(names)
+    uniques = pd.Series(uniques, dtype=object)
+    is_text = uniques.map(lambda value: isinstance(value, str)).astype(bool)
+    prefixes = (
+        pd.Series(uniques.where(is_text, ''), dtype=str)
+        .str.replace(NOT_WORD, '', regex=True)
+        .str.strip()
+        .str.replace(WORD_START, r'\1', regex=True)
+        .str.upper()
+        .str.slice(0, PREFIX_LENGTH)
+    )
+    # Code -1 (missing name) picks the trailing empty prefix
+    prefixes = np.append(prefixes.to_numpy(dtype=object), '')
+    return pd.Series(prefixes[codes], index=names.index, dtype=object)
+
+def generate_sku(name, key, length=SKU_HASH_LENGTH):
+    """Return the SKU for a product named name with stable key (before SkuIndex checks it is free)."""
+    digest = disambiguator(key, length).upper()
+    prefix = sku_prefix(name)
+    return f"{prefix}-{digest}" if prefix else digest
+
+class SkuIndex(SlugRegistry):
+    """
+    The SKU of every product key (product URL or canonical name), kept across runs.
+
+    assign(names, keys) returns each key's SKU: the one it was given before,
+    else generate_sku(name, key), else (if another key holds that SKU) the
+    same with two more hex digits at a time. A product keeps its SKU when
+    it is renamed. A SkuIndex created with path=None lives in memory.
+    """
+
+    table = "skus"
+
+    def _candidates(self, pending, attempt):
+        length = SKU_HASH_LENGTH + 2 * attempt
+        digests = pd.Series([disambiguator(key, length).upper() for key in pending['key'].tolist()],
+                            index=pending.index)
+        return (pending['base'] + '-' + digests).str.lstrip('-')
+
+    def assign(self, names, keys, namespace="products", distinct=False):
+        """Return the SKU of every key, named names (see SlugRegistry.assign for distinct)."""
+        return super().assign(sku_prefixes(names), keys, namespace, distinct)
+
+    def assign_one(self, name, key, namespace="products"):
+        """Return the SKU of one key; a key seen before costs one index lookup."""
+        row = self.get(key, namespace)
+        if row is not None:
+            return row[0]
+        return self.assign([name], [key], namespace).iloc[0]
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Slug generation shared by merge_data and the DatabaseScraper.
+create_slug slugs one name and remembers recent names; create_slugs slugs a
+whole column, doing the work once per distinct name. SlugRegistry keeps the
+slug given to every product (keyed by SKU, URL or name) across runs, so two
+different products never share a slug: the first product to claim a slug
+keeps it and later ones get a disambiguator derived from their own key. A
+product's slug is part of its URL, so it does not change when the product is
+renamed unless the registry is opened with rename=True.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import sqlite3
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Names remembered by create_slug
+CACHE_SIZE = 100_000
+
+# Characters Python's \s matches, spelled out so the same pattern also runs
+# in pyarrow's regex engine (whose \s is ASCII-only)
+WHITESPACE = "".join(chr(code) for code in range(0x3001) if chr(code).isspace())
+DISALLOWED = f"[^a-z0-9{WHITESPACE}-]"
+SEPARATORS = f"[{WHITESPACE}-]+"
+_DISALLOWED = re.compile(DISALLOWED)
+
+# Hex digits of the key hash appended to a taken slug; more are used if that is taken too
+DISAMBIGUATOR_LENGTH = 6
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _slugify(text):
+    # Same result as removing disallowed characters, turning whitespace into
+    # hyphens, collapsing hyphens and stripping them, in two passes
+    text = _DISALLOWED.sub('', text.lower())
+    return '-'.join(text.replace('-', ' ').split())
+
+def create_slug(name):
+    """Create a URL-friendly slug from a name."""
+    if not name or not isinstance(name, str):
+        return ""
+    return _slugify(name)
+
+def create_slugs(names):
+    """Create slugs for a whole Series of names (same rules as create_slug)."""
+    names = pd.Series(names)
+    codes, uniques = pd.factorize(names)
+    uniques = pd.Series(uniques, dtype=object)
+    is_text = uniques.map(lambda value: isinstance(value, str)).astype(bool)
+    slugs = (
+        pd.Series(uniques.where(is_text, ''), dtype=str)
+        .str.lower()
+        .str.replace(DISALLOWED, '', regex=True)
+        .str.replace(SEPARATORS, '-', regex=True)
+        .str.strip('-')
+    )
+    # Code -1 (missing name) picks the trailing empty slug
+    slugs = np.append(slugs.to_numpy(dtype=object), '')
+    return pd.Series(slugs[codes], index=names.index, dtype=object)
+
+def disambiguator(key, length=DISAMBIGUATOR_LENGTH):
+    """Return the first length hex digits of a hash of key."""
+    return hashlib.blake2b(str(key).encode(), digest_size=16).hexdigest()[:length]
+
+class SlugRegistry:
+    """
+    The slug of every product and category, kept across runs.
+
+    assign(slugs, keys) turns each key's base slug (from create_slugs) into
+    its unique slug. A key keeps the slug it was given even when its base
+    slug changes (a renamed product, or a change in how names are slugged);
+    with rename=True such keys get a new slug instead, and each change is
+    logged. A base slug already held by another key gets "-" plus
+    DISAMBIGUATOR_LENGTH hex digits of a hash of the key, so the result
+    depends only on the key and on which keys came first. Slugs of products
+    that are no longer listed stay taken.
+
+    Each namespace (products, categories) is a separate set of slugs. A
+    registry created with path=None lives in memory.
+    """
+
+    table = "slugs"
+
+    def __init__(self, path, rename=False):
+        self.path = path
+        # A key whose base changed (a renamed product) is given a new value
+        self.reassign_changed = rename
+        self.connection = None
+
+    def _connect(self):
+        """Open (and create) the registry on first use."""
+        if self.connection is None:
+            if self.path is None:
+                self.connection = sqlite3.connect(":memory:")
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self.connection = sqlite3.connect(self.path)
+                self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} (namespace TEXT, value TEXT, key TEXT, base TEXT, "
+                "PRIMARY KEY (namespace, value), UNIQUE (namespace, key))"
+            )
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS batch (position INTEGER, value TEXT)")
+            # Keys given out since the registry was opened, for assign(distinct=True)
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS given (namespace TEXT, key TEXT, n INTEGER, "
+                "PRIMARY KEY (namespace, key, n))"
+            )
+        return self.connection
+
+    def _lookup(self, query, namespace, values):
+        """Run query joined against values (a temporary table) and return its rows."""
+        connection = self._connect()
+        connection.executemany("INSERT INTO batch (position, value) VALUES (?, ?)", enumerate(values.tolist()))
+        rows = connection.execute(query, (namespace,)).fetchall()
+        connection.execute("DELETE FROM batch")
+        return rows
+
+    def _candidates(self, pending, attempt):
+        """Return the values to try for the pending keys: the base slug, then ever longer disambiguators."""
+        if not attempt:
+            # An empty base slug goes straight to a disambiguator
+            return pending['base'].where(pending['base'] != '')
+        length = DISAMBIGUATOR_LENGTH + 2 * (attempt - 1)
+        suffix = [disambiguator(key, length) for key in pending['key'].tolist()]
+        return (pending['base'] + '-' + pd.Series(suffix, index=pending.index)).str.lstrip('-')
+
+    def _occurrences(self, keys, namespace):
+        """
+        Number the repeats of each key: the first occurrence not yet given out
+        (by this object, or held by mark_given) stays as is, later ones become
+        "key#1", "key#2", ..., skipping numbers already given out.
+        """
+        held = {}
+        # CROSS JOIN keeps batch as the outer loop: with a plain JOIN SQLite
+        # walks every given key of the namespace and scans batch for each
+        for key, n in self._lookup(
+            "SELECT given.key, given.n FROM batch CROSS JOIN given ON given.namespace = ? AND given.key = batch.value",
+            namespace, keys.drop_duplicates()
+        ):
+            held.setdefault(key, set()).add(n)
+        occurrence = keys.groupby(keys).cumcount().to_numpy(copy=True)
+        if held:
+            positions = np.flatnonzero(keys.isin(list(held)).to_numpy())
+            following = {}
+            for position, key in zip(positions, keys.to_numpy()[positions]):
+                n = following.get(key, 0)
+                while n in held[key]:
+                    n += 1
+                occurrence[position] = n
+                following[key] = n + 1
+        self._give(namespace, keys.tolist(), occurrence.tolist())
+        occurrence = pd.Series(occurrence, index=keys.index)
+        return keys.where(occurrence == 0, keys + '#' + occurrence.astype(str))
+
+    def _give(self, namespace, keys, numbers):
+        self._connect().executemany(
+            "INSERT OR IGNORE INTO given (namespace, key, n) VALUES (?, ?, ?)",
+            zip([namespace] * len(keys), keys, numbers)
+        )
+
+    def mark_given(self, values, namespace="products"):
+        """
+        Hold the keys registered for values as given out, so assign(distinct=True)
+        numbers other repeats of those keys around them.
+        """
+        keys = pd.Series([key for _, key in self._lookup(
+            f"SELECT batch.position, {self.table}.key FROM batch "
+            f"JOIN {self.table} ON {self.table}.namespace = ? AND {self.table}.value = batch.value",
+            namespace, pd.Series(values).dropna().astype(str).drop_duplicates()
+        )], dtype=object)
+        if keys.empty:
+            return
+        parts = keys.str.extract(r'^(?P<key>.*?)(?:#(?P<n>\d+))?$')
+        self._give(namespace, parts['key'].tolist(), pd.to_numeric(parts['n']).fillna(0).astype(int).tolist())
+
+    def assign(self, bases, keys, namespace="products", distinct=False):
+        """
+        Return the unique value of every key, given its base; rows with the
+        same key share it. With distinct=True every row is a separate item
+        instead: a key already given out, in this call or an earlier one on
+        this object, is registered as "key#1", "key#2", ... (see _occurrences).
+        """
+        bases = pd.Series(bases)
+        batch = pd.DataFrame({
+            'base': bases.fillna('').astype(str).to_numpy(dtype=object),
+            'key': pd.Series(keys).astype(str).to_numpy(dtype=object)
+        })
+        if distinct:
+            batch['key'] = self._occurrences(batch['key'], namespace).to_numpy(dtype=object)
+        first = batch.drop_duplicates('key').reset_index(drop=True)
+        connection = self._connect()
+
+        # Keys already registered keep their value (unless their base changed and reassign_changed is set)
+        known = pd.DataFrame(self._lookup(
+            f"SELECT batch.position, {self.table}.value, {self.table}.base FROM batch "
+            f"JOIN {self.table} ON {self.table}.namespace = ? AND {self.table}.key = batch.value",
+            namespace, first['key']
+        ), columns=['position', 'value', 'base'])
+        positions = known['position'].to_numpy(dtype=int)
+        keep = known['base'].to_numpy() == first['base'].to_numpy()[positions]
+        if not self.reassign_changed:
+            keep[:] = True
+        assigned = pd.Series(None, index=first.index, dtype=object)
+        assigned[positions[keep]] = known['value'][keep].to_numpy()
+        renamed = first['key'].to_numpy()[positions[~keep]]
+        connection.executemany(f"DELETE FROM {self.table} WHERE namespace = ? AND key = ?",
+                               ((namespace, key) for key in renamed))
+
+        # New keys try each candidate in turn until one is free
+        pending = first[assigned.isna()]
+        attempt = 0
+        while not pending.empty:
+            candidates = self._candidates(pending, attempt)
+            taken = {value for _, value in self._lookup(
+                f"SELECT batch.position, {self.table}.value FROM batch "
+                f"JOIN {self.table} ON {self.table}.namespace = ? AND {self.table}.value = batch.value",
+                namespace, candidates.dropna()
+            )}
+            # Within the batch the first key to ask for a value gets it
+            free = candidates.notna() & ~candidates.isin(taken) & ~candidates.duplicated()
+            winners = pending[free]
+            connection.executemany(
+                f"INSERT INTO {self.table} (namespace, value, key, base) VALUES (?, ?, ?, ?)",
+                zip([namespace] * len(winners), candidates[free].tolist(), winners['key'].tolist(),
+                    winners['base'].tolist())
+            )
+            assigned[winners.index] = candidates[free]
+            pending = pending[~free]
+            attempt += 1
+        connection.commit()
+
+        for key, old, new in zip(renamed, known['value'][~keep], assigned[positions[~keep]]):
+            logger.warning("Renamed %s %r: %s -> %s", namespace, key, old, new)
+
+        by_key = pd.Series(assigned.to_numpy(), index=first['key'].to_numpy())
+        return pd.Series(batch['key'].map(by_key).to_numpy(), index=bases.index, dtype=object)
+
+    def get(self, key, namespace="products"):
+        """Return (value, base) registered for key, or None; one primary-key lookup."""
+        return self._connect().execute(
+            f"SELECT value, base FROM {self.table} WHERE namespace = ? AND key = ?", (namespace, str(key))
+        ).fetchone()
+
+    def assign_one(self, base, key, namespace="products"):
+        """Return the unique value of one key (see assign)."""
+        row = self.get(key, namespace)
+        if row is not None and (row[1] == base or not self.reassign_changed):
+            return row[0]
+        return self.assign([base], [key], namespace).iloc[0]
+
+    def count(self, namespace="products"):
+        """Return the number of registered values in namespace."""
+        return self._connect().execute(
+            f"SELECT COUNT(*) FROM {self.table} WHERE namespace = ?", (namespace,)
+        ).fetchone()[0]
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        if self.connection is not None:
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Source file formats for merge_data.
+Each CSV's header is read once to detect its layout, and the file is then
+read by the column mapper for that layout, which returns the column names
+merge_data.normalize_frame understands (name, price, image_url, brand, ...).
+
+    datatable   raw listing exports (database/data/datatable*.csv): Col0 name,
+                Col1 "$14.51" price, Col4 cart button, Col5_HREF product URL,
+                Col6_SRC-Col8_SRC product image plus quality and colour badges
+    generic     named columns, renamed later by merge_data.COLUMN_MAPPING
+"""
+
+import re
+import csv
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (enables pandas' multithreaded pyarrow CSV engine)
+    CSV_ENGINE = "pyarrow"
+except ImportError:  # pyarrow not installed; pandas' C parser reads the files
+    CSV_ENGINE = "c"
+
+DATATABLE = "datatable"
+GENERIC = "generic"
+
+# Brands recognised in product names; model-line words (lowercase) imply their brand
+BRANDS = ["Apple", "Samsung", "Google", "Sony", "LG", "Motorola", "OnePlus", "Xiaomi", "Huawei", "Nokia"]
+MODEL_LINES = {"iphone": "Apple", "ipad": "Apple", "ipod": "Apple", "galaxy": "Samsung", "pixel": "Google",
+               "moto": "Motorola"}
+
+BRAND_WORDS = {**{brand.lower(): brand for brand in BRANDS}, **MODEL_LINES}
+
+# Names read "<part> Compatible For <brand> <model> (<condition>) (<colour>)"
+COMPATIBLE = r"\s+compatible\s+(?:for|with)\s+"
+# Fallback for names without "Compatible For", e.g. "Antenna Connecting Cable Samsung Galaxy S25 5G"
+NAME_PATTERN = re.compile(
+    r"^(?:(?P<part>.*?)\s+)??"
+    r"(?P<brand>" + "|".join(sorted(BRAND_WORDS, key=len, reverse=True)) + r")\b\s*(?P<model>[^(]*)",
+    re.IGNORECASE
+)
+
+# Listing buttons shown for products that cannot be ordered
+OUT_OF_STOCK_ACTIONS = {"Notify Me"}
+
+def sniff_columns(path):
+    """Return the header row of a CSV file without reading the rest of it."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
+
+def detect_format(columns):
+    """Return DATATABLE for the raw ColN/ColN_HREF/ColN_SRC export layout, else GENERIC."""
+    columns = set(columns)
+    if {"Col0", "Col1"} <= columns and any(re.fullmatch(r"Col\d+_HREF", column) for column in columns):
+        return DATATABLE
+    return GENERIC
+
+def parse_prices(values):
+    """Parse a whole column of "$1,234.50"-style prices to floats (NaN where there is no price)."""
+    text = values.str.replace(r"[^\d.\-]", "", regex=True)
+    return pd.to_numeric(text, errors='coerce').astype(float)
+
+def _per_value(values, function):
+    """Apply function once per distinct value and spread the results back over the column (NaN stays None)."""
+    codes, uniques = pd.factorize(values)
+    # Code -1 (missing) picks the trailing None
+    results = np.array([function(value) for value in uniques] + [None], dtype=object)
+    return pd.Series(results[codes], index=values.index, dtype=object)
+
+def badge_name(url):
+    """Turn a badge image URL (.../Badges/REFURBISHED.png) into a name (Refurbished)."""
+    stem = re.sub(r"\.\w+$", "", url.rsplit("/", 1)[-1])
+    stem = re.sub(r"(?:[-_]\d+_?|-compressed)$", "", stem)
+    return re.sub(r"[-_]+", " ", stem).strip().title()
+
+def split_images(df, src_columns):
+    """
+    Split the ColN_SRC columns into the product image and its badges.
+
+    The product image is the first URL under /catalog/product/; a badge
+    shown before it is the quality badge (Premium, Refurbished, ...) and one
+    after it the colour swatch. Returns (image_url, badge, color) Series.
+    """
+    image_url = pd.Series(None, index=df.index, dtype=object)
+    badge = pd.Series(None, index=df.index, dtype=object)
+    color = pd.Series(None, index=df.index, dtype=object)
+    for column in src_columns:
+        urls = df[column]
+        is_image = urls.str.contains("/catalog/product/", regex=False).fillna(False).astype(bool)
+        is_badge = urls.notna() & ~is_image
+        # A few dozen badge images recur across every file, so each is named once
+        names = _per_value(urls.where(is_badge), badge_name)
+        seen_image = image_url.notna()
+        badge = badge.mask(is_badge & ~seen_image & badge.isna(), names)
+        color = color.mask(is_badge & seen_image & color.isna(), names)
+        image_url = image_url.mask(is_image & ~seen_image, urls)
+    return image_url, badge, color
+
+def device_brand_and_model(device):
+    """Split a device such as "LG Q92 5G / Q920" or "iPhone 13 Pro" into (brand, model)."""
+    word, _, rest = device.partition(" ")
+    key = word.lower()
+    model = re.sub(r"\.\.\.$", "", device if key in MODEL_LINES else rest).strip()
+    return BRAND_WORDS.get(key), model
+
+def brand_and_model(names):
+    """
+    Derive (part, brand, model) Series from product names such as
+    "LCD Assembly Compatible For LG Q92 5G / Q920 (Refurbished)".
+
+    The part and the device are cut out of every name with column-wide
+    regular-expression replaces; the few hundred distinct devices are then
+    split into brand and model once each. Names without "Compatible For"
+    go through NAME_PATTERN.
+    """
+    has_marker = names.str.contains(f"(?i){COMPATIBLE}", regex=True).fillna(False).astype(bool)
+    part = names.str.replace(f"(?i){COMPATIBLE}.*$", "", regex=True).where(has_marker)
+    device = names.str.replace(f"(?i)^.*?{COMPATIBLE}", "", regex=True).str.replace(r"\s*\(.*$", "", regex=True)
+    device = device.where(has_marker)
+
+    if not has_marker.all():
+        fallback = names[~has_marker].dropna().str.extract(NAME_PATTERN)
+        part = part.astype(object).fillna(fallback["part"])
+        device = device.astype(object).fillna(fallback["brand"] + " " + fallback["model"].str.strip())
+
+    codes, devices = pd.factorize(device)
+    pairs = [device_brand_and_model(value) for value in devices] + [(None, None)]
+    brand = pd.Series(np.array([pair[0] for pair in pairs], dtype=object)[codes], index=names.index)
+    model = pd.Series(np.array([pair[1] for pair in pairs], dtype=object)[codes], index=names.index)
+    return part.str.strip(), brand, model
+
+def map_datatable(df):
+    """Map a raw datatable export onto merge_data's column names, one column-wide operation per field."""
+    href_columns = [column for column in df.columns if re.fullmatch(r"Col\d+_HREF", column)]
+    src_columns = sorted((column for column in df.columns if re.fullmatch(r"Col\d+_SRC", column)),
+                         key=lambda column: int(re.search(r"\d+", column).group()))
+    names = df["Col0"].str.strip()
+    part, brand, model = brand_and_model(names)
+    image_url, badge, color = split_images(df, src_columns)
+    # Col5_HREF links the product; older exports only link the name (Col0_HREF)
+    url_column = "Col5_HREF" if "Col5_HREF" in href_columns else href_columns[0]
+    action = df["Col4"] if "Col4" in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+    return pd.DataFrame({
+        "name": names,
+        "price": parse_prices(df["Col1"]),
+        "image_url": image_url,
+        "product_url": df[url_column],
+        "category": part,
+        "brand": brand,
+        "model": model,
+        "badge": badge,
+        "color": color,
+        # Out-of-stock rows get 0; the rest keep merge_data's default stock
+        "stock_quantity": pd.Series(0.0, index=df.index).where(action.isin(OUT_OF_STOCK_ACTIONS))
+    })
+
+def map_generic(df):
+    """Generic files are renamed by merge_data.prepare_columns; nothing to do here."""
+    return df
+
+MAPPERS = {DATATABLE: map_datatable, GENERIC: map_generic}
+
+def read_source(path):
+    """Read one CSV file through the mapper for its detected format."""
+    source_format = detect_format(sniff_columns(path))
+    if source_format == DATATABLE:
+        df = pd.read_csv(path, dtype=str, engine=CSV_ENGINE)
+    else:
+        df = pd.read_csv(path)
+    return MAPPERS[source_format](df)
+
+def iter_source(path, chunksize):
+    """Yield one CSV file in mapped chunks of chunksize rows."""
+    source_format = detect_format(sniff_columns(path))
+    dtype = str if source_format == DATATABLE else None
+    for chunk in pd.read_csv(path, dtype=dtype, chunksize=chunksize):
+        yield MAPPERS[source_format](chunk)